@@ -0,0 +1,182 @@
+"""
+Throughput of the drone environments: steps/sec, reset and render cost, per-phase timings
+of a step and VecEnv scaling.
+
+Usage:
+    python -m benchmarks.env_throughput --output env_throughput.json
+    python -m benchmarks.env_throughput --envs maze --vec-envs 1 4 16 --no-subproc
+"""
+import argparse
+import json
+import platform
+import time
+from collections import defaultdict
+
+import numpy as np
+from stable_baselines3.common.vec_env import DummyVecEnv, SubprocVecEnv
+
+from environmetns.player import SimplePlayer
+from environmetns.registry import ENV_TYPES, make_env
+from environmetns.shm_vec_env import SharedMemoryVecEnv
+from environmetns.vec_env import BatchedDroneVecEnv
+
+POLICIES = ('random', 'fixed')
+# phases of SimpleEnv.step timed by `phase_timings`
+ENV_PHASES = ('get_obs', 'reward', 'generate_next_target')
+PLAYER_PHASES = ('update', 'move')
+
+
+def make_policy(policy, action_space, n=None, seed=0):
+    rng = np.random.default_rng(seed)
+    shape = action_space.shape if n is None else (n,) + action_space.shape
+    fixed = np.full(shape, 0.5, dtype=np.float32)
+
+    def act():
+        if policy == 'fixed':
+            return fixed
+        return rng.uniform(-1, 1, shape).astype(np.float32)
+
+    return act
+
+
+def bench_single(env_name, policy, n_steps):
+    env = make_env(env_name)
+    act = make_policy(policy, env.action_space)
+    actions = [act() for _ in range(n_steps)]
+    env.reset()
+    resets = 0
+    start = time.perf_counter()
+    for action in actions:
+        _, _, done, _, _ = env.step(action)
+        if done:
+            env.reset()
+            resets += 1
+    elapsed = time.perf_counter() - start
+    return {'steps_per_sec': n_steps / elapsed, 'episodes_done': resets}
+
+
+def bench_reset(env_name, n_resets):
+    env = make_env(env_name)
+    start = time.perf_counter()
+    for _ in range(n_resets):
+        env.reset()
+    return {'reset_ms': (time.perf_counter() - start) / n_resets * 1e3}
+
+
+def bench_render(env_name, n_frames, mode='rgb_array'):
+    env = make_env(env_name, render_mode=mode)
+    act = make_policy('random', env.action_space)
+    env.render()  # warm up the disc stamps and background
+    elapsed = 0.0
+    for _ in range(n_frames):
+        _, _, done, _, _ = env.step(act())
+        if done:
+            env.reset()
+        start = time.perf_counter()
+        env.render()
+        elapsed += time.perf_counter() - start
+    return {f'render_{mode}_ms': elapsed / n_frames * 1e3}
+
+
+def _timed(method, name, totals, counts):
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        result = method(*args, **kwargs)
+        totals[name] += time.perf_counter() - start
+        counts[name] += 1
+        return result
+
+    return wrapper
+
+
+def phase_timings(env_name, policy, n_steps):
+    """Mean time per call of every step phase, measured through timing subclasses of the env and player."""
+    totals, counts = defaultdict(float), defaultdict(int)
+    env_cls = ENV_TYPES[env_name]
+    timed_env_cls = type('Timed' + env_cls.__name__, (env_cls,), {
+        name: _timed(getattr(env_cls, name), name, totals, counts) for name in ENV_PHASES})
+    timed_player_cls = type('TimedSimplePlayer', (SimplePlayer,), {
+        name: _timed(getattr(SimplePlayer, name), name, totals, counts) for name in PLAYER_PHASES})
+    env = timed_env_cls(player=timed_player_cls())
+    act = make_policy(policy, env.action_space)
+    env.reset()
+    totals.clear()
+    counts.clear()
+
+    start = time.perf_counter()
+    for _ in range(n_steps):
+        _, _, done, _, _ = env.step(act())
+        if done:
+            env.reset()
+    total = time.perf_counter() - start
+    phases = {name: {'calls': counts[name],
+                     'mean_us': totals[name] / counts[name] * 1e6 if counts[name] else 0.0,
+                     'share_of_step': totals[name] / total}
+              for name in PLAYER_PHASES + ENV_PHASES}
+    return {'step_us': total / n_steps * 1e6, 'phases': phases}
+
+
+def bench_vec(env_name, backend, n_envs, policy, n_steps):
+    if backend == 'batched':
+        env = BatchedDroneVecEnv(env_name, n_envs)
+    else:
+        vec_cls = {'dummy': DummyVecEnv, 'subproc': SubprocVecEnv, 'shm': SharedMemoryVecEnv}[backend]
+        env = vec_cls([lambda: make_env(env_name) for _ in range(n_envs)])
+    act = make_policy(policy, env.action_space, n=n_envs)
+    env.reset()
+    start = time.perf_counter()
+    for _ in range(n_steps):
+        env.step(act())
+    elapsed = time.perf_counter() - start
+    env.close()
+    return {'backend': backend, 'n_envs': n_envs, 'policy': policy,
+            'env_steps_per_sec': n_steps * n_envs / elapsed, 'calls_per_sec': n_steps / elapsed}
+
+
+def run(args):
+    results = {
+        'machine': {'python': platform.python_version(), 'platform': platform.platform()},
+        'envs': {},
+    }
+    for env_name in args.envs:
+        print(f'== {env_name}')
+        env_results = {'single': {}, 'phases': {}, 'vec': []}
+        for policy in POLICIES:
+            env_results['single'][policy] = bench_single(env_name, policy, args.steps)
+            env_results['phases'][policy] = phase_timings(env_name, policy, args.steps)
+            print(f"  single {policy:6s}: {env_results['single'][policy]['steps_per_sec']:10.0f} steps/s")
+        env_results.update(bench_reset(env_name, args.resets))
+        env_results.update(bench_render(env_name, args.frames))
+        env_results.update(bench_render(env_name, args.frames, 'state_pixels'))
+        print(f"  reset {env_results['reset_ms']:.3f} ms, render {env_results['render_rgb_array_ms']:.3f} ms, "
+              f"state_pixels {env_results['render_state_pixels_ms']:.3f} ms")
+
+        backends = ['dummy', 'batched'] + ([] if args.no_subproc else ['subproc', 'shm'])
+        for backend in backends:
+            for n_envs in args.vec_envs:
+                for policy in POLICIES:
+                    result = bench_vec(env_name, backend, n_envs, policy, args.vec_steps)
+                    env_results['vec'].append(result)
+                    print(f"  {backend:8s} n_envs={n_envs:3d} {policy:6s}: "
+                          f"{result['env_steps_per_sec']:10.0f} env steps/s")
+        results['envs'][env_name] = env_results
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--envs', nargs='+', default=list(ENV_TYPES), choices=list(ENV_TYPES))
+    parser.add_argument('--steps', type=int, default=5_000, help='steps of single env benchmarks')
+    parser.add_argument('--resets', type=int, default=500)
+    parser.add_argument('--frames', type=int, default=500)
+    parser.add_argument('--vec-envs', type=int, nargs='+', default=[1, 2, 4, 8, 16, 32, 64])
+    parser.add_argument('--vec-steps', type=int, default=200, help='VecEnv.step calls per scaling point')
+    parser.add_argument('--no-subproc', action='store_true',
+                        help='skip SubprocVecEnv and SharedMemoryVecEnv scaling')
+    parser.add_argument('--output', help='write results to this JSON file')
+    args = parser.parse_args()
+
+    results = run(args)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
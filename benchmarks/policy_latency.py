@@ -0,0 +1,77 @@
+"""
+Latency of the NumPy actor against SB3 `model.predict` for batch sizes 1 and 1024,
+plus the import time of both inference paths.
+
+Usage:
+    python -m training.numpy_policy models/sac_maze_pretrained_model_9760000_steps.zip
+    python -m benchmarks.policy_latency models/sac_maze_pretrained_model_9760000_steps.zip
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from training.numpy_policy import NumpyPolicy
+
+BATCH_SIZES = (1, 1024)
+
+
+def import_time(statement):
+    """Wall time of a fresh interpreter executing `statement`, in seconds."""
+    start = time.perf_counter()
+    subprocess.run([sys.executable, '-c', statement], check=True)
+    return time.perf_counter() - start
+
+
+def latency(predict, obs, n_calls):
+    predict(obs)  # warm up
+    start = time.perf_counter()
+    for _ in range(n_calls):
+        predict(obs)
+    return (time.perf_counter() - start) / n_calls
+
+
+def run(model_path, n_calls, with_sb3):
+    npz_path = os.path.splitext(model_path)[0] + '.npz'
+    policy = NumpyPolicy.load(npz_path)
+    results = {'model': model_path, 'latency_us': {}, 'import_s': {}}
+    results['import_s']['numpy'] = import_time(
+        f'from training.numpy_policy import NumpyPolicy; NumpyPolicy.load({npz_path!r})')
+
+    predictors = {'numpy': lambda obs: policy.predict(obs)}
+    if with_sb3:
+        from stable_baselines3 import SAC
+        model = SAC.load(model_path, device='cpu', custom_objects={'learning_rate': 0.0, 'lr_schedule': lambda _: 0.0})
+        predictors['sb3'] = lambda obs: model.predict(obs, deterministic=True)
+        results['import_s']['sb3'] = import_time(
+            f'from stable_baselines3 import SAC; SAC.load({model_path!r}, device="cpu", '
+            f'custom_objects={{"learning_rate": 0.0, "lr_schedule": lambda _: 0.0}})')
+
+    for batch_size in BATCH_SIZES:
+        obs = np.random.uniform(-1, 1, (batch_size, policy.obs_dim)).astype(np.float32)
+        for name, predict in predictors.items():
+            seconds = latency(predict, obs, n_calls if batch_size == 1 else max(n_calls // 10, 1))
+            results['latency_us'][f'{name}/batch_{batch_size}'] = seconds * 1e6
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('model', help='SAC checkpoint (.zip), its exported .npz must lie next to it')
+    parser.add_argument('--calls', type=int, default=2000)
+    parser.add_argument('--no-sb3', action='store_true', help='skip the SB3/torch baseline')
+    parser.add_argument('--output', help='write results to this JSON file')
+    args = parser.parse_args()
+
+    results = run(args.model, args.calls, not args.no_sb3)
+    for key, value in results['latency_us'].items():
+        print(f'{key:20s} {value:10.1f} us/call')
+    for key, value in results['import_s'].items():
+        print(f'{key:20s} {value:10.2f} s to import and load')
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,102 @@
+"""
+Memory per transition, add and sample throughput of CompactReplayBuffer against the SB3 ReplayBuffer,
+filled with transitions of the drone envs.
+
+Usage:
+    python -m benchmarks.replay_buffer --size 1000000 --output replay_buffer.json
+    python -m benchmarks.replay_buffer --mmap tmp/bench_replay_buffer
+"""
+import argparse
+import json
+import shutil
+import time
+
+import numpy as np
+from stable_baselines3.common.buffers import ReplayBuffer
+
+from environmetns.registry import make_env
+from training.replay_buffer import CompactReplayBuffer
+
+
+def record_transitions(env_name, n_envs, n_steps, seed=0):
+    """Observations, actions, rewards and dones of `n_envs` envs under random actions."""
+    envs = [make_env(env_name) for _ in range(n_envs)]
+    rng = np.random.default_rng(seed)
+    obs = np.stack([env.reset(seed=seed + i)[0] for i, env in enumerate(envs)])
+    steps = []
+    for _ in range(n_steps):
+        actions = rng.uniform(-1, 1, (n_envs, 2)).astype(np.float32)
+        results = [env.step(action) for env, action in zip(envs, actions)]
+        next_obs = np.stack([result[0] for result in results])
+        rewards = np.array([result[1] for result in results], dtype=np.float32)
+        dones = np.array([result[2] for result in results])
+        steps.append((obs, next_obs, actions, rewards, dones))
+        obs = next_obs.copy()
+        for i in np.flatnonzero(dones):
+            obs[i] = envs[i].reset()[0]
+    return envs[0].observation_space, envs[0].action_space, steps
+
+
+def bench(buffer, steps, size, batch_size, n_samples):
+    infos = [{} for _ in range(buffer.n_envs)]
+    start = time.perf_counter()
+    n_adds = 0
+    while n_adds * buffer.n_envs < size:
+        buffer.add(*steps[n_adds % len(steps)], infos)
+        n_adds += 1
+    add_time = time.perf_counter() - start
+    buffer.sample(batch_size)  # warm up
+    start = time.perf_counter()
+    for _ in range(n_samples):
+        buffer.sample(batch_size)
+    sample_time = time.perf_counter() - start
+    return {
+        'transitions_per_sec_add': n_adds * buffer.n_envs / add_time,
+        'samples_per_sec': n_samples * batch_size / sample_time,
+        'sample_ms': sample_time / n_samples * 1e3,
+    }
+
+
+def buffer_bytes(buffer):
+    if isinstance(buffer, CompactReplayBuffer):
+        return buffer.nbytes
+    arrays = (buffer.observations, buffer.next_observations, buffer.actions, buffer.rewards, buffer.dones,
+              buffer.timeouts)
+    return sum(array.nbytes for array in arrays if array is not None)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--env', default='maze')
+    parser.add_argument('--size', type=int, default=1_000_000, help='transitions stored in each buffer')
+    parser.add_argument('--n-envs', type=int, default=16)
+    parser.add_argument('--batch-size', type=int, default=256)
+    parser.add_argument('--samples', type=int, default=2000, help='sample() calls timed')
+    parser.add_argument('--mmap', help='also benchmark a CompactReplayBuffer memory-mapped in this directory')
+    parser.add_argument('--output', help='write results to this JSON file')
+    args = parser.parse_args()
+
+    observation_space, action_space, steps = record_transitions(args.env, args.n_envs, 2000)
+    buffers = {
+        'sb3': lambda: ReplayBuffer(args.size, observation_space, action_space, 'cpu', n_envs=args.n_envs),
+        'compact': lambda: CompactReplayBuffer(args.size, observation_space, action_space, 'cpu',
+                                               n_envs=args.n_envs),
+    }
+    if args.mmap:
+        shutil.rmtree(args.mmap, ignore_errors=True)
+        buffers['compact_mmap'] = lambda: CompactReplayBuffer(args.size, observation_space, action_space, 'cpu',
+                                                              n_envs=args.n_envs, path=args.mmap)
+
+    results = {}
+    for name, make_buffer in buffers.items():
+        buffer = make_buffer()
+        result = bench(buffer, steps, args.size, args.batch_size, args.samples)
+        result['bytes_per_transition'] = buffer_bytes(buffer) / (buffer.buffer_size * buffer.n_envs)
+        results[name] = result
+        print(f"{name:13s} {result['bytes_per_transition']:6.1f} B/transition, "
+              f"add {result['transitions_per_sec_add']:10.0f}/s, "
+              f"sample({args.batch_size}) {result['sample_ms']:.3f} ms")
+        del buffer
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,66 @@
+"""
+Time-to-first-step of SubprocVecEnv training setups.
+
+Usage:
+    python -m benchmarks.startup                       # 16 and 64 workers, headless
+    python -m benchmarks.startup --workers 16 --pygame # workers initialize pygame like before
+"""
+import argparse
+import json
+import resource
+import time
+
+import numpy as np
+from stable_baselines3.common.vec_env import SubprocVecEnv
+
+from environmetns.registry import ENV_TYPES, make_env
+
+
+def make_env_fn(env_name, init_pygame):
+    def _init():
+        if init_pygame:
+            # what every worker paid when env_simple called pygame.init() at import time
+            import pygame
+            pygame.init()
+        return make_env(env_name)
+
+    return _init
+
+
+def time_to_first_step(env_name, n_workers, init_pygame=False):
+    start = time.perf_counter()
+    env = SubprocVecEnv([make_env_fn(env_name, init_pygame) for _ in range(n_workers)])
+    created = time.perf_counter()
+    env.reset()
+    env.step(np.zeros((n_workers,) + env.action_space.shape, dtype=np.float32))
+    first_step = time.perf_counter()
+    env.close()
+    return {
+        'env': env_name,
+        'workers': n_workers,
+        'pygame': init_pygame,
+        'create_s': created - start,
+        'time_to_first_step_s': first_step - start,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--env', default='simple', choices=list(ENV_TYPES))
+    parser.add_argument('--workers', type=int, nargs='+', default=[16, 64])
+    parser.add_argument('--pygame', action='store_true', help='initialize pygame in every worker')
+    parser.add_argument('--output', help='write results to this JSON file')
+    args = parser.parse_args()
+
+    results = []
+    for n in args.workers:
+        result = time_to_first_step(args.env, n, args.pygame)
+        results.append(result)
+        print(f"{result['env']:8s} workers={n:3d} pygame={args.pygame}: "
+              f"time to first step {result['time_to_first_step_s']:.2f}s")
+    # peak resident memory of a single worker process
+    peak_kb = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    print(f"peak worker RSS: {peak_kb / 1024:.1f} MiB")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'results': results, 'peak_worker_rss_kb': peak_kb}, f, indent=2)
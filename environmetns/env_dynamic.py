@@ -1,9 +1,8 @@
 from typing import Optional
 
 import numpy as np
-import pygame
 
-from environmetns.env_simple import SimpleEnv, STATE_H, STATE_W, STATE_BORDER
+from environmetns.env_simple import SimpleEnv, STATE_H, STATE_W, border_restricted_map, disc_offsets
 from environmetns.player import SimpleHumanPlayer, SimplePlayer
 
 BIG_RADIUS = 12
@@ -11,75 +10,135 @@ SMALL_RADIUS = 8
 INTER_POINT_MIN_DELTA = 15
 INTER_POINT_MAX_DELTA = 30
 CORRIDOR_POINTS = 20
+# candidates drawn per env and round when sampling intermediate points
+INTER_POINT_BATCH = 8
+INTER_POINT_MAX_ROUNDS = 32
+
+
+def sample_intermediate_points(players_xy, targets_xy, restricted_maps, rng, batch=INTER_POINT_BATCH,
+                               return_retries=False):
+    """
+    Batched `DynamicEnv.generate_intermediate_point` for N (player, target) pairs.
+
+    Candidates are drawn in blocks of `batch` per env and filtered against `restricted_maps`
+    (one (W, H) map shared by all envs or a (N, W, H) stack) in one lookup per round.
+    `rng` is the np.random.Generator of the env(s).
+    With `return_retries`, also returns the number of rejected candidates per env.
+    """
+    players_xy = np.asarray(players_xy, dtype=np.float64).reshape(-1, 2)
+    targets_xy = np.asarray(targets_xy, dtype=np.float64).reshape(-1, 2)
+    n = len(players_xy)
+    middle = (players_xy + targets_xy) / 2
+    points = middle.copy()
+    retries = np.zeros(n, dtype=np.int64)
+    pending = np.arange(n)
+    for _ in range(INTER_POINT_MAX_ROUNDS):
+        if not len(pending):
+            break
+        shape = (len(pending), batch, 2)
+        # same distribution as the original `delta * 1 if random < 0.5 else -1` expression
+        delta = np.where(rng.random(shape) < 0.5,
+                         rng.integers(INTER_POINT_MIN_DELTA, INTER_POINT_MAX_DELTA, shape), -1)
+        candidates = middle[pending, None, :] + delta
+        x, y = candidates[..., 0], candidates[..., 1]
+        outside = (x < 0) | (x >= STATE_W) | (y < 0) | (y >= STATE_H)
+        xi = np.clip(x, 0, STATE_W - 1).astype(int)
+        yi = np.clip(y, 0, STATE_H - 1).astype(int)
+        if restricted_maps.ndim == 2:
+            restricted = outside | restricted_maps[xi, yi]
+        else:
+            restricted = outside | restricted_maps[pending[:, None], xi, yi]
+        ok = ~restricted
+        found = ok.any(axis=1)
+        first = ok.argmax(axis=1)
+        points[pending[found]] = candidates[found, first[found]]
+        retries[pending] += np.where(found, first, batch)
+        pending = pending[~found]
+    # leftovers (practically unreachable with border-only maps) fall back to the midpoint
+    if return_retries:
+        return points, retries
+    return points
+
+
+def _fill_discs(safe, centers, radius):
+    # pygame.draw.circle of (N, M) centers into (N, W, H) grids, clipped to the grids
+    dx, dy = disc_offsets(radius)
+    centers = np.trunc(centers).astype(np.intp)
+    xs = centers[..., 0, None] + dx
+    ys = centers[..., 1, None] + dy
+    envs = np.broadcast_to(np.arange(len(safe))[:, None, None], xs.shape)
+    inside = (xs >= 0) & (xs < STATE_W) & (ys >= 0) & (ys < STATE_H)
+    safe[envs[inside], xs[inside], ys[inside]] = True
+
+
+def restricted_zones_maps(players_xy, targets_xy, intermediate_xy, base_map=None):
+    """
+    Occupancy grids (N, W, H) of DynamicEnv restricted zones: everything is restricted except
+    circles around player, target and intermediate point and the corridors of CORRIDOR_POINTS
+    smaller circles player -> intermediate point and target -> intermediate point.
+    Pixels are the ones pygame.draw.circle fills. Borders of `base_map` stay restricted.
+    """
+    players_xy = np.asarray(players_xy, dtype=np.float64).reshape(-1, 2)
+    targets_xy = np.asarray(targets_xy, dtype=np.float64).reshape(-1, 2)
+    intermediate_xy = np.asarray(intermediate_xy, dtype=np.float64).reshape(-1, 2)
+    if base_map is None:
+        base_map = border_restricted_map()
+
+    safe = np.zeros((len(players_xy), STATE_W, STATE_H), dtype=bool)
+    _fill_discs(safe, np.stack([players_xy, targets_xy, intermediate_xy], axis=1), BIG_RADIUS)
+    coef = (np.arange(CORRIDOR_POINTS) / CORRIDOR_POINTS)[:, None]
+    corridors = [start[:, None] * (1 - coef) + intermediate_xy[:, None] * coef for start in (players_xy, targets_xy)]
+    _fill_discs(safe, np.concatenate(corridors, axis=1), SMALL_RADIUS)
+    return ~safe | base_map
 
 
 class DynamicEnv(SimpleEnv):
+    # zones between the drone and its target
+    TARGET_DEPENDENT_MAP = True
 
-    def __init__(self, player: SimplePlayer, time_limit=60, render_mode: Optional[str] = None):
-        super().__init__(player, time_limit, render_mode)
+    def __init__(self, player: SimplePlayer, time_limit=60, render_mode: Optional[str] = None, ray_mode='point',
+                 profile=False, layout: Optional[str] = None, frame_skip=1):
+        super().__init__(player, time_limit, render_mode, ray_mode, profile, layout, frame_skip)
         # if this value != player.target_count, on step call background will be redrawn
         self.last_render_target_counter = -1
 
-    def reset(self, **kwargs):
+    def reset(self, seed: Optional[int] = None, options: Optional[dict] = None):
         self.last_render_target_counter = -1
-        return SimpleEnv.reset(self, **kwargs)
+        return SimpleEnv.reset(self, seed=seed, options=options)
+
+    @property
+    def base_restricted_map(self):
+        # static layout under the zones, targets and intermediate points are sampled against it
+        return self.static_restricted_map()
 
     def generate_next_target(self):
-        self.background_cache = SimpleEnv.static_background(self)
+        self.set_restricted_map(self.base_restricted_map)
         return SimpleEnv.generate_next_target(self)
 
     def step(self, action):
         if self.last_render_target_counter != self.player.target_counter:
+            if self.profiler:
+                t = self.profiler.start()
             self.generate_restricted_zones()
             self.last_render_target_counter = self.player.target_counter
+            if self.profiler:
+                self.profiler.lap('zones', t)
+                self.profiler.count('zone_regenerations')
         return SimpleEnv.step(self, action)
 
     def generate_intermediate_point(self):
-        p_x, p_y = self.player.current_xy()
-        t_x, t_y = self.player.current_target_xy()
-
-        x = (p_x + t_x) / 2
-        y = (p_y + t_y) / 2
-
-        x += np.random.randint(INTER_POINT_MIN_DELTA, INTER_POINT_MAX_DELTA) * 1 if np.random.random() < 0.5 else -1
-        y += np.random.randint(INTER_POINT_MIN_DELTA, INTER_POINT_MAX_DELTA) * 1 if np.random.random() < 0.5 else -1
-        if not self.check_point_restricted(x, y):
-            return x, y
-        return self.generate_intermediate_point()
+        points, retries = sample_intermediate_points(self.player.current_xy(), self.player.current_target_xy(),
+                                                     self.base_restricted_map, self.np_random,
+                                                     return_retries=True)
+        if self.profiler:
+            self.profiler.count('intermediate_point_retries', int(retries[0]))
+        return points[0, 0], points[0, 1]
 
     def generate_restricted_zones(self):
-        self.background_cache = SimpleEnv.static_background(self)
         intermediate_point = self.generate_intermediate_point()
-        canvas = self.background_cache  # parent's static_background (just borders)
-        canvas.fill(self.restricted_background_color, (0, 0, STATE_W, STATE_H))
-        # safe zone around player
-        pygame.draw.circle(canvas, self.background_color, self.player.current_xy(), BIG_RADIUS)
-        # safe zone around target
-        pygame.draw.circle(canvas, self.background_color, self.player.current_target_xy(), BIG_RADIUS)
-        # safe zone around intermediate point
-        pygame.draw.circle(canvas, self.background_color, intermediate_point, BIG_RADIUS)
-        # safe corridor between points
-        p_x, p_y = self.player.current_xy()
-        i_x, i_y = intermediate_point
-        t_x, t_y = self.player.current_target_xy()
-        for i in range(CORRIDOR_POINTS):
-            coef = i / CORRIDOR_POINTS
-            x = p_x * (1 - coef) + i_x * coef
-            y = p_y * (1 - coef) + i_y * coef
-            pygame.draw.circle(canvas, self.background_color, (x, y), SMALL_RADIUS)
-        for i in range(CORRIDOR_POINTS):
-            coef = i / CORRIDOR_POINTS
-            x = t_x * (1 - coef) + i_x * coef
-            y = t_y * (1 - coef) + i_y * coef
-            pygame.draw.circle(canvas, self.background_color, (x, y), SMALL_RADIUS)
-        # restore restricted borders
-        pygame.draw.rect(canvas, self.restricted_background_color, (0, 0, STATE_BORDER, STATE_H))
-        pygame.draw.rect(canvas, self.restricted_background_color, (0, 0, STATE_W, STATE_BORDER))
-        pygame.draw.rect(canvas, self.restricted_background_color, (STATE_W - STATE_BORDER, 0, STATE_BORDER, STATE_H))
-        pygame.draw.rect(canvas, self.restricted_background_color,
-                         (STATE_BORDER, STATE_H - STATE_BORDER, STATE_W, STATE_BORDER))
-
-        self.background_cache = canvas
+        restricted_map = restricted_zones_maps(self.player.current_xy(), self.player.current_target_xy(),
+                                               intermediate_point, self.base_restricted_map)[0]
+        self.set_restricted_map(restricted_map)
 
 
 if __name__ == '__main__':
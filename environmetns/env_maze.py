@@ -1,36 +1,35 @@
-from math import sqrt
-
-from environmetns.env_simple import SimpleEnv, STATE_BORDER, STATE_W, STATE_H
+from environmetns.env_simple import SimpleEnv, STATE_BORDER, STATE_W, STATE_H, border_restricted_map
+from environmetns.maps import register_layout
 from environmetns.player import SimpleHumanPlayer
 
 WALL_W = 8
 WALL_H = 16
 
 
-class MazeEnv(SimpleEnv):
+def draw_wall(restricted_map, x1, y1, w, h):
+    # left,top,w,h
+    restricted_map[x1:x1 + w, y1:y1 + h] = True
+
+
+def maze_restricted_map():
+    # Background and borders
+    restricted_map = border_restricted_map()
+    # Maze
+    draw_wall(restricted_map, STATE_BORDER, STATE_BORDER, WALL_W, WALL_H)
+    draw_wall(restricted_map, int(STATE_W / 2 - STATE_BORDER), STATE_BORDER * 2, WALL_W, WALL_H)
+    draw_wall(restricted_map, (STATE_W - STATE_BORDER - WALL_H), STATE_BORDER + WALL_H, WALL_H, WALL_W)
+    draw_wall(restricted_map, STATE_BORDER, int(STATE_W / 2), WALL_H, WALL_W)
+    draw_wall(restricted_map, STATE_BORDER + WALL_H, STATE_H - STATE_BORDER - WALL_H, WALL_W, WALL_H)
+    draw_wall(restricted_map, STATE_W - STATE_BORDER * 4, STATE_H - STATE_BORDER * 3 - WALL_W, WALL_H, WALL_W)
+    return restricted_map
 
-    def static_background(self):
-        # Background and borders
-        canvas = SimpleEnv.static_background(self)
-        # Maze
-        diag = sqrt(STATE_W ** 2 + STATE_H ** 2)
-        # quarter circles
-        self._draw_wall(canvas, STATE_BORDER, STATE_BORDER, WALL_W, WALL_H)
-        self._draw_wall(canvas, int(STATE_W / 2 - STATE_BORDER), STATE_BORDER * 2, WALL_W, WALL_H)
-        self._draw_wall(canvas, (STATE_W - STATE_BORDER - WALL_H), STATE_BORDER + WALL_H, WALL_H, WALL_W)
-        self._draw_wall(canvas, STATE_BORDER, int(STATE_W / 2), WALL_H, WALL_W)
-        self._draw_wall(canvas, STATE_BORDER + WALL_H, STATE_H - STATE_BORDER - WALL_H, WALL_W, WALL_H)
-        self._draw_wall(canvas, STATE_W - STATE_BORDER * 4, STATE_H - STATE_BORDER * 3 - WALL_W, WALL_H,
-                        WALL_W)
-
-        return canvas
-
-    def _draw_wall(self, canvas, x1, y1, w, h):
-        canvas.fill(
-            self.restricted_background_color,
-            # left,top,w,h
-            rect=(x1, y1, w, h)
-        )
+
+register_layout('maze', maze_restricted_map, sources=('environmetns.env_simple',))
+
+
+class MazeEnv(SimpleEnv):
+    """Fixed wall layout, or with `layout='procedural'` a random generated layout on every reset."""
+    LAYOUT = 'maze'
 
 
 if __name__ == '__main__':
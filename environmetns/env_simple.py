@@ -2,17 +2,21 @@
 Inspired by https://github.com/thowell/achtung/blob/main/achtung.py
 and https://github.com/Farama-Foundation/Gymnasium/blob/main/gymnasium/envs/box2d/car_racing.py
 """
+from functools import lru_cache
+from math import sqrt
 from typing import Optional
 
 import gymnasium as gym
 import numpy as np
-import pygame
 from gymnasium import spaces
 from gymnasium.utils import EzPickle
 
+from environmetns.maps import evict_deleted_libraries, get_library, register_layout
 from environmetns.player import SimpleHumanPlayer, SimplePlayer
+from environmetns.profiling import StepProfiler
+from environmetns.sdf import signed_distance_field, trace_rays
 
-pygame.init()
+# pygame is imported lazily, only for rendering: training envs never initialize it
 
 STATE_W = 100
 STATE_H = 100
@@ -25,14 +29,92 @@ WINDOW_W = 800
 WINDOW_H = 800
 
 FPS = 30
+# state_pixels frames are rgb_array frames averaged over 2x2 pixel blocks
+STATE_PIXELS_W = STATE_W // 2
+STATE_PIXELS_H = STATE_H // 2
+
+# 'point': ray flags tell if the ray end is restricted (trained models layout)
+# 'sdf': rays return proximity 1 - dist / ray_range of the first restricted point, sphere-traced over an SDF
+RAY_MODES = ('point', 'sdf')
+# signed distance fields kept per env, e.g. static and per-target maps of DynamicEnv
+SDF_CACHE_SIZE = 2
+# target candidates drawn at once from the env generator, consumed by successive generate_next_target calls
+TARGET_BATCH = 32
+
+
+def border_restricted_map():
+    # occupancy grid of SimpleEnv: only the borders are restricted
+    restricted_map = np.ones((STATE_W, STATE_H), dtype=bool)
+    restricted_map[STATE_BORDER:STATE_W - STATE_BORDER, STATE_BORDER:STATE_H - STATE_BORDER] = False
+    return restricted_map
+
+
+register_layout('simple', border_restricted_map)
+
+
+@lru_cache(maxsize=None)
+def disc_offsets(radius):
+    """
+    x and y pixel offsets filled by `pygame.draw.circle` around an integer center (pygame truncates float
+    centers): the midpoint algorithm of pygame's filled circles, without pygame.
+    """
+    rows = {}
+
+    def line(x1, y, x2):
+        lo, hi = rows.get(y, (x1, x2))
+        rows[y] = (min(lo, x1), max(hi, x2))
+
+    f, ddf_x, ddf_y, x, y = 1 - radius, 0, -2 * radius, 0, radius
+    while x < y:
+        if f >= 0:
+            y -= 1
+            ddf_y += 2
+            f += ddf_y
+        x += 1
+        ddf_x += 2
+        f += ddf_x + 1
+        if f >= 0:
+            line(-x, y - 1, x - 1)
+            line(-x, -y, x - 1)
+        line(-y, x - 1, y - 1)
+        line(-y, -x, y - 1)
+    dx = np.concatenate([np.arange(lo, hi + 1) for lo, hi in rows.values()])
+    dy = np.concatenate([np.full(hi - lo + 1, y) for y, (lo, hi) in rows.items()])
+    return dx, dy
+
+
+def draw_disc(frame, x, y, radius, color):
+    # in place on an (W, H, 3) frame, clipped like pygame
+    dx, dy = disc_offsets(radius)
+    x, y = int(x), int(y)
+    xs, ys = dx + x, dy + y
+    if not (radius <= x < frame.shape[0] - radius and radius <= y < frame.shape[1] - radius):
+        inside = (xs >= 0) & (xs < frame.shape[0]) & (ys >= 0) & (ys < frame.shape[1])
+        xs, ys = xs[inside], ys[inside]
+    frame[xs, ys] = color
 
 
 class Target:
+    __slots__ = ('x', 'y')
+
     def __init__(self, x, y):
         self.x = x
         self.y = y
 
 
+class StepState:
+    """Quantities derived from the player and target state, shared by a step's catch check, reward and round over."""
+    __slots__ = ('dist', 'catched', 'out_of_bounds', 'restricted', 'high_speed', 'high_angle')
+
+    def __init__(self, dist, catched, out_of_bounds, restricted, high_speed, high_angle):
+        self.dist = dist
+        self.catched = catched
+        self.out_of_bounds = out_of_bounds
+        self.restricted = restricted
+        self.high_speed = high_speed
+        self.high_angle = high_angle
+
+
 class SimpleEnv(gym.Env, EzPickle):
     metadata = {
         "render_modes": [
@@ -50,21 +132,30 @@ class SimpleEnv(gym.Env, EzPickle):
     HIGH_ANGLE_REWARD = -10
     RESTRICTED_ZONE_REWARD = -5
 
-    def __init__(self, player: SimplePlayer, time_limit=60, render_mode: Optional[str] = None):
-        EzPickle.__init__(self, player, time_limit, render_mode)
-        # pygame
-        self.window = None
-        self.fps_clock = None
-        self.myfont = None
+    # map library of the static layout, see environmetns.maps
+    LAYOUT = 'simple'
+    # the restricted map is regenerated when the target changes, a frame_skip step then ends after one frame
+    TARGET_DEPENDENT_MAP = False
+
+    def __init__(self, player: SimplePlayer, time_limit=60, render_mode: Optional[str] = None, ray_mode='point',
+                 profile=False, layout: Optional[str] = None, frame_skip=1):
+        EzPickle.__init__(self, player, time_limit, render_mode, ray_mode, profile, layout, frame_skip)
+        if ray_mode not in RAY_MODES:
+            raise ValueError(f'Unexpected ray mode {ray_mode}. Please, choose one of {RAY_MODES}')
+        if frame_skip < 1:
+            raise ValueError(f'frame_skip must be at least 1, got {frame_skip}')
+        self.ray_mode = ray_mode
+        # physics frames per step, all with the same action, see step_frames
+        self.frame_skip = frame_skip
+        self._sdf_cache = []
+        # phase timings and counters reported in info['profile'] of every step
+        self.profiler = StepProfiler() if profile else None
+        # pygame window, only in human mode
+        self.human_renderer = None
         self.render_mode = render_mode
         if self.render_mode == 'human':
-            pygame.init()
-            self.window = pygame.display.set_mode((WINDOW_W, WINDOW_H))
-            pygame.display.init()
-            pygame.display.set_caption('Drone environments')
-            pygame.font.init()
-            self.myfont = pygame.font.SysFont("Comic Sans MS", 20)
-            self.fps_clock = pygame.time.Clock()
+            from environmetns.rendering import HumanRenderer
+            self.human_renderer = HumanRenderer()
 
         self.window_width = WINDOW_W
         self.window_height = WINDOW_H
@@ -86,122 +177,329 @@ class SimpleEnv(gym.Env, EzPickle):
         self.restricted_background_color = np.array([50, 50, 50])
         self.font_color = np.array([200, 200, 200])
 
-        self.background_cache = self.static_background()
+        # libraries with several layouts switch to a random one on every reset
+        self.map_library = get_library(layout or self.LAYOUT)
+        self.layout_index = 0
+        self._next_map_library = None
+        self._background_array = None
+        # reused rgb_array and state_pixels outputs
+        self._frame = np.empty((STATE_W, STATE_H, 3), dtype=np.uint8)
+        self._state_pixels = np.empty((STATE_PIXELS_W, STATE_PIXELS_H, 3), dtype=np.float32)
+        self._block_rows = np.empty((STATE_PIXELS_W, STATE_H, 3), dtype=np.uint16)
+        self._block_sums = np.empty((STATE_PIXELS_W, STATE_PIXELS_H, 3), dtype=np.uint16)
+        self.restricted_map = None
+        self._target_candidates = np.empty((0, 2), dtype=np.int64)
+        self._step_state = None
+        self.set_restricted_map(self.static_restricted_map())
 
         # Init agents
         self.player = player
+        # frame_skip velocities in closed form: v_i = decay_i * v_0 + geometric_i * (per-frame velocity change)
+        powers = player.friction ** np.arange(frame_skip)
+        self._frame_decay = (powers * player.friction)[:, None]
+        self._frame_geometric = np.cumsum(powers)[:, None]
+        self._frame_steps = np.arange(1, frame_skip + 1)
 
         # gym
         self.action_space = self.player.action_space
-        # [dx, dy, dx_target, dy_target] + rays8
+        # [xd, yd, dx_target, dy_target, dx_target2, dy_target2] + rays (8 by default)
+        n_rays = self.player.n_rays
         self.observation_space = spaces.Box(
-            low=np.array([-STATE_W, -STATE_H, -STATE_W, -STATE_H, -STATE_W, -STATE_H, 0, 0, 0, 0, 0, 0, 0, 0]).astype(
+            low=np.array([-STATE_W, -STATE_H, -STATE_W, -STATE_H, -STATE_W, -STATE_H] + [0] * n_rays).astype(
                 np.float32),
-            high=np.array([STATE_W, STATE_H, STATE_W, STATE_H, STATE_W, STATE_H, 1, 1, 1, 1, 1, 1, 1, 1]).astype(
+            high=np.array([STATE_W, STATE_H, STATE_W, STATE_H, STATE_W, STATE_H] + [1] * n_rays).astype(
                 np.float32),
         )
         self.reset()
 
-    def static_background(self):
-        canvas = pygame.Surface((STATE_W, STATE_H))
-        canvas.fill(self.restricted_background_color)
-        canvas.fill(
-            self.background_color,
-            # left,top,w,h
-            rect=(STATE_BORDER, STATE_BORDER, STATE_W - 2 * STATE_BORDER, STATE_H - 2 * STATE_BORDER)
-        )
-        return canvas
+    def static_restricted_map(self):
+        # occupancy grid indexed as [x, y], True where the point is restricted: read-only view of the library
+        return self.map_library[self.layout_index][0]
+
+    def use_map_library(self, name, directory=None):
+        """Switch to another map library from the next reset on, e.g. a refreshed procedural pool."""
+        # pools replaced since stay mapped only as long as an env still uses them
+        evict_deleted_libraries()
+        self._next_map_library = get_library(name, directory)
+
+    def set_restricted_map(self, restricted_map):
+        # keep the same map object for unchanged layouts, so derived data (SDF, background) stays cached
+        if self.restricted_map is not None and (
+                restricted_map is self.restricted_map or np.array_equal(restricted_map, self.restricted_map)):
+            return
+        self.restricted_map = restricted_map
+        # background is redrawn from the map on the next render
+        self._background_array = None
+        self._step_state = None
+
+    def background_array(self):
+        """Read-only (W, H, 3) uint8 colors of the current restricted map, built once per map."""
+        if self._background_array is None:
+            colors = np.where(self.restricted_map[..., None], self.restricted_background_color, self.background_color)
+            self._background_array = colors.astype(np.uint8)
+            self._background_array.flags.writeable = False
+        return self._background_array
+
+    def signed_distance_field(self):
+        # computed once per restricted map, maps are replaced (never modified in place) on change
+        for restricted_map, sdf in self._sdf_cache:
+            if restricted_map is self.restricted_map:
+                return sdf
+        static_map, sdf = self.map_library[self.layout_index]
+        if self.restricted_map is not static_map:
+            sdf = signed_distance_field(self.restricted_map)
+        self._sdf_cache = [(self.restricted_map, sdf)] + self._sdf_cache[:SDF_CACHE_SIZE - 1]
+        return sdf
 
     def generate_next_target(self):
-        x = np.random.randint(STATE_BORDER, STATE_W - STATE_BORDER)
-        y = np.random.randint(STATE_BORDER, STATE_H - STATE_BORDER)
-        if not self.check_point_restricted(x, y):
-            return Target(x, y)
-        return self.generate_next_target()
+        # candidates are drawn in blocks from self.np_random and filtered against the current map in one lookup,
+        # they always lie inside the grid
+        while True:
+            candidates = self._target_candidates
+            if not len(candidates):
+                candidates = self.np_random.integers((STATE_BORDER, STATE_BORDER),
+                                                     (STATE_W - STATE_BORDER, STATE_H - STATE_BORDER),
+                                                     size=(TARGET_BATCH, 2))
+            free = ~self.restricted_map[candidates[:, 0], candidates[:, 1]]
+            i = int(free.argmax()) if free.any() else len(candidates)
+            self._target_candidates = candidates[i + 1:]
+            if self.profiler and i:
+                self.profiler.count('target_retries', i)
+            if i < len(candidates):
+                return Target(int(candidates[i, 0]), int(candidates[i, 1]))
 
     def on_player_catched_target(self):
         new_target = self.generate_next_target()
         self.player.on_target_catched(new_target)
+        self._step_state = None
+
+    def step_state(self):
+        """
+        Snapshot of the derived quantities for the current player position and target, computed once
+        and reused until the player moves, the target changes or the restricted map is replaced.
+        """
+        if self._step_state is None:
+            player = self.player
+            x, y = player.x, player.y
+            target = player.current_target
+            dist = sqrt((x - target.x) ** 2 + (y - target.y) ** 2)
+            self._step_state = StepState(
+                dist=dist,
+                catched=dist <= TARGET_RADIUS,
+                out_of_bounds=x < 0 or x > STATE_W or y < 0 or y > STATE_H,
+                restricted=self.check_point_restricted(x, y),
+                high_speed=abs(player.ad) > 5 or abs(player.xd) > 40 or abs(player.yd) > 40,
+                high_angle=abs(player.a) % 180 > 30,
+            )
+        return self._step_state
 
     def check_point_restricted(self, x, y):
-        if x < 0 or x > STATE_W or y < 0 or y > STATE_H:
+        if x < 0 or x >= STATE_W or y < 0 or y >= STATE_H:
             return True
-        return np.allclose(self.background_cache.get_at((int(x), int(y)))[:3], self.restricted_background_color)
+        return bool(self.restricted_map[int(x), int(y)])
+
+    def check_points_restricted(self, points):
+        """Vectorized `check_point_restricted` for an array of (x, y) points."""
+        points = np.asarray(points)
+        x, y = points[..., 0], points[..., 1]
+        outside = (x < 0) | (x >= STATE_W) | (y < 0) | (y >= STATE_H)
+        # cells of outside points are clamped to the grid, their result is `outside` anyway
+        xi = np.minimum(np.maximum(x.astype(np.intp), 0), STATE_W - 1)
+        yi = np.minimum(np.maximum(y.astype(np.intp), 0), STATE_H - 1)
+        return outside | self.restricted_map[xi, yi]
 
     def get_obs(self):
         player = self.player
         x, y = player.x, player.y
-        xt, yt = player.current_target_xy()
-        xt2, yt2 = player.next_target_xy()
+        target, target2 = player.current_target, player.next_target
 
         xd, yd = player.xd, player.yd
-        dx_target = xt - player.x
-        dy_target = yt - player.y
-        dx_target2 = xt2 - player.x
-        dy_target2 = yt2 - player.y
+        dx_target = target.x - x
+        dy_target = target.y - y
+        dx_target2 = target2.x - x
+        dy_target2 = target2.y - y
         # dist = player.dist_to_target()
         # angle = player.angle_to_target()
         # angle_target_and_velocity = player.angle_target_and_velocity()
-        rays8 = [1 if self.check_point_restricted(*point) else 0 for point in np.array([x, y]) + self.player.rays8_mask]
+        if self.ray_mode == 'sdf':
+            dist = trace_rays(self.signed_distance_field(), [(x, y)], player.ray_directions, player.ray_range)[0]
+            rays = 1 - dist / player.ray_range
+        else:
+            rays = self.check_points_restricted(np.array([x, y]) + player.rays_mask)
 
-        return np.array(
-            [xd, yd, dx_target, dy_target, dx_target2, dy_target2] + rays8
-        ).astype(np.float32)
+        obs = np.empty(6 + len(rays), dtype=np.float32)
+        obs[:6] = (xd, yd, dx_target, dy_target, dx_target2, dy_target2)
+        obs[6:] = rays
+        return obs
 
     def check_round_over(self):
-        self.game_over = self.time >= self.time_limit or \
-                         self.player.x < 0 or self.player.x > STATE_W or \
-                         self.player.y < 0 or self.player.y > STATE_H
+        self.game_over = self.time >= self.time_limit or self.step_state().out_of_bounds
         return self.game_over
 
     def check_target_catched(self):
-        dist = self.player.dist_to_target()
-        return dist <= TARGET_RADIUS
+        return self.step_state().catched
 
     def reward(self):
-        dist = self.player.dist_to_target()
+        state = self.step_state()
         reward = 0
         # 1. Penalty according to the distance to target
-        reward += self.DIST_REWARD_COEF * dist / self.FPS
+        reward += self.DIST_REWARD_COEF * state.dist / self.FPS
         # 2. Reward if close to target
-        if self.check_target_catched():
+        if state.catched:
             reward += self.TARGET_REWARD
         # 3. Penalty if out of playground
-        if self.player.x < 0 or self.player.x > STATE_W or self.player.y < 0 or self.player.y > STATE_H:
+        if state.out_of_bounds:
             reward += self.OUT_OF_BOUND_REWARD
         # 4. Penalty if too high speed
-        if abs(self.player.ad) > 5 or abs(self.player.xd) > 40 or abs(self.player.yd) > 40:
+        if state.high_speed:
             reward += self.HIGH_SPEED_REWARD
         # 5. penalty for high angle
-        if abs(self.player.a) % 180 > 30:
+        if state.high_angle:
             reward += self.HIGH_ANGLE_REWARD
         # 6. penalty if on restricted zone
-        if self.check_point_restricted(*self.player.current_xy()):
+        if state.restricted:
             reward += self.RESTRICTED_ZONE_REWARD
         return reward
 
     def step(self, action):
+        if self.frame_skip > 1 and not self.game_over:
+            return self.step_frames(action)
+        profiler = self.profiler
+        if profiler:
+            t = profiler.start()
         self.time += self.dt
         # update current player
         self.player.update(action)
+        if profiler:
+            t = profiler.lap('update', t)
         if self.check_target_catched():
             self.on_player_catched_target()
+            if profiler:
+                profiler.count('targets_catched')
+        if profiler:
+            t = profiler.lap('catch', t)
+        # the catch check above still used the snapshot of the previous move
+        self._step_state = None
         if not self.game_over:
             self.player.move(self.dt)
             # check round over
             self.check_round_over()
+        if profiler:
+            t = profiler.lap('move', t)
 
         state = self.get_obs()
+        if profiler:
+            t = profiler.lap('obs', t)
         reward = self.reward()
+        if profiler:
+            profiler.lap('reward', t)
+        self.frame_count += 1
         self.total_reward += reward
         done = self.game_over
-        return state, reward, done, False, {}
+        info = {'profile': profiler.pop()} if profiler else {}
+        return state, reward, done, False, info
+
+    def step_frames(self, action):
+        """
+        Up to `frame_skip` physics frames with one action, computed as arrays: the damped velocity recurrence in
+        closed form, positions as cumulative sums, then the step state and reward of every frame. The step ends
+        early at the first frame that ends the round or reaches the target (the target is switched at the
+        start of the next step, as with single frames). Reward is the sum of the frame rewards, its terms are in
+        `info['reward_terms']` and the number of frames in `info['frames']`.
+        """
+        profiler = self.profiler
+        if profiler:
+            t = profiler.start()
+        caught_now = self.check_target_catched()
+        if caught_now:
+            self.on_player_catched_target()
+            if profiler:
+                profiler.count('targets_catched')
+        if profiler:
+            t = profiler.lap('catch', t)
+
+        player = self.player
+        dt = self.dt
+        gain = (float(action[1]) * player.action_coef + player.xdd * dt,
+                -float(action[0]) * player.action_coef + player.ydd * dt)
+        # (frame_skip, 2) velocities and positions
+        velocity = self._frame_decay * (player.xd, player.yd) + self._frame_geometric * gain
+        position = np.cumsum(velocity, axis=0)
+        position *= dt
+        position += (player.x, player.y)
+        ad = player.ad + player.add * dt * self._frame_steps
+        a = player.a + np.cumsum(ad) * dt
+        # same float additions as repeated single-frame steps, for the time limit
+        times = np.cumsum(np.concatenate([[self.time], np.full(self.frame_skip, dt)]))[1:]
+
+        target = player.current_target
+        dist = np.hypot(position[:, 0] - target.x, position[:, 1] - target.y)
+        catched = dist <= TARGET_RADIUS
+        out_of_bounds = ((position < 0) | (position > (STATE_W, STATE_H))).any(axis=1)
+        restricted = self.check_points_restricted(position)
+        high_speed = (np.abs(velocity) > 40).any(axis=1) | (np.abs(ad) > 5)
+        high_angle = np.abs(a) % 180 > 30
+        game_over = (times >= self.time_limit) | out_of_bounds
+        stops = np.flatnonzero(game_over | catched)
+        n = int(stops[0]) + 1 if len(stops) else self.frame_skip
+        if n > 1 and caught_now and self.TARGET_DEPENDENT_MAP:
+            # the map of the new target is generated on the next step
+            n = 1
+        if profiler:
+            t = profiler.lap('frames', t)
+            profiler.count('frames', n)
+
+        i = n - 1
+        player.x, player.y = (float(v) for v in position[i])
+        player.xd, player.yd = (float(v) for v in velocity[i])
+        player.a, player.ad = float(a[i]), float(ad[i])
+        self.time = float(times[i])
+        self.game_over = bool(game_over[i])
+        self._step_state = StepState(
+            dist=float(dist[i]),
+            catched=bool(catched[i]),
+            out_of_bounds=bool(out_of_bounds[i]),
+            restricted=bool(restricted[i]),
+            high_speed=bool(high_speed[i]),
+            high_angle=bool(high_angle[i]),
+        )
+        # the terms of `reward`, summed over the frames of the step
+        reward_terms = np.array([
+            self.DIST_REWARD_COEF * dist[:n].sum() / self.FPS,
+            self.TARGET_REWARD * np.count_nonzero(catched[:n]),
+            self.OUT_OF_BOUND_REWARD * np.count_nonzero(out_of_bounds[:n]),
+            self.HIGH_SPEED_REWARD * np.count_nonzero(high_speed[:n]),
+            self.HIGH_ANGLE_REWARD * np.count_nonzero(high_angle[:n]),
+            self.RESTRICTED_ZONE_REWARD * np.count_nonzero(restricted[:n]),
+        ])
+        reward = float(reward_terms.sum())
 
-    def reset(self, **kwargs):
+        state = self.get_obs()
+        if profiler:
+            profiler.lap('obs', t)
+        self.frame_count += n
+        self.total_reward += reward
+        info = {'frames': n, 'reward_terms': reward_terms}
+        if profiler:
+            info['profile'] = profiler.pop()
+        return state, reward, self.game_over, False, info
+
+    def reset(self, seed: Optional[int] = None, options: Optional[dict] = None):
+        # seeds self.np_random, the only source of randomness of the env
+        super().reset(seed=seed)
+        if seed is not None:
+            self._target_candidates = self._target_candidates[:0]
         self.game_over = False
         self.time = 0
         self.frame_count = 0
         self.total_reward = 0.0
+        if self._next_map_library is not None:
+            self.map_library, self._next_map_library = self._next_map_library, None
+            self.layout_index = 0
+        if len(self.map_library) > 1:
+            self.layout_index = int(self.np_random.integers(len(self.map_library)))
+        # targets are sampled against the layout of the new episode
+        self.set_restricted_map(self.static_restricted_map())
 
         x, y = int(STATE_W / 2), int(STATE_H / 2)
         self.player.reset_player(
@@ -209,44 +507,47 @@ class SimpleEnv(gym.Env, EzPickle):
             current_target=self.generate_next_target(),
             next_target=self.generate_next_target()
         )
-        self.background_cache = self.static_background()
+        self._step_state = None
 
         return self.get_obs(), {}
 
-    def render_actor_and_target(self, canvas, actor):
-        # Target
-        target_center = actor.current_target_xy()
-        pygame.draw.circle(canvas, self.target_color, target_center, TARGET_RADIUS)
-
-        target2_center = actor.next_target_xy()
-        pygame.draw.circle(canvas, self.next_target_color, target2_center, TARGET_RADIUS)
-
-        # Actor
-        actor_xy = actor.current_xy()
-        # actor_asset_rotated = pygame.transform.rotate(actor.player_asset, actor.a)
-        pygame.draw.rect(canvas, self.player_color, (actor_xy, (1, 1)), 1)
+    def render_into(self, out):
+        """Draw the rgb_array frame into `out`, a (W, H, 3) uint8 array indexed [x, y], and return it."""
+        np.copyto(out, self.background_array())
+        player = self.player
+        draw_disc(out, *player.current_target_xy(), TARGET_RADIUS, self.target_color)
+        draw_disc(out, *player.next_target_xy(), TARGET_RADIUS, self.next_target_color)
+        # a single pixel, like the 1x1 rect drawn by pygame
+        x, y = int(player.x), int(player.y)
+        if 0 <= x < STATE_W and 0 <= y < STATE_H:
+            out[x, y] = self.player_color
+        return out
+
+    def render_state_pixels(self):
+        """(STATE_PIXELS_W, STATE_PIXELS_H, 3) float32 frame in [0, 1] of the rgb_array one, for pixel policies."""
+        frame = self.render_into(self._frame)
+        # pixel sums of 2x2 blocks in uint16: pairs along x, then along y
+        pairs = frame.reshape(STATE_W // 2, 2, STATE_H, 3)
+        np.add(pairs[:, 0], pairs[:, 1], out=self._block_rows, dtype=np.uint16)
+        pairs = self._block_rows.reshape(STATE_W // 2, STATE_H // 2, 2, 3)
+        np.add(pairs[:, :, 0], pairs[:, :, 1], out=self._block_sums)
+        np.multiply(self._block_sums, np.float32(1 / (255 * 4)), out=self._state_pixels)
+        return self._state_pixels
 
     def render(self, mode=None):
-        canvas = self.background_cache.copy()
-        self.render_actor_and_target(canvas, self.player)
-
-        if self.render_mode == "human":
-            # The following line copies our drawings from `canvas` to the visible window
-            self.window.blit(pygame.transform.scale(canvas, (WINDOW_W, WINDOW_H)), (0, 0))
-
-            textsurface1 = self.myfont.render(f"Time: {int(self.time)}", False, self.font_color)
-            self.window.blit(textsurface1, (20, 20))
-            textsurface2 = self.myfont.render(f"Total reward: {int(self.total_reward)}", False, self.font_color)
-            self.window.blit(textsurface2, (WINDOW_W / 3, 20))
-            textsurface3 = self.myfont.render(f"Collected: {self.player.target_counter}", False, self.font_color)
-            self.window.blit(textsurface3, (WINDOW_W / 4 * 3, 20))
-
-            pygame.event.pump()
-            pygame.display.update()
-
-            self.fps_clock.tick(self.FPS)
-        self.frame_count += 1
-        return np.array(pygame.surfarray.array3d(canvas), dtype=np.uint8)
+        mode = mode or self.render_mode
+        if mode == 'human':
+            self.human_renderer.draw(self)
+            return None
+        if mode == 'state_pixels':
+            return self.render_state_pixels().copy()
+        # callers may keep frames, the buffer is not handed out
+        return self.render_into(self._frame).copy()
+
+    def close(self):
+        if self.human_renderer is not None:
+            self.human_renderer.close()
+            self.human_renderer = None
 
 
 if __name__ == '__main__':
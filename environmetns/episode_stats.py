@@ -0,0 +1,93 @@
+"""
+In-process episode statistics of the drone envs, a replacement for the per-env Monitor CSV files:
+
+    env = make_vec_env(lambda: EpisodeStats(SimpleEnv(player=SimplePlayer())), n_envs=8)
+    model.learn(..., callback=EpisodeStatsCallback("tmp/episodes_simple"))
+
+Every finished episode is one row of EPISODE_COLUMNS: its reward split into the terms of `SimpleEnv.reward`.
+Rows are kept in the worker and shipped in `info['episode_stats']` batches, at most every `ship_interval`
+seconds, so that a SubprocVecEnv does not pickle them on every episode end.
+"""
+import time
+
+import gymnasium as gym
+import numpy as np
+
+# reward, length and wall time as in Monitor, then the summed reward terms of the episode
+EPISODE_COLUMNS = ('reward', 'length', 'time', 'targets', 'distance_reward', 'target_reward',
+                   'out_of_bounds_reward', 'high_speed_reward', 'high_angle_reward', 'restricted_zone_reward')
+REWARD_TERMS = EPISODE_COLUMNS[4:]
+SHIP_INTERVAL = 10.0
+SHIP_SIZE = 64
+
+
+class EpisodeStats(gym.Wrapper):
+    """
+    Accumulates the reward terms of every step from the env's `step_state()` and adds a Monitor-like
+    `info['episode'] = {'r', 'l', 't'}` at the end of each episode, which SB3 reads for `rollout/ep_rew_mean`.
+
+    :param ship_interval: seconds between two `info['episode_stats']` batches
+    :param ship_size: episodes kept before a batch is shipped regardless of the interval
+    """
+
+    def __init__(self, env, ship_interval=SHIP_INTERVAL, ship_size=SHIP_SIZE):
+        super().__init__(env)
+        self.ship_interval = ship_interval
+        self.t_start = time.time()
+        self._last_ship = self.t_start
+        self._rows = np.empty((ship_size, len(EPISODE_COLUMNS)), dtype=np.float64)
+        self._n_rows = 0
+        self._terms = np.zeros(len(REWARD_TERMS))
+        self._reward = 0.0
+        self._length = 0
+
+    def reset(self, **kwargs):
+        self._terms[:] = 0
+        self._reward = 0.0
+        self._length = 0
+        return self.env.reset(**kwargs)
+
+    def step(self, action):
+        obs, reward, terminated, truncated, info = self.env.step(action)
+        env = self.env.unwrapped
+        terms = self._terms
+        if 'reward_terms' in info:
+            # summed over the frames of a frame_skip step
+            terms += info['reward_terms']
+        else:
+            # the snapshot the reward was computed from
+            state = env.step_state()
+            terms[0] += env.DIST_REWARD_COEF * state.dist / env.FPS
+            if state.catched:
+                terms[1] += env.TARGET_REWARD
+            if state.out_of_bounds:
+                terms[2] += env.OUT_OF_BOUND_REWARD
+            if state.high_speed:
+                terms[3] += env.HIGH_SPEED_REWARD
+            if state.high_angle:
+                terms[4] += env.HIGH_ANGLE_REWARD
+            if state.restricted:
+                terms[5] += env.RESTRICTED_ZONE_REWARD
+        self._reward += reward
+        self._length += 1
+        if terminated or truncated:
+            self._end_episode(info, env.player.target_counter)
+        return obs, reward, terminated, truncated, info
+
+    def _end_episode(self, info, targets):
+        now = time.time()
+        elapsed = round(now - self.t_start, 6)
+        info['episode'] = {'r': round(self._reward, 6), 'l': self._length, 't': elapsed}
+        row = self._rows[self._n_rows]
+        row[:4] = self._reward, self._length, elapsed, targets
+        row[4:] = self._terms
+        self._n_rows += 1
+        if self._n_rows == len(self._rows) or now - self._last_ship >= self.ship_interval:
+            info['episode_stats'] = self.pop_episode_stats()
+            self._last_ship = now
+
+    def pop_episode_stats(self):
+        """Rows (n, len(EPISODE_COLUMNS)) of the episodes finished since the previous batch."""
+        rows = self._rows[:self._n_rows].copy()
+        self._n_rows = 0
+        return rows
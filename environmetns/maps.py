@@ -0,0 +1,182 @@
+"""
+Compiled map libraries: stacks of occupancy grids and their signed distance fields stored as .npy files.
+
+A library is compiled once from its registered builder and then memory-mapped read-only, so all processes
+of a machine share one physical copy and switching layouts on reset only swaps array views.
+
+Compiled files live in a per-user cache (`DRONE_MAPS_DIR` or `~/.cache/drone-maps`). Files of registered
+libraries are named after a hash of the source of their builder, so editing a builder recompiles its library
+on first use, under a lock so that concurrent env workers compile it once. They can also be compiled upfront:
+
+    python -m environmetns.maps simple maze procedural
+"""
+import argparse
+import glob
+import hashlib
+import importlib
+import os
+import sys
+from contextlib import contextmanager
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:
+    # no locking: concurrent processes may compile the same library, the atomic renames keep files complete
+    fcntl = None
+
+from environmetns.sdf import signed_distance_field
+
+MAPS_DIR = os.environ.get('DRONE_MAPS_DIR') or os.path.join(
+    os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache'), 'drone-maps')
+
+# library name -> function returning a (W, H) occupancy grid or a (K, W, H) stack
+LAYOUT_BUILDERS = {}
+# library name -> modules whose source the compiled library depends on
+LAYOUT_SOURCES = {}
+# modules registering the builtin libraries, imported on first use of a library
+LAYOUT_MODULES = {
+    'simple': 'environmetns.env_simple',
+    'maze': 'environmetns.env_maze',
+    'procedural': 'environmetns.maze_generator',
+}
+# libraries already opened by this process: envs key their caches by map identity
+_LIBRARIES = {}
+
+
+def register_layout(name, build, sources=()):
+    """
+    :param sources: modules the builder depends on besides its own, e.g. the module of a base map. Changing the
+        source of any of them recompiles the library
+    """
+    LAYOUT_BUILDERS[name] = build
+    LAYOUT_SOURCES[name] = (build.__module__, __name__, signed_distance_field.__module__) + tuple(sources)
+
+
+def fingerprint(name):
+    """Hash of the source of everything a registered library is compiled from."""
+    digest = hashlib.sha1()
+    for module in LAYOUT_SOURCES[name]:
+        with open(sys.modules[module].__file__, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:12]
+
+
+class MapLibrary:
+    """
+    K layouts: `occupancy` (K, W, H) bool and `sdf` (K, W, H) float32, usually memory-mapped from the file
+    `path` of the occupancy grids.
+    """
+
+    def __init__(self, occupancy, sdf, path=None):
+        self.occupancy = occupancy
+        self.sdf = sdf
+        self.path = path
+        # one view object per layout, the same object every time a layout is selected. Plain ndarray views of
+        # the mapped pages: np.memmap indexing goes through Python on every lookup
+        occupancy, sdf = np.asarray(occupancy), np.asarray(sdf)
+        self.layouts = [(occupancy[i], sdf[i]) for i in range(len(occupancy))]
+
+    def __len__(self):
+        return len(self.layouts)
+
+    def __getitem__(self, index):
+        return self.layouts[index]
+
+    @staticmethod
+    def paths(name, directory=None):
+        directory = directory or MAPS_DIR
+        return os.path.join(directory, f'{name}.occupancy.npy'), os.path.join(directory, f'{name}.sdf.npy')
+
+    @classmethod
+    def compile(cls, name, maps, directory=None):
+        maps = np.asarray(maps, dtype=bool)
+        if maps.ndim == 2:
+            maps = maps[None]
+        occupancy_path, sdf_path = cls.paths(name, directory)
+        os.makedirs(os.path.dirname(occupancy_path), exist_ok=True)
+        # concurrent workers may compile the same library: write aside, then rename atomically
+        for path, array in ((sdf_path, signed_distance_field(maps).astype(np.float32)), (occupancy_path, maps)):
+            tmp_path = f'{path}.{os.getpid()}.tmp'
+            with open(tmp_path, 'wb') as f:
+                np.save(f, array)
+            os.replace(tmp_path, path)
+        return cls.load(name, directory)
+
+    @classmethod
+    def load(cls, name, directory=None):
+        occupancy_path, sdf_path = cls.paths(name, directory)
+        return cls(np.load(occupancy_path, mmap_mode='r'), np.load(sdf_path, mmap_mode='r'), occupancy_path)
+
+
+def _file_name(name):
+    return f'{name}.{fingerprint(name)}' if name in LAYOUT_BUILDERS else name
+
+
+@contextmanager
+def _lock(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'a') as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        yield
+
+
+def compile_layout(name, directory=None, rebuild=False):
+    """Compile a registered library unless another process did it meanwhile, and delete its outdated files."""
+    directory = directory or MAPS_DIR
+    file_name = _file_name(name)
+    with _lock(os.path.join(directory, f'{name}.lock')):
+        if rebuild or not all(map(os.path.exists, MapLibrary.paths(file_name, directory))):
+            MapLibrary.compile(file_name, LAYOUT_BUILDERS[name](), directory)
+        current = MapLibrary.paths(file_name, directory)
+        for path in glob.glob(os.path.join(glob.escape(directory), f'{glob.escape(name)}.*.npy')):
+            # processes still mapping them keep their pages
+            if path not in current and os.path.basename(path).count('.') == 3:
+                os.remove(path)
+    return MapLibrary.load(file_name, directory)
+
+
+def get_library(name, directory=None):
+    """Library `name`, compiled from its registered builder on first use."""
+    key = (name, directory or MAPS_DIR)
+    if key not in _LIBRARIES:
+        if name not in LAYOUT_BUILDERS and name in LAYOUT_MODULES:
+            importlib.import_module(LAYOUT_MODULES[name])
+        if name in LAYOUT_BUILDERS:
+            file_name = _file_name(name)
+            if all(map(os.path.exists, MapLibrary.paths(file_name, directory))):
+                _LIBRARIES[key] = MapLibrary.load(file_name, directory)
+            else:
+                _LIBRARIES[key] = compile_layout(name, directory)
+        elif all(map(os.path.exists, MapLibrary.paths(name, directory))):
+            _LIBRARIES[key] = MapLibrary.load(name, directory)
+        else:
+            raise ValueError(f'Unknown map library {name}. Please, choose one of {list(LAYOUT_BUILDERS)} '
+                             f'or compile it with MapLibrary.compile')
+    return _LIBRARIES[key]
+
+
+def evict_deleted_libraries():
+    """Forget the libraries of this process whose files were deleted, e.g. procedural pools replaced since."""
+    for key in [key for key, library in _LIBRARIES.items()
+                if library.path is not None and not os.path.exists(library.path)]:
+        del _LIBRARIES[key]
+
+
+if __name__ == '__main__':
+    # builders are registered by the env modules, into environmetns.maps rather than this __main__ module
+    from environmetns import maps
+
+    for module in LAYOUT_MODULES.values():
+        importlib.import_module(module)
+    parser = argparse.ArgumentParser()
+    parser.add_argument('names', nargs='+', help=f'libraries to compile, registered: {list(maps.LAYOUT_BUILDERS)}')
+    parser.add_argument('--rebuild', action='store_true', help='recompile libraries that already exist')
+    parser.add_argument('--directory', default=MAPS_DIR)
+    args = parser.parse_args()
+
+    for name in args.names:
+        library = maps.compile_layout(name, args.directory, rebuild=args.rebuild)
+        print(f'{name}: {len(library)} layouts in {maps.MapLibrary.paths(maps._file_name(name), args.directory)[0]}')
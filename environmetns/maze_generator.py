@@ -0,0 +1,192 @@
+"""
+Procedural MazeEnv layouts: random axis-aligned walls inside the borders, kept only when every free cell
+is reachable from the drone spawn point.
+
+    env = MazeEnv(player, layout='procedural')  # random layout of the builtin pool on every reset
+
+    python -m environmetns.maze_generator --name mazes-2000 --layouts 2000 --seed 0
+    env = MazeEnv(player, layout='mazes-2000')
+"""
+import argparse
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from environmetns.env_maze import WALL_H, WALL_W
+from environmetns.env_simple import STATE_BORDER, STATE_H, STATE_W, border_restricted_map
+from environmetns.maps import LAYOUT_MODULES, MapLibrary, evict_deleted_libraries, register_layout
+
+SPAWN = (int(STATE_W / 2), int(STATE_H / 2))
+# compiled on first use of the 'procedural' library (a few seconds), envs wait for it
+PROCEDURAL_POOL_SIZE = 256
+# candidate layouts rasterized at once
+GENERATION_BATCH = 256
+# generation gives up below this fraction of connected candidates (about 18% with the defaults)
+MIN_ACCEPTANCE = 0.01
+
+_COORDS_X = np.arange(STATE_W)
+_COORDS_Y = np.arange(STATE_H)
+
+
+def rasterize_walls(walls, base_map=None):
+    """
+    Occupancy grids (N, W, H) of `walls` (N, K, 4) given as x1, y1, w, h. The K rectangles are
+    separable, so the grid is the boolean product of per-wall x and y masks summed over walls.
+    """
+    walls = np.asarray(walls)
+    x1, y1, w, h = np.moveaxis(walls, -1, 0)[..., None]
+    in_x = ((_COORDS_X >= x1) & (_COORDS_X < x1 + w)).astype(np.float32)
+    in_y = ((_COORDS_Y >= y1) & (_COORDS_Y < y1 + h)).astype(np.float32)
+    occupancy = np.matmul(in_x.transpose(0, 2, 1), in_y) > 0
+    if base_map is None:
+        base_map = border_restricted_map()
+    return occupancy | base_map
+
+
+def dilate(occupancy, radius):
+    """Grow restricted cells of (N, W, H) grids by `radius` cells (square neighbourhood)."""
+    for _ in range(radius):
+        # along x, then along y of the result: a 3x3 square per round
+        grown = occupancy.copy()
+        grown[:, 1:] |= occupancy[:, :-1]
+        grown[:, :-1] |= occupancy[:, 1:]
+        occupancy = grown.copy()
+        occupancy[:, :, 1:] |= grown[:, :, :-1]
+        occupancy[:, :, :-1] |= grown[:, :, 1:]
+    return occupancy
+
+
+def connected(occupancy, start=SPAWN, clearance=0):
+    """
+    Flood fill of all (N, W, H) grids at once from `start`: True where `start` is free and every free cell
+    is 4-connected to it. With `clearance`, the fill runs on walls grown by that many cells, so passages
+    narrower than 2 * clearance + 1 cells do not count, and every free cell must lie within `clearance`
+    of the filled area.
+    """
+    free = ~dilate(occupancy, clearance)
+    sx, sy = start
+    reached = np.zeros_like(free)
+    reached[:, sx, sy] = free[:, sx, sy]
+    # only grids still growing are processed on every round
+    active = np.flatnonzero(reached[:, sx, sy])
+    while len(active):
+        front = reached[active]
+        grown = front.copy()
+        grown[:, 1:] |= front[:, :-1]
+        grown[:, :-1] |= front[:, 1:]
+        grown[:, :, 1:] |= front[:, :, :-1]
+        grown[:, :, :-1] |= front[:, :, 1:]
+        grown &= free[active]
+        changed = (grown != front).any(axis=(1, 2))
+        reached[active] = grown
+        active = active[changed]
+    unreached = ~occupancy & ~dilate(reached, clearance)
+    return ~unreached.any(axis=(1, 2)) & free[:, sx, sy]
+
+
+def random_walls(rng, n, n_walls=6, thickness=WALL_W, min_length=WALL_H, max_length=2 * WALL_H):
+    """(n, n_walls, 4) walls x1, y1, w, h of the given thickness, random length and orientation."""
+    length = rng.integers(min_length, max_length + 1, (n, n_walls))
+    vertical = rng.random((n, n_walls)) < 0.5
+    w = np.where(vertical, thickness, length)
+    h = np.where(vertical, length, thickness)
+    x1 = STATE_BORDER + (rng.random((n, n_walls)) * (STATE_W - 2 * STATE_BORDER - w + 1)).astype(int)
+    y1 = STATE_BORDER + (rng.random((n, n_walls)) * (STATE_H - 2 * STATE_BORDER - h + 1)).astype(int)
+    return np.stack([x1, y1, w, h], axis=-1)
+
+
+def random_mazes(rng, n, n_walls=6, thickness=WALL_W, min_length=WALL_H, max_length=2 * WALL_H, clearance=1,
+                 batch=GENERATION_BATCH, max_batches=None):
+    """
+    `n` connected layouts (n, W, H), candidates are drawn, rasterized and checked `batch` at a time.
+    Raises ValueError after `max_batches` batches, by default enough for a `MIN_ACCEPTANCE` rate.
+    """
+    if max_batches is None:
+        max_batches = math.ceil(n / (batch * MIN_ACCEPTANCE))
+    layouts = []
+    found = 0
+    for _ in range(max_batches):
+        if found >= n:
+            break
+        walls = random_walls(rng, batch, n_walls, thickness, min_length, max_length)
+        occupancy = rasterize_walls(walls)
+        occupancy = occupancy[connected(occupancy, clearance=clearance)]
+        layouts.append(occupancy[:n - found])
+        found += len(layouts[-1])
+    if found < n:
+        raise ValueError(f'Only {found} of {n} layouts are connected after {max_batches} batches of {batch} with '
+                         f'n_walls={n_walls}, thickness={thickness}, min_length={min_length}, '
+                         f'max_length={max_length}, clearance={clearance}')
+    return np.concatenate(layouts)
+
+
+def compile_mazes(name, n, seed, directory=None, **maze_kwargs):
+    """Generate and compile a procedural library, returns its name (picklable worker task)."""
+    MapLibrary.compile(name, random_mazes(np.random.default_rng(seed), n, **maze_kwargs), directory)
+    return name
+
+
+register_layout('procedural', lambda: random_mazes(np.random.default_rng(0), PROCEDURAL_POOL_SIZE),
+                sources=('environmetns.env_simple', 'environmetns.env_maze'))
+
+
+class MazePoolRefresher:
+    """
+    Generates fresh procedural libraries on a background process while training keeps stepping.
+    `poll()` returns the name of a library once it is compiled, envs switch to it with
+    `use_map_library(name, refresher.directory)`. Libraries older than the previous one are deleted.
+    """
+
+    def __init__(self, prefix='procedural', n_layouts=PROCEDURAL_POOL_SIZE, seed=0, directory=None, **maze_kwargs):
+        self.prefix = prefix
+        self.n_layouts = n_layouts
+        self.seed = seed
+        self.directory = directory
+        self.maze_kwargs = maze_kwargs
+        self.generation = 0
+        # one library at a time, generating it is cheap next to training on it
+        self.executor = ProcessPoolExecutor(1)
+        self.future = None
+        self.names = []
+
+    def refresh(self):
+        """Start generating the next library, unless one is already in progress."""
+        if self.future is None:
+            self.generation += 1
+            name = f'{self.prefix}-{self.generation}'
+            self.future = self.executor.submit(compile_mazes, name, self.n_layouts, (self.seed, self.generation),
+                                               self.directory, **self.maze_kwargs)
+
+    def poll(self):
+        if self.future is None or not self.future.done():
+            return None
+        name = self.future.result()
+        self.future = None
+        self.names.append(name)
+        for old_name in self.names[:-2]:
+            for path in MapLibrary.paths(old_name, self.directory):
+                os.remove(path)
+        evict_deleted_libraries()
+        self.names = self.names[-2:]
+        return name
+
+    def close(self):
+        self.executor.shutdown(cancel_futures=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--name', default=f'procedural-{PROCEDURAL_POOL_SIZE}')
+    parser.add_argument('--layouts', type=int, default=PROCEDURAL_POOL_SIZE)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--walls', type=int, default=6)
+    parser.add_argument('--clearance', type=int, default=1, help='narrowest passage is 2 * clearance + 1 cells')
+    args = parser.parse_args()
+    if args.name in LAYOUT_MODULES:
+        # get_library would keep using the registered builder
+        parser.error(f'{args.name} is a builtin library, please choose another name')
+
+    compile_mazes(args.name, args.layouts, args.seed, n_walls=args.walls, clearance=args.clearance)
+    print(f'{args.layouts} layouts in {MapLibrary.paths(args.name)[0]}')
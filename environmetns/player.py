@@ -1,21 +1,47 @@
 from math import sqrt
 
 import numpy as np
-import pygame
 from gymnasium import spaces
-from pygame.locals import *
+
+from environmetns.sdf import ray_directions
+
+# columns of a batched player state array (n_players, STATE_SIZE):
+# positions, velocities and accelerations are contiguous slices
+X, Y, A, XD, YD, AD, XDD, YDD, ADD = range(9)
+STATE_SIZE = 9
+POSITION = slice(X, A + 1)
+VELOCITY = slice(XD, AD + 1)
+ACCELERATION = slice(XDD, ADD + 1)
+
+
+def update_batch(state, actions, friction=0.98, action_coef=2):
+    """`SimplePlayer.update` for a (n, STATE_SIZE) state array and (n, 2) actions, in place."""
+    state[:, XD] = state[:, XD] * friction + actions[:, 1] * action_coef
+    state[:, YD] = state[:, YD] * friction - actions[:, 0] * action_coef
+
+
+def move_batch(state, dt):
+    """`SimplePlayer.move` for a (n, STATE_SIZE) state array, in place."""
+    state[:, VELOCITY] += state[:, ACCELERATION] * dt
+    state[:, POSITION] += state[:, VELOCITY] * dt
 
 
 class SimplePlayer:
+    __slots__ = ('ray_range', 'n_rays', 'action_coef', 'gravity', 'thruster_amplitude', 'diff_amplitude',
+                 'thruster_mean', 'mass', 'inertia', 'arm', 'friction',
+                 'a', 'ad', 'add', 'x', 'xd', 'xdd', 'y', 'yd', 'ydd',
+                 'current_target', 'next_target', 'target_counter', 'ray_directions', 'rays_mask', 'rays8_mask')
+
     action_space = spaces.Box(
         np.array([-1, -1]).astype(np.float32),
         np.array([+1, +1]).astype(np.float32),
         shape=(2,)
     )  # xdd, ydd
 
-    def __init__(self, ray_range=7, action_coef=2):
+    def __init__(self, ray_range=7, action_coef=2, n_rays=8):
         # Physics constants
         self.ray_range = ray_range
+        self.n_rays = n_rays
         self.action_coef = action_coef
         self.gravity = 0.08
         self.thruster_amplitude = 0.04
@@ -34,8 +60,10 @@ class SimplePlayer:
         self.next_target = None
         self.target_counter = 0
 
-        self.rays8_mask = ray_range * np.array(
-            [(np.cos(np.pi * i / 4), np.sin(np.pi * i / 4)) for i in range(8)])
+        self.ray_directions = ray_directions(n_rays)
+        self.rays_mask = ray_range * self.ray_directions
+        # kept for compatibility, equals rays_mask (8 rays by default)
+        self.rays8_mask = self.rays_mask
 
     def reset_player(self, x, y, current_target, next_target):
         (self.a, self.ad, self.add) = (0, 0, 0)
@@ -46,6 +74,18 @@ class SimplePlayer:
         self.next_target = next_target
         self.target_counter = 0
 
+    def get_state(self):
+        """Movement vars as one row of a batched state array."""
+        state = np.empty(STATE_SIZE)
+        state[[X, Y, A, XD, YD, AD, XDD, YDD, ADD]] = (self.x, self.y, self.a, self.xd, self.yd, self.ad,
+                                                       self.xdd, self.ydd, self.add)
+        return state
+
+    def set_state(self, state):
+        (self.x, self.y, self.a) = (float(v) for v in state[POSITION])
+        (self.xd, self.yd, self.ad) = (float(v) for v in state[VELOCITY])
+        (self.xdd, self.ydd, self.add) = (float(v) for v in state[ACCELERATION])
+
     @staticmethod
     def unit_vector(vector):
         return vector / np.linalg.norm(vector)
@@ -122,6 +162,9 @@ class SimpleHumanPlayer(SimplePlayer):
         super().__init__()
 
     def act(self, obs):
+        import pygame
+        from pygame.locals import K_UP, K_DOWN, K_LEFT, K_RIGHT
+
         action0 = 0
         action1 = 0
         pressed_keys = pygame.key.get_pressed()
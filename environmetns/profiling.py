@@ -0,0 +1,33 @@
+from collections import defaultdict
+from time import perf_counter
+
+
+class StepProfiler:
+    """
+    Opt-in phase timers and event counters of an environment.
+
+    Measurements accumulate until `pop` is called; envs pop them once per step into
+    `info['profile']`, so work done in `reset` shows up in the following step.
+    """
+
+    def __init__(self):
+        self.values = defaultdict(float)
+
+    @staticmethod
+    def start():
+        return perf_counter()
+
+    def lap(self, phase, start):
+        """Record time spent in `phase` since `start` and return the current time."""
+        now = perf_counter()
+        self.values[f'time/{phase}'] += now - start
+        self.values[f'calls/{phase}'] += 1
+        return now
+
+    def count(self, counter, n=1):
+        self.values[f'count/{counter}'] += n
+
+    def pop(self):
+        values = dict(self.values)
+        self.values.clear()
+        return values
@@ -0,0 +1,188 @@
+"""
+Rollout recording into chunked columnar files and streaming reads of the recorded datasets.
+
+    env = TrajectoryRecorder(MazeEnv(player=SimplePlayer()), "tmp/rollouts/worker_0")
+    ...
+    env.close()  # flushes the last, partial chunk
+    for batch in TrajectoryDataset("tmp/rollouts").batches(4096, columns=('obs', 'action')):
+        ...
+
+Every chunk is a directory of one .npy file per column (memory-mapped by the loader), or a single
+compressed `columns.npz` with `compress=True`.
+"""
+import glob
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import gymnasium as gym
+import numpy as np
+
+CHUNK_SIZE = 100_000
+# complete chunks, without the .tmp directories being written
+CHUNK_PATTERN = 'chunk_[0-9]*[0-9]'
+
+
+def _columns_spec(env):
+    obs_dim = env.observation_space.shape[0]
+    act_dim = env.action_space.shape[0]
+    return {
+        # observation the action was taken on
+        'obs': ((obs_dim,), np.float32),
+        # observation returned by the step, the final one of the episode on terminated or truncated rows
+        'next_obs': ((obs_dim,), np.float32),
+        'action': ((act_dim,), np.float32),
+        'reward': ((), np.float32),
+        'terminated': ((), np.bool_),
+        'truncated': ((), np.bool_),
+        'episode': ((), np.int64),
+        'step': ((), np.int32),
+        # after the step: x, y, a, xd, yd, ad, xdd, ydd, add of SimplePlayer
+        'player': ((9,), np.float32),
+        'target': ((2,), np.float32),
+        'next_target': ((2,), np.float32),
+        'targets_catched': ((), np.int32),
+    }
+
+
+def _n_rows(columns):
+    return len(next(iter(columns.values())))
+
+
+class TrajectoryRecorder(gym.Wrapper):
+    """
+    Records every step of a drone env. Rows go to preallocated column arrays; a full chunk is swapped with a
+    spare set of arrays and written by a background thread, so at most two chunks are held in memory.
+
+    :param directory: output directory, one per recorded env (e.g. per SubprocVecEnv worker)
+    :param chunk_size: rows per chunk file
+    :param compress: write chunks as compressed .npz (smaller, but not memory-mappable)
+    """
+
+    def __init__(self, env, directory, chunk_size=CHUNK_SIZE, compress=False):
+        super().__init__(env)
+        self.directory = directory
+        self.chunk_size = chunk_size
+        self.compress = compress
+        os.makedirs(directory, exist_ok=True)
+        spec = _columns_spec(env)
+        with open(os.path.join(directory, 'columns.json'), 'w') as f:
+            json.dump({name: [list(shape), np.dtype(dtype).str] for name, (shape, dtype) in spec.items()}, f)
+        self._columns = {name: np.empty((chunk_size,) + shape, dtype) for name, (shape, dtype) in spec.items()}
+        self._spare = {name: np.empty_like(column) for name, column in self._columns.items()}
+        self._row = 0
+        self._n_chunks = len(glob.glob(os.path.join(directory, CHUNK_PATTERN)))
+        self._writer = ThreadPoolExecutor(max_workers=1)
+        self._pending = None
+        self._obs = None
+        self._episode = -1
+        self._step = 0
+
+    def reset(self, **kwargs):
+        obs, info = self.env.reset(**kwargs)
+        self._obs = obs
+        self._episode += 1
+        self._step = 0
+        return obs, info
+
+    def step(self, action):
+        obs, reward, terminated, truncated, info = self.env.step(action)
+        player = self.env.unwrapped.player
+        columns, row = self._columns, self._row
+        columns['obs'][row] = self._obs
+        columns['next_obs'][row] = obs
+        columns['action'][row] = action
+        columns['reward'][row] = reward
+        columns['terminated'][row] = terminated
+        columns['truncated'][row] = truncated
+        columns['episode'][row] = self._episode
+        columns['step'][row] = self._step
+        columns['player'][row] = (player.x, player.y, player.a, player.xd, player.yd, player.ad,
+                                  player.xdd, player.ydd, player.add)
+        columns['target'][row] = (player.current_target.x, player.current_target.y)
+        columns['next_target'][row] = (player.next_target.x, player.next_target.y)
+        columns['targets_catched'][row] = player.target_counter
+        self._obs = obs
+        self._step += 1
+        self._row += 1
+        if self._row == self.chunk_size:
+            self.flush()
+        return obs, reward, terminated, truncated, info
+
+    def flush(self, wait=False):
+        """Hand the recorded rows to the writer thread, `wait` for them to be on disk."""
+        if self._row:
+            if self._pending is not None:
+                # the spare arrays are still being written: bounded memory over throughput
+                self._pending.result()
+            self._columns, self._spare = self._spare, self._columns
+            path = os.path.join(self.directory, f'chunk_{self._n_chunks:06d}')
+            self._pending = self._writer.submit(self._write_chunk, path, self._spare, self._row)
+            self._n_chunks += 1
+            self._row = 0
+        if wait and self._pending is not None:
+            self._pending.result()
+
+    def _write_chunk(self, path, columns, n_rows):
+        tmp_path = path + '.tmp'
+        os.makedirs(tmp_path, exist_ok=True)
+        if self.compress:
+            np.savez_compressed(os.path.join(tmp_path, 'columns.npz'),
+                                **{name: column[:n_rows] for name, column in columns.items()})
+        else:
+            for name, column in columns.items():
+                np.save(os.path.join(tmp_path, f'{name}.npy'), column[:n_rows])
+        # readers only see complete chunks
+        os.replace(tmp_path, path)
+
+    def close(self):
+        self.flush(wait=True)
+        self._writer.shutdown()
+        super().close()
+
+
+class TrajectoryDataset:
+    """Chunks recorded by one or several TrajectoryRecorders under `directory`, read lazily."""
+
+    def __init__(self, directory):
+        self.chunks = sorted(glob.glob(os.path.join(directory, '**', CHUNK_PATTERN), recursive=True))
+
+    def load_chunk(self, path, columns=None):
+        """Columns of one chunk: memory-mapped arrays, or decompressed ones for compressed chunks."""
+        npz_path = os.path.join(path, 'columns.npz')
+        if os.path.exists(npz_path):
+            with np.load(npz_path) as data:
+                return {name: data[name] for name in (columns or data.files)}
+        if columns is None:
+            columns = [os.path.splitext(name)[0] for name in sorted(os.listdir(path))]
+        return {name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r') for name in columns}
+
+    def __len__(self):
+        return sum(_n_rows(self.load_chunk(path, ['reward'])) for path in self.chunks)
+
+    def batches(self, batch_size, columns=None):
+        """Consecutive rows of all chunks in `batch_size` batches, only one chunk is mapped at a time."""
+        carry = None
+        for path in self.chunks:
+            chunk = self.load_chunk(path, columns)
+            n_rows = _n_rows(chunk)
+            start = 0
+            if carry is not None:
+                # batch across the chunk boundary
+                start = min(batch_size - _n_rows(carry), n_rows)
+                carry = {name: np.concatenate([carry[name], column[:start]]) for name, column in chunk.items()}
+                if _n_rows(carry) < batch_size:
+                    continue
+                yield carry
+                carry = None
+            while start + batch_size <= n_rows:
+                yield {name: np.asarray(column[start:start + batch_size]) for name, column in chunk.items()}
+                start += batch_size
+            if start < n_rows:
+                carry = {name: np.asarray(column[start:]) for name, column in chunk.items()}
+        if carry is not None:
+            yield carry
+
+    def column(self, name):
+        """One column of the whole dataset, concatenated in memory."""
+        return np.concatenate([self.load_chunk(path, [name])[name] for path in self.chunks])
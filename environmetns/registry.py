@@ -0,0 +1,17 @@
+from environmetns.env_dynamic import DynamicEnv
+from environmetns.env_maze import MazeEnv
+from environmetns.env_simple import SimpleEnv
+from environmetns.player import SimplePlayer
+
+ENV_TYPES = {
+    'simple': SimpleEnv,
+    'maze': MazeEnv,
+    'dynamic': DynamicEnv,
+}
+
+
+def make_env(env_type, ray_range=7, action_coef=2, n_rays=8, **env_kwargs):
+    if env_type not in ENV_TYPES:
+        raise ValueError(f'Unexpected environment type {env_type}. Please, choose one of {list(ENV_TYPES)}')
+    player = SimplePlayer(ray_range=ray_range, action_coef=action_coef, n_rays=n_rays)
+    return ENV_TYPES[env_type](player=player, **env_kwargs)
@@ -0,0 +1,107 @@
+"""
+Window of render_mode='human': the map scaled to the window is cached per background, every frame only restores
+and redraws the areas around the drone and the targets, and pushes those areas to the display.
+"""
+from environmetns.env_simple import STATE_H, STATE_W, TARGET_RADIUS, WINDOW_H, WINDOW_W, disc_offsets
+
+# window pixels per state pixel, frames look like the state canvas scaled up
+SCALE_X = WINDOW_W // STATE_W
+SCALE_Y = WINDOW_H // STATE_H
+
+
+class HumanRenderer:
+    """
+    Draws `SimpleEnv` frames into a pygame window, at most `env.FPS` per second. The HUD texts are rendered
+    again only when their values change.
+    """
+
+    def __init__(self, caption='Drone environments'):
+        import pygame
+        pygame.init()
+        self.window = pygame.display.set_mode((WINDOW_W, WINDOW_H))
+        pygame.display.set_caption(caption)
+        pygame.font.init()
+        self.font = pygame.font.SysFont("Comic Sans MS", 20)
+        self.fps_clock = pygame.time.Clock()
+        self._background_source = None
+        self._background = None
+        self._sprites = {}
+        # window areas drawn over the background last frame
+        self._drawn = []
+        # text, surface and position of the HUD entries
+        self._hud = {}
+
+    def _sprite(self, radius, color):
+        # disc of render_into scaled to the window, transparent around
+        import pygame
+        key = (radius, tuple(color))
+        if key not in self._sprites:
+            size = 2 * radius + 2
+            sprite = pygame.Surface((size * SCALE_X, size * SCALE_Y), pygame.SRCALPHA)
+            for dx, dy in zip(*disc_offsets(radius)):
+                sprite.fill(key[1], ((dx + radius + 1) * SCALE_X, (dy + radius + 1) * SCALE_Y, SCALE_X, SCALE_Y))
+            self._sprites[key] = sprite
+        return self._sprites[key]
+
+    def _hud_text(self, key, text, position, color):
+        entry = self._hud.get(key)
+        if entry is not None and entry[0] == text:
+            return entry[1], entry[2], None
+        surface = self.font.render(text, False, color)
+        rect = surface.get_rect(topleft=position)
+        self._hud[key] = (text, surface, rect)
+        # the previous text is erased too
+        return surface, rect, entry[2] if entry is not None else None
+
+    def draw(self, env):
+        import pygame
+        window = self.window
+        background = env.background_array()
+        full_update = background is not self._background_source
+        if full_update:
+            # the map changed: scaled once, then only restored by areas
+            self._background_source = background
+            self._background = pygame.transform.scale(pygame.surfarray.make_surface(background), (WINDOW_W, WINDOW_H))
+            window.blit(self._background, (0, 0))
+            self._hud = {}
+        dirty = []
+        for rect in self._drawn:
+            window.blit(self._background, rect, rect)
+            dirty.append(rect)
+
+        player = env.player
+        hud = (('time', f"Time: {int(env.time)}", (20, 20)),
+               ('reward', f"Total reward: {int(env.total_reward)}", (WINDOW_W // 3, 20)),
+               ('collected', f"Collected: {player.target_counter}", (WINDOW_W // 4 * 3, 20)))
+        texts = []
+        for key, text, position in hud:
+            surface, rect, erased = self._hud_text(key, text, position, env.font_color)
+            if erased is not None:
+                window.blit(self._background, erased, erased)
+                dirty.append(erased)
+            texts.append((surface, rect))
+
+        self._drawn = []
+        for (x, y), color in ((player.current_target_xy(), env.target_color),
+                              (player.next_target_xy(), env.next_target_color)):
+            position = ((int(x) - TARGET_RADIUS - 1) * SCALE_X, (int(y) - TARGET_RADIUS - 1) * SCALE_Y)
+            self._drawn.append(window.blit(self._sprite(TARGET_RADIUS, color), position))
+        rect = pygame.Rect(int(player.x) * SCALE_X, int(player.y) * SCALE_Y, SCALE_X, SCALE_Y)
+        self._drawn.append(window.fill(env.player_color, rect))
+
+        # texts stay on top of the drone and targets, and of restored areas
+        for surface, rect in texts:
+            window.blit(surface, rect)
+        dirty.extend(self._drawn)
+        dirty.extend(rect for _, rect in texts if full_update or rect.collidelist(dirty) != -1)
+
+        pygame.event.pump()
+        if full_update:
+            pygame.display.update()
+        else:
+            pygame.display.update(dirty)
+        self.fps_clock.tick(env.FPS)
+
+    def close(self):
+        import pygame
+        pygame.display.quit()
@@ -0,0 +1,87 @@
+"""
+Signed distance fields of occupancy grids and sphere-traced ray casting on top of them.
+All functions accept a single (W, H) grid or a (N, W, H) stack.
+"""
+import numpy as np
+
+SQRT2 = np.sqrt(2)
+# how far a ray steps into the next cell, in pixels
+CELL_EPS = 1e-6
+
+
+def distance_transform(features):
+    """Exact euclidean distance (in pixels) from every cell to the nearest True cell of `features`."""
+    features = np.asarray(features, dtype=bool)
+    w, h = features.shape[-2:]
+    far = np.float32(w + h)
+    # 1. distance to the nearest feature in the same column (along y)
+    g = np.where(features, np.float32(0), far)
+    for y in range(1, h):
+        g[..., y] = np.minimum(g[..., y], g[..., y - 1] + 1)
+    for y in range(h - 2, -1, -1):
+        g[..., y] = np.minimum(g[..., y], g[..., y + 1] + 1)
+    # 2. combine columns: d2[x, y] = min over x' of (x - x')^2 + g[x', y]^2
+    g2 = g ** 2
+    xs = np.arange(w, dtype=np.float32)
+    d2 = np.full(features.shape, far ** 2, dtype=np.float32)
+    for x_src in range(w):
+        np.minimum(d2, ((xs - x_src) ** 2)[:, None] + g2[..., x_src, None, :], out=d2)
+    return np.sqrt(d2)
+
+
+def signed_distance_field(restricted_map):
+    """Distance to the nearest restricted cell for free cells, minus distance to the nearest free cell inside."""
+    restricted_map = np.asarray(restricted_map, dtype=bool)
+    outside = distance_transform(restricted_map)
+    inside = distance_transform(~restricted_map)
+    return np.where(restricted_map, -inside, outside)
+
+
+def ray_directions(n_rays):
+    """(n_rays, 2) unit directions evenly spread counterclockwise from the x axis, the ray fan of SimplePlayer."""
+    angles = 2 * np.pi * np.arange(n_rays) / n_rays
+    return np.stack([np.cos(angles), np.sin(angles)], axis=1)
+
+
+def trace_rays(sdf, origins, directions, max_dist):
+    """
+    Distance along each ray to the first restricted cell, capped at `max_dist`.
+
+    :param sdf: (W, H) field shared by all origins or (N, W, H), one per origin
+    :param origins: (N, 2) ray origins
+    :param directions: (R, 2) unit directions
+    :return: (N, R) distances
+    """
+    origins = np.asarray(origins, dtype=np.float64).reshape(-1, 2)
+    w, h = sdf.shape[-2:]
+    n, r = len(origins), len(directions)
+    env_idx = None if sdf.ndim == 2 else np.arange(n)[:, None]
+
+    # distance along each ray to cross one pixel along x or y
+    directions = np.asarray(directions, dtype=np.float64)
+    cross_x, cross_y = (1 / np.maximum(np.abs(directions), 1e-12)).T
+    # rays parallel to an axis count as forward along it: they never reach the next pixel
+    forward_x, forward_y = (directions >= 0).T
+
+    t = np.zeros((n, r))
+    active = np.ones((n, r), dtype=bool)
+    while active.any():
+        points = origins[:, None, :] + t[..., None] * directions[None]
+        x, y = points[..., 0], points[..., 1]
+        outside = (x < 0) | (x >= w) | (y < 0) | (y >= h)
+        xi = np.clip(x, 0, w - 1).astype(int)
+        yi = np.clip(y, 0, h - 1).astype(int)
+        d = sdf[xi, yi] if env_idx is None else sdf[env_idx, xi, yi]
+        hit = outside | (d <= 0)
+        active &= ~hit
+        # points inside a pixel are at most sqrt(2) closer to the wall than its center. Closer to walls than
+        # that, rays step to the next pixel they cross, so they never pass a wall corner
+        fx, fy = x - np.floor(x), y - np.floor(y)
+        to_x = np.where(forward_x, 1 - fx, fx) * cross_x
+        to_y = np.where(forward_y, 1 - fy, fy) * cross_y
+        to_next = np.minimum(to_x, to_y) + CELL_EPS
+        t = np.where(active, t + np.maximum(d - SQRT2, to_next), t)
+        reached = active & (t >= max_dist)
+        t[reached] = max_dist
+        active &= ~reached
+    return t
@@ -0,0 +1,237 @@
+"""
+Multiprocess VecEnv exchanging actions, observations, rewards and dones through shared memory.
+
+Unlike SubprocVecEnv, nothing is pickled on a regular step: the main process writes actions into
+a shared buffer and sends one byte to every worker, workers step their envs, write the results in
+place and answer with an empty message (or the pickled infos of envs that produced any).
+Every worker process steps a contiguous slice of envs.
+"""
+import multiprocessing as mp
+import pickle
+from typing import Any, Callable, List, Optional
+
+import gymnasium as gym
+import numpy as np
+from gymnasium import spaces
+from stable_baselines3.common.vec_env.base_vec_env import CloudpickleWrapper, VecEnv, VecEnvIndices
+from stable_baselines3.common.vec_env.patch_gym import _patch_env
+
+STEP = b's'
+
+
+class _SharedBuffers:
+    """Numpy views of the shared arrays, created in the main process and re-attached in workers."""
+
+    def __init__(self, raw, n_envs, obs_shape, act_shape):
+        self.raw = raw
+        self.shapes = (n_envs, obs_shape, act_shape)
+        self.obs = np.frombuffer(raw['obs'], dtype=np.float32).reshape((n_envs,) + obs_shape)
+        self.terminal_obs = np.frombuffer(raw['terminal_obs'], dtype=np.float32).reshape((n_envs,) + obs_shape)
+        self.actions = np.frombuffer(raw['actions'], dtype=np.float32).reshape((n_envs,) + act_shape)
+        self.rewards = np.frombuffer(raw['rewards'], dtype=np.float32)
+        self.dones = np.frombuffer(raw['dones'], dtype=np.bool_)
+
+    @classmethod
+    def allocate(cls, ctx, n_envs, obs_shape, act_shape):
+        obs_size, act_size = int(np.prod(obs_shape)), int(np.prod(act_shape))
+        raw = {
+            'obs': ctx.RawArray('f', n_envs * obs_size),
+            'terminal_obs': ctx.RawArray('f', n_envs * obs_size),
+            'actions': ctx.RawArray('f', n_envs * act_size),
+            'rewards': ctx.RawArray('f', n_envs),
+            'dones': ctx.RawArray('b', n_envs),
+        }
+        return cls(raw, n_envs, obs_shape, act_shape)
+
+    def __getstate__(self):
+        return {'raw': self.raw, 'shapes': self.shapes}
+
+    def __setstate__(self, state):
+        self.__init__(state['raw'], *state['shapes'])
+
+
+def _worker(remote, parent_remote, env_fns_wrapper, env_indices, buffers):
+    from stable_baselines3.common.env_util import is_wrapped
+
+    parent_remote.close()
+    envs = [_patch_env(env_fn()) for env_fn in env_fns_wrapper.var]
+    while True:
+        try:
+            message = remote.recv_bytes()
+            if message == STEP:
+                infos = []
+                for local_idx, (env_idx, env) in enumerate(zip(env_indices, envs)):
+                    obs, reward, terminated, truncated, info = env.step(buffers.actions[env_idx])
+                    done = terminated or truncated
+                    if done:
+                        info['TimeLimit.truncated'] = truncated and not terminated
+                        buffers.terminal_obs[env_idx] = obs
+                        obs, _ = env.reset()
+                    buffers.obs[env_idx] = obs
+                    buffers.rewards[env_idx] = reward
+                    buffers.dones[env_idx] = done
+                    if info:
+                        infos.append((local_idx, info))
+                remote.send_bytes(pickle.dumps(infos) if infos else b'')
+                continue
+
+            cmd, data = pickle.loads(message)
+            if cmd == 'reset':
+                reset_infos = []
+                for env_idx, env, (seed, options) in zip(env_indices, envs, data):
+                    obs, reset_info = env.reset(seed=seed, **({'options': options} if options else {}))
+                    buffers.obs[env_idx] = obs
+                    reset_infos.append(reset_info)
+                remote.send(reset_infos)
+            elif cmd == 'close':
+                for env in envs:
+                    env.close()
+                remote.close()
+                break
+            elif cmd == 'env_method':
+                local, name, args, kwargs = data
+                remote.send([getattr(envs[i], name)(*args, **kwargs) for i in local])
+            elif cmd == 'get_attr':
+                local, name = data
+                remote.send([getattr(envs[i], name) for i in local])
+            elif cmd == 'set_attr':
+                local, name, value = data
+                for i in local:
+                    setattr(envs[i], name, value)
+                remote.send(None)
+            elif cmd == 'is_wrapped':
+                local, wrapper_class = data
+                remote.send([is_wrapped(envs[i], wrapper_class) for i in local])
+            else:
+                raise NotImplementedError(f'`{cmd}` is not implemented in the worker')
+        except EOFError:
+            break
+
+
+class SharedMemoryVecEnv(VecEnv):
+    """
+    :param env_fns: Environments to run in subprocesses, they must have Box observation and action spaces
+    :param n_workers: number of worker processes, envs are split evenly between them (default: one per env)
+    :param start_method: multiprocessing start method, defaults to 'forkserver' where available like SubprocVecEnv
+    """
+
+    def __init__(self, env_fns: List[Callable[[], gym.Env]], n_workers: Optional[int] = None,
+                 start_method: Optional[str] = None):
+        self.waiting = False
+        self.closed = False
+        n_envs = len(env_fns)
+        n_workers = min(n_workers or n_envs, n_envs)
+
+        if start_method is None:
+            start_method = 'forkserver' if 'forkserver' in mp.get_all_start_methods() else 'spawn'
+        ctx = mp.get_context(start_method)
+
+        # spaces are needed to size the buffers: build one env locally, without stepping it
+        probe = _patch_env(env_fns[0]())
+        observation_space, action_space = probe.observation_space, probe.action_space
+        probe.close()
+        if not isinstance(observation_space, spaces.Box) or not isinstance(action_space, spaces.Box):
+            raise ValueError('SharedMemoryVecEnv supports only Box observation and action spaces')
+        self.buffers = _SharedBuffers.allocate(ctx, n_envs, observation_space.shape, action_space.shape)
+
+        self.worker_envs = [indices.tolist() for indices in np.array_split(np.arange(n_envs), n_workers)]
+        self.remotes, work_remotes = zip(*[ctx.Pipe() for _ in range(n_workers)])
+        self.processes = []
+        for work_remote, remote, env_indices in zip(work_remotes, self.remotes, self.worker_envs):
+            fns = CloudpickleWrapper([env_fns[i] for i in env_indices])
+            args = (work_remote, remote, fns, env_indices, self.buffers)
+            # daemon=True: if the main process crashes, we should not cause things to hang
+            process = ctx.Process(target=_worker, args=args, daemon=True)
+            process.start()
+            self.processes.append(process)
+            work_remote.close()
+
+        super().__init__(n_envs, observation_space, action_space)
+        # reset options appeared in the VecEnv of stable-baselines3 2.2
+        if not hasattr(self, '_options'):
+            self._reset_options()
+
+    def set_options(self, options=None) -> None:
+        """Options passed to the `reset` of the envs on the next reset only: one dict for all envs or one per env."""
+        if options is None:
+            options = {}
+        self._options = [dict(options) for _ in range(self.num_envs)] if isinstance(options, dict) else list(options)
+
+    def _reset_options(self) -> None:
+        self._options = [{} for _ in range(self.num_envs)]
+
+    def _send(self, remote, cmd, data=None):
+        remote.send_bytes(pickle.dumps((cmd, data)))
+
+    def step_async(self, actions: np.ndarray) -> None:
+        self.buffers.actions[:] = np.asarray(actions).reshape(self.buffers.actions.shape)
+        for remote in self.remotes:
+            remote.send_bytes(STEP)
+        self.waiting = True
+
+    def step_wait(self):
+        infos: List[dict] = [{} for _ in range(self.num_envs)]
+        for remote, env_indices in zip(self.remotes, self.worker_envs):
+            message = remote.recv_bytes()
+            if message:
+                for local_idx, info in pickle.loads(message):
+                    infos[env_indices[local_idx]] = info
+        self.waiting = False
+        dones = self.buffers.dones.copy()
+        for info in infos:
+            info.setdefault('TimeLimit.truncated', False)
+        for env_idx in np.flatnonzero(dones):
+            infos[env_idx]['terminal_observation'] = self.buffers.terminal_obs[env_idx].copy()
+        return self.buffers.obs.copy(), self.buffers.rewards.copy(), dones, infos
+
+    def reset(self):
+        for remote, env_indices in zip(self.remotes, self.worker_envs):
+            self._send(remote, 'reset', [(self._seeds[i], self._options[i]) for i in env_indices])
+        self.reset_infos = [info for remote in self.remotes for info in remote.recv()]
+        # seeds and options are only used once
+        self._reset_seeds()
+        self._reset_options()
+        return self.buffers.obs.copy()
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        if self.waiting:
+            for remote in self.remotes:
+                remote.recv_bytes()
+        for remote in self.remotes:
+            self._send(remote, 'close')
+        for process in self.processes:
+            process.join()
+        self.closed = True
+
+    def get_images(self):
+        return self.env_method('render')
+
+    def _call(self, cmd, indices, *data):
+        """Send `cmd` to workers owning `indices` and return per-env results in the order of `indices`."""
+        indices = list(self._get_indices(indices))
+        owners = []
+        for remote, env_indices in zip(self.remotes, self.worker_envs):
+            local = [env_indices.index(i) for i in indices if i in env_indices]
+            if local:
+                self._send(remote, cmd, (local,) + data)
+                owners.append((remote, [env_indices[i] for i in local]))
+        results = {}
+        for remote, env_indices in owners:
+            values = remote.recv()
+            if values is not None:
+                results.update(zip(env_indices, values))
+        return [results.get(i) for i in indices]
+
+    def get_attr(self, attr_name: str, indices: VecEnvIndices = None) -> List[Any]:
+        return self._call('get_attr', indices, attr_name)
+
+    def set_attr(self, attr_name: str, value: Any, indices: VecEnvIndices = None) -> None:
+        self._call('set_attr', indices, attr_name, value)
+
+    def env_method(self, method_name: str, *method_args, indices: VecEnvIndices = None, **method_kwargs):
+        return self._call('env_method', indices, method_name, method_args, method_kwargs)
+
+    def env_is_wrapped(self, wrapper_class, indices: VecEnvIndices = None) -> List[bool]:
+        return self._call('is_wrapped', indices, wrapper_class)
@@ -0,0 +1,226 @@
+"""
+Batched drone environments: N drones stepped together with NumPy array operations,
+without a Python-level SimpleEnv/SimplePlayer per environment.
+"""
+from typing import Any, List, Optional
+
+import numpy as np
+from stable_baselines3.common.vec_env.base_vec_env import VecEnv, VecEnvIndices
+
+from environmetns.env_dynamic import restricted_zones_maps, sample_intermediate_points
+from environmetns.env_simple import STATE_W, STATE_H, STATE_BORDER, TARGET_BATCH, TARGET_RADIUS
+from environmetns.player import STATE_SIZE, X, Y, A, XD, YD, AD, update_batch, move_batch
+from environmetns.registry import make_env
+from environmetns.sdf import signed_distance_field, trace_rays
+
+
+class BatchedDroneVecEnv(VecEnv):
+    """
+    Native VecEnv reproducing the step semantics of SimpleEnv/MazeEnv/DynamicEnv
+    with all per-drone state held in (n_envs, ...) arrays. DynamicEnv zones of all envs whose
+    target changed are regenerated together in one batched call.
+    Every drone draws from its own generator like a single env, `seed(seed)` seeds drone i with seed + i.
+    """
+
+    def __init__(self, env_type: str, n_envs: int, time_limit=60, ray_range=7, action_coef=2, n_rays=8,
+                 ray_mode='point'):
+        self.env_type = env_type
+        self.render_mode = None
+        # single env used as a source of spaces, constants and background layouts
+        self._proto = make_env(env_type, ray_range=ray_range, action_coef=action_coef, n_rays=n_rays,
+                               time_limit=time_limit, ray_mode=ray_mode)
+        super().__init__(n_envs, self._proto.observation_space, self._proto.action_space)
+
+        player = self._proto.player
+        self.FPS = self._proto.FPS
+        self.dt = self._proto.dt
+        self.time_limit = time_limit
+        self.friction = player.friction
+        self.action_coef = player.action_coef
+        self.ray_mode = ray_mode
+        self.ray_range = player.ray_range
+        self.ray_directions = player.ray_directions
+        self.rays_mask = player.rays_mask
+        for name in ('DIST_REWARD_COEF', 'TARGET_REWARD', 'OUT_OF_BOUND_REWARD', 'HIGH_SPEED_REWARD',
+                     'HIGH_ANGLE_REWARD', 'RESTRICTED_ZONE_REWARD'):
+            setattr(self, name, getattr(self._proto, name))
+
+        # targets are always sampled against the static layout (DynamicEnv resets it before sampling)
+        self.dynamic = env_type == 'dynamic'
+        # all drones share the first layout of the map library
+        self.target_map, self.target_sdf = self._proto.map_library[0]
+        self.restricted_maps = np.repeat(self.target_map[None], n_envs, axis=0)
+        if ray_mode == 'sdf':
+            self.sdfs = np.repeat(self.target_sdf[None], n_envs, axis=0)
+
+        # SimplePlayer movement vars of all drones, pos and vel are views into it
+        self.state = np.zeros((n_envs, STATE_SIZE))
+        self.pos = self.state[:, X:Y + 1]
+        self.vel = self.state[:, XD:YD + 1]
+        self.targets = np.zeros((n_envs, 2))
+        self.next_targets = np.zeros((n_envs, 2))
+        self.time = np.zeros(n_envs)
+        self.target_counter = np.zeros(n_envs, dtype=np.int64)
+        self.total_reward = np.zeros(n_envs)
+        # DynamicEnv regenerates zones on the step following a target change
+        self.zones_outdated = np.zeros(n_envs, dtype=bool)
+        # restricted flag of the last step, before auto-reset
+        self.in_restricted_zone = np.zeros(n_envs, dtype=bool)
+
+        self._actions = None
+        # per drone: generator and target candidates not used yet, as SimpleEnv.np_random and _target_candidates
+        self.np_randoms = [np.random.default_rng() for _ in range(n_envs)]
+        self._target_candidates = [np.empty((0, 2), dtype=np.int64) for _ in range(n_envs)]
+
+    # ------------------------------------------------------------------ sampling
+    def _sample_targets(self, indices):
+        """`SimpleEnv.generate_next_target` of every drone in `indices`, against the static layout."""
+        points = np.zeros((len(indices), 2))
+        for j, i in enumerate(indices):
+            while True:
+                candidates = self._target_candidates[i]
+                if not len(candidates):
+                    candidates = self.np_randoms[i].integers((STATE_BORDER, STATE_BORDER),
+                                                             (STATE_W - STATE_BORDER, STATE_H - STATE_BORDER),
+                                                             size=(TARGET_BATCH, 2))
+                free = ~self.target_map[candidates[:, 0], candidates[:, 1]]
+                k = int(free.argmax()) if free.any() else len(candidates)
+                self._target_candidates[i] = candidates[k + 1:]
+                if k < len(candidates):
+                    points[j] = candidates[k]
+                    break
+        return points
+
+    def _regenerate_zones(self, indices):
+        players, targets = self.pos[indices], self.targets[indices]
+        intermediate = np.concatenate([
+            sample_intermediate_points(player, target, self.target_map, self.np_randoms[i])
+            for i, player, target in zip(indices, players, targets)])
+        self.restricted_maps[indices] = restricted_zones_maps(players, targets, intermediate, self.target_map)
+        if self.ray_mode == 'sdf':
+            self.sdfs[indices] = signed_distance_field(self.restricted_maps[indices])
+        self.zones_outdated[indices] = False
+
+    def _reset_envs(self, indices):
+        self.time[indices] = 0
+        self.total_reward[indices] = 0
+        self.target_counter[indices] = 0
+        self.state[indices] = 0
+        self.pos[indices] = (int(STATE_W / 2), int(STATE_H / 2))
+        self.targets[indices] = self._sample_targets(indices)
+        self.next_targets[indices] = self._sample_targets(indices)
+        self._set_target_map(indices)
+        self.zones_outdated[indices] = self.dynamic
+
+    def _set_target_map(self, indices):
+        self.restricted_maps[indices] = self.target_map
+        if self.ray_mode == 'sdf':
+            self.sdfs[indices] = self.target_sdf
+
+    # ------------------------------------------------------------------ queries
+    def _points_restricted(self, points):
+        """`SimpleEnv.check_points_restricted` for points of shape (n_envs, ..., 2), one map per env."""
+        x, y = points[..., 0], points[..., 1]
+        outside = (x < 0) | (x >= STATE_W) | (y < 0) | (y >= STATE_H)
+        xi = np.clip(x, 0, STATE_W - 1).astype(int)
+        yi = np.clip(y, 0, STATE_H - 1).astype(int)
+        env_idx = np.arange(self.num_envs).reshape((-1,) + (1,) * (points.ndim - 2))
+        return outside | self.restricted_maps[env_idx, xi, yi]
+
+    def _dist_to_target(self):
+        return np.sqrt(np.sum((self.pos - self.targets) ** 2, axis=1))
+
+    def _out_of_bounds(self):
+        x, y = self.pos[:, 0], self.pos[:, 1]
+        return (x < 0) | (x > STATE_W) | (y < 0) | (y > STATE_H)
+
+    def _get_obs(self):
+        obs = np.empty((self.num_envs, 6 + len(self.rays_mask)), dtype=np.float32)
+        obs[:, 0:2] = self.vel
+        obs[:, 2:4] = self.targets - self.pos
+        obs[:, 4:6] = self.next_targets - self.pos
+        if self.ray_mode == 'sdf':
+            obs[:, 6:] = 1 - trace_rays(self.sdfs, self.pos, self.ray_directions, self.ray_range) / self.ray_range
+        else:
+            obs[:, 6:] = self._points_restricted(self.pos[:, None, :] + self.rays_mask[None])
+        return obs
+
+    def _reward(self, out_of_bounds):
+        dist = self._dist_to_target()
+        reward = self.DIST_REWARD_COEF * dist / self.FPS
+        reward += np.where(dist <= TARGET_RADIUS, self.TARGET_REWARD, 0)
+        reward += np.where(out_of_bounds, self.OUT_OF_BOUND_REWARD, 0)
+        state = self.state
+        high_speed = (np.abs(state[:, AD]) > 5) | (np.abs(state[:, XD]) > 40) | (np.abs(state[:, YD]) > 40)
+        reward += np.where(high_speed, self.HIGH_SPEED_REWARD, 0)
+        reward += np.where(np.abs(state[:, A]) % 180 > 30, self.HIGH_ANGLE_REWARD, 0)
+        self.in_restricted_zone = self._points_restricted(self.pos[:, None, :])[:, 0]
+        reward += np.where(self.in_restricted_zone, self.RESTRICTED_ZONE_REWARD, 0)
+        return reward
+
+    # ------------------------------------------------------------------ VecEnv API
+    def reset(self):
+        self._reset_envs(np.arange(self.num_envs))
+        self._reset_seeds()
+        return self._get_obs()
+
+    def step_async(self, actions):
+        self._actions = np.asarray(actions, dtype=np.float64).reshape(self.num_envs, 2)
+
+    def step_wait(self):
+        actions = self._actions
+        if self.dynamic and self.zones_outdated.any():
+            self._regenerate_zones(np.flatnonzero(self.zones_outdated))
+
+        self.time += self.dt
+        update_batch(self.state, actions, self.friction, self.action_coef)
+        # targets catched before the move
+        catched = np.flatnonzero(self._dist_to_target() <= TARGET_RADIUS)
+        if len(catched):
+            self.targets[catched] = self.next_targets[catched]
+            self.next_targets[catched] = self._sample_targets(catched)
+            self.target_counter[catched] += 1
+            if self.dynamic:
+                self._set_target_map(catched)
+                self.zones_outdated[catched] = True
+        move_batch(self.state, self.dt)
+
+        out_of_bounds = self._out_of_bounds()
+        dones = (self.time >= self.time_limit) | out_of_bounds
+        obs = self._get_obs()
+        rewards = self._reward(out_of_bounds)
+        self.total_reward += rewards
+
+        infos: List[dict] = [{} for _ in range(self.num_envs)]
+        done_idx = np.flatnonzero(dones)
+        if len(done_idx):
+            for i in done_idx:
+                infos[i]['terminal_observation'] = obs[i].copy()
+                infos[i]['targets_catched'] = int(self.target_counter[i])
+                infos[i]['out_of_bounds'] = bool(out_of_bounds[i])
+            self._reset_envs(done_idx)
+            obs[done_idx] = self._get_obs()[done_idx]
+        return obs, rewards.astype(np.float32), dones, infos
+
+    def close(self):
+        pass
+
+    def get_attr(self, attr_name: str, indices: VecEnvIndices = None) -> List[Any]:
+        return [getattr(self, attr_name) for _ in self._get_indices(indices)]
+
+    def set_attr(self, attr_name: str, value: Any, indices: VecEnvIndices = None) -> None:
+        # all drones share the same constants
+        setattr(self, attr_name, value)
+
+    def env_method(self, method_name: str, *method_args, indices: VecEnvIndices = None, **method_kwargs):
+        method = getattr(self, method_name)
+        return [method(*method_args, **method_kwargs) for _ in self._get_indices(indices)]
+
+    def env_is_wrapped(self, wrapper_class, indices: VecEnvIndices = None) -> List[bool]:
+        return [False for _ in self._get_indices(indices)]
+
+    def seed(self, seed: Optional[int] = None):
+        seeds = [None if seed is None else seed + i for i in range(self.num_envs)]
+        self.np_randoms = [np.random.default_rng(env_seed) for env_seed in seeds]
+        self._target_candidates = [candidates[:0] for candidates in self._target_candidates]
+        return seeds
@@ -0,0 +1,209 @@
+"""
+Headless episode videos of the drone envs: frames are rendered into a preallocated ring buffer and encoded
+by a background thread, one file per episode.
+
+    env = VideoRecorder(make_env("maze", render_mode="rgb_array"), "tmp/videos", name_prefix="maze")
+    ...
+    env.close()  # waits for the last file
+
+Files are written with imageio when installed (mp4 or gif), with Pillow as gif otherwise, and as raw frames
+(`<name>.frames` with a `.json` header, see `load_frames`) when neither is available.
+"""
+import json
+import os
+import queue
+import threading
+
+import gymnasium as gym
+import numpy as np
+
+from environmetns.env_simple import FPS, STATE_H, STATE_W
+
+BACKENDS = ('imageio', 'pillow', 'raw')
+# frames rendered ahead of the encoder, the recorder waits for free slots beyond that
+RING_SIZE = 64
+# video pixels per state pixel
+VIDEO_SCALE = 4
+
+
+def available_backend():
+    for backend, module in (('imageio', 'imageio'), ('pillow', 'PIL')):
+        try:
+            __import__(module)
+            return backend
+        except ImportError:
+            pass
+    return 'raw'
+
+
+def _upscale(frame, scale):
+    return frame.repeat(scale, axis=0).repeat(scale, axis=1) if scale > 1 else frame
+
+
+class _ImageioWriter:
+    def __init__(self, path, fps, scale):
+        import imageio
+        kwargs = {'duration': 1 / fps} if path.endswith('.gif') else {'fps': fps}
+        self.writer = imageio.get_writer(path, **kwargs)
+        self.scale = scale
+
+    def write(self, frame):
+        self.writer.append_data(_upscale(frame, self.scale))
+
+    def close(self):
+        self.writer.close()
+
+
+class _PillowGifWriter:
+    # frames are appended to the file as they come, each with its own 16-color palette: memory stays bounded
+    # whatever the episode length
+    def __init__(self, path, fps, scale):
+        self.path = path
+        self.duration = round(1000 / fps)
+        self.scale = scale
+        self.file = None
+
+    def write(self, frame):
+        from PIL import GifImagePlugin, Image
+        image = Image.fromarray(frame).quantize(colors=16, method=Image.Quantize.FASTOCTREE)
+        image = image.resize((image.width * self.scale, image.height * self.scale), Image.NEAREST)
+        if self.file is None:
+            self.file = open(self.path, 'wb')
+            header, _ = GifImagePlugin.getheader(image, info={'loop': 0})
+            self.file.write(b''.join(header))
+        self.file.write(b''.join(GifImagePlugin.getdata(image, duration=self.duration, include_color_table=True)))
+
+    def close(self):
+        if self.file is not None:
+            # trailer
+            self.file.write(b';')
+            self.file.close()
+            self.file = None
+
+
+class _RawWriter:
+    def __init__(self, path, fps, scale):
+        self.path = path
+        self.file = open(path, 'wb')
+        self.n_frames = 0
+        self.fps = fps
+
+    def write(self, frame):
+        self.file.write(frame.tobytes())
+        self.n_frames += 1
+
+    def close(self):
+        self.file.close()
+        with open(self.path + '.json', 'w') as f:
+            json.dump({'shape': [self.n_frames, STATE_H, STATE_W, 3], 'dtype': 'uint8', 'fps': self.fps}, f)
+
+
+WRITERS = {'imageio': _ImageioWriter, 'pillow': _PillowGifWriter, 'raw': _RawWriter}
+
+
+def load_frames(path):
+    """(n, H, W, 3) frames of a raw recording, memory-mapped."""
+    with open(path + '.json') as f:
+        header = json.load(f)
+    return np.memmap(path, dtype=header['dtype'], mode='r', shape=tuple(header['shape']))
+
+
+class VideoRecorder(gym.Wrapper):
+    """
+    Records every episode of an env created with render_mode='rgb_array' to `<name_prefix>_<episode>.<ext>`.
+    Frames go through `ring_size` preallocated slots: memory stays bounded when the encoder falls behind,
+    stepping waits for it instead.
+
+    :param video_format: 'gif' or 'mp4' (imageio only, Pillow always writes gif)
+    :param backend: one of BACKENDS, the first installed one by default
+    :param scale: video pixels per state pixel
+    """
+
+    def __init__(self, env, directory, name_prefix='episode', video_format='gif', backend=None,
+                 scale=VIDEO_SCALE, ring_size=RING_SIZE, fps=FPS):
+        super().__init__(env)
+        self.directory = directory
+        self.name_prefix = name_prefix
+        self.backend = backend or available_backend()
+        if self.backend not in BACKENDS:
+            raise ValueError(f'Unexpected video backend {self.backend}. Please, choose one of {BACKENDS}')
+        self.extension = {'imageio': video_format, 'pillow': 'gif', 'raw': 'frames'}[self.backend]
+        self.scale = scale
+        self.fps = fps
+        os.makedirs(directory, exist_ok=True)
+        self.paths = []
+        self._episode = -1
+        self._recording = False
+        self._frames = np.empty((ring_size, STATE_W, STATE_H, 3), dtype=np.uint8)
+        self._slot = 0
+        self._free_slots = threading.Semaphore(ring_size)
+        self._queue = queue.Queue()
+        self._error = None
+        self._encoder = threading.Thread(target=self._encode, daemon=True)
+        self._encoder.start()
+
+    def reset(self, **kwargs):
+        obs, info = self.env.reset(**kwargs)
+        self._finish_episode()
+        self._episode += 1
+        path = os.path.join(self.directory, f'{self.name_prefix}_{self._episode:04d}.{self.extension}')
+        self.paths.append(path)
+        self._queue.put(('open', path))
+        self._recording = True
+        self._capture()
+        return obs, info
+
+    def step(self, action):
+        obs, reward, terminated, truncated, info = self.env.step(action)
+        if self._recording:
+            self._capture()
+            if terminated or truncated:
+                self._finish_episode()
+        return obs, reward, terminated, truncated, info
+
+    def _capture(self):
+        if self._error is not None:
+            raise self._error
+        self._free_slots.acquire()
+        slot = self._slot
+        self._slot = (slot + 1) % len(self._frames)
+        self.env.unwrapped.render_into(self._frames[slot])
+        self._queue.put(('frame', slot))
+
+    def _finish_episode(self):
+        if self._recording:
+            self._queue.put(('close', None))
+            self._recording = False
+
+    def _encode(self):
+        writer = None
+        while True:
+            message = self._queue.get()
+            if message is None:
+                return
+            kind, value = message
+            try:
+                if kind == 'open':
+                    writer = WRITERS[self.backend](value, self.fps, self.scale)
+                elif kind == 'frame' and writer is not None:
+                    # frames are indexed [x, y], videos [row, column]
+                    writer.write(self._frames[value].transpose(1, 0, 2))
+                elif kind == 'close' and writer is not None:
+                    writer.close()
+                    writer = None
+            except Exception as e:
+                # surfaces on the next captured frame, later frames of the file are dropped
+                self._error = e
+                writer = None
+            finally:
+                if kind == 'frame':
+                    self._free_slots.release()
+
+    def close(self):
+        """Finish the current file and wait until every file is written."""
+        self._finish_episode()
+        self._queue.put(None)
+        self._encoder.join()
+        super().close()
+        if self._error is not None:
+            raise self._error
@@ -0,0 +1,62 @@
+"""
+Headless evaluation of trained SAC agents, without the 30 FPS human window of test_model.py.
+
+    python evaluate_models.py                                   # shipped checkpoints, 300 episodes each
+    python evaluate_models.py --envs maze --checkpoints tmp/sac_maze_pretrained_model_100000_steps.zip
+    python evaluate_models.py --envs dynamic --backend batched --output eval.json
+"""
+import argparse
+import json
+import os
+import time
+
+from environmetns.registry import ENV_TYPES
+from training.evaluation import evaluate_batched, evaluate_pool, summarize
+
+DEFAULT_MODELS = {
+    'simple': "models/sac_simple_pretrained_model_20000000_steps.zip",
+    'maze': "models/sac_maze_pretrained_model_9760000_steps.zip",
+    'dynamic': "models/sac_dynamic_pretrained_model_3200000_steps.zip",
+}
+
+
+def prefer_numpy_actor(checkpoint):
+    # exported actors (python -m training.numpy_policy) evaluate without loading torch
+    npz = os.path.splitext(checkpoint)[0] + '.npz'
+    return npz if os.path.exists(npz) else checkpoint
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--envs', nargs='+', default=list(DEFAULT_MODELS), choices=list(ENV_TYPES))
+    parser.add_argument('--checkpoints', nargs='+', help='evaluate these checkpoints on every env')
+    parser.add_argument('--episodes', type=int, default=300)
+    parser.add_argument('--seed', type=int, default=0, help='seed of the first episode')
+    parser.add_argument('--time-limit', type=int, default=30)
+    parser.add_argument('--backend', choices=('pool', 'batched'), default='pool')
+    parser.add_argument('--workers', type=int, help='process pool size (default: number of cores)')
+    parser.add_argument('--output', help='write results to this JSON file')
+    args = parser.parse_args()
+
+    results = []
+    for env_name in args.envs:
+        for checkpoint in args.checkpoints or [DEFAULT_MODELS[env_name]]:
+            policy_path = prefer_numpy_actor(checkpoint)
+            start = time.perf_counter()
+            env_kwargs = {'time_limit': args.time_limit}
+            if args.backend == 'batched':
+                episodes = evaluate_batched(policy_path, env_name, args.episodes, args.seed, env_kwargs)
+            else:
+                episodes = evaluate_pool(policy_path, env_name, args.episodes, args.seed, args.workers, env_kwargs)
+            summary = summarize(episodes)
+            summary.update(env=env_name, checkpoint=checkpoint, seconds=time.perf_counter() - start)
+            results.append(summary)
+            print(f"{env_name:8s} {checkpoint}: "
+                  f"reward {summary['reward']['mean']:.1f} ± {summary['reward']['ci']:.1f}, "
+                  f"targets {summary['targets']['mean']:.2f} ± {summary['targets']['ci']:.2f}, "
+                  f"out of bounds {summary['out_of_bounds']['mean']:.1%}, "
+                  f"restricted {summary['restricted_time']['mean']:.2f}s "
+                  f"({summary['seconds']:.1f}s)")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
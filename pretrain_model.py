@@ -1,18 +1,20 @@
 import os
+import shutil
 
 from stable_baselines3 import SAC
-from stable_baselines3.common.callbacks import CheckpointCallback
 from stable_baselines3.common.env_util import make_vec_env
-from stable_baselines3.common.monitor import Monitor
 
 # Create log dir
 from environmetns.env_simple import SimpleEnv
+from environmetns.episode_stats import EpisodeStats
 from environmetns.player import SimplePlayer
+from training.callbacks import AsyncCheckpointCallback, EpisodeStatsCallback
+from training.replay_buffer import CompactReplayBuffer, use_compact_replay_buffer
 
 log_dir = "tmp/"
 os.makedirs(log_dir, exist_ok=True)
 
-env = make_vec_env(lambda: Monitor(SimpleEnv(player=SimplePlayer()), log_dir), n_envs=8)
+env = make_vec_env(lambda: EpisodeStats(SimpleEnv(player=SimplePlayer())), n_envs=8)
 
 # Create SAC agent
 model = SAC(
@@ -21,12 +23,18 @@ model = SAC(
     # buffer_size=10_000,
     # learning_starts=5_000,
     # batch_size=128,
+    replay_buffer_class=CompactReplayBuffer,
     verbose=1,
     tensorboard_log=log_dir
 )
+# memory-mapped, a new buffer for the new model: the one of a previous run is discarded.
+# Finetuning stages continue it with use_compact_replay_buffer(model, path, mode="reuse") and the same n_envs
+replay_buffer_dir = os.path.join(log_dir, "replay_buffer_simple")
+shutil.rmtree(replay_buffer_dir, ignore_errors=True)
+use_compact_replay_buffer(model, replay_buffer_dir, mode="create")
 
 # Create checkpoint callback
-checkpoint_callback = CheckpointCallback(
+checkpoint_callback = AsyncCheckpointCallback(
     save_freq=10000, save_path=log_dir, name_prefix="sac_simple_pretrained_model"
 )
 
@@ -34,12 +42,11 @@ checkpoint_callback = CheckpointCallback(
 final_model = model.learn(
     total_timesteps=20_000_000,
     callback=[
-        checkpoint_callback
+        checkpoint_callback,
+        # training curves: python -m training.episode_log tmp/episodes_simple
+        EpisodeStatsCallback(os.path.join(log_dir, "episodes_simple")),
     ]
 )
 
 final_model.save("sac_simple_pretrained_model_final")
-
-if __name__ == '__main__':
-    # TODO: check if can parse training logs for plots in report
-    pass
+final_model.replay_buffer.save()
@@ -0,0 +1,41 @@
+"""
+Headless episode videos of trained SAC agents, as fast as the policy runs, without the window of test_model.py.
+
+    python record_videos.py                                     # shipped checkpoints, 1 episode each
+    python record_videos.py --envs maze --checkpoints tmp/sac_maze_*_steps.zip --episodes 3 --format mp4
+"""
+import argparse
+import os
+import time
+
+from environmetns.registry import ENV_TYPES, make_env
+from environmetns.video import BACKENDS, VideoRecorder
+from evaluate_models import DEFAULT_MODELS, prefer_numpy_actor
+from training.evaluation import load_policy, run_episode
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--envs', nargs='+', default=list(DEFAULT_MODELS), choices=list(ENV_TYPES))
+    parser.add_argument('--checkpoints', nargs='+', help='record these checkpoints on every env')
+    parser.add_argument('--episodes', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=0, help='seed of the first episode')
+    parser.add_argument('--time-limit', type=int, default=30)
+    parser.add_argument('--output-dir', default='tmp/videos')
+    parser.add_argument('--format', choices=('gif', 'mp4'), default='gif', help='mp4 needs imageio')
+    parser.add_argument('--backend', choices=BACKENDS, help='default: the first installed one')
+    parser.add_argument('--scale', type=int, default=4, help='video pixels per state pixel')
+    args = parser.parse_args()
+
+    for env_name in args.envs:
+        for checkpoint in args.checkpoints or [DEFAULT_MODELS[env_name]]:
+            policy = load_policy(prefer_numpy_actor(checkpoint))
+            name_prefix = f'{env_name}_{os.path.splitext(os.path.basename(checkpoint))[0]}'
+            env = VideoRecorder(make_env(env_name, render_mode='rgb_array', time_limit=args.time_limit),
+                                args.output_dir, name_prefix, args.format, args.backend, args.scale)
+            start = time.perf_counter()
+            for episode in range(args.episodes):
+                result = run_episode(policy, env, args.seed + episode)
+                print(f"{env.paths[-1]}: reward {result['reward']:.1f}, targets {result['targets']:.0f}, "
+                      f"{result['length']:.0f} frames")
+            env.close()
+            print(f'{env_name:8s} {checkpoint}: {args.episodes} episodes in {time.perf_counter() - start:.1f}s')
@@ -0,0 +1,14 @@
+import pytest
+
+from environmetns import maps
+
+
+@pytest.fixture(autouse=True, scope='session')
+def maps_dir(tmp_path_factory):
+    """Compile map libraries into a temporary directory, never into the cache of the user."""
+    directory = str(tmp_path_factory.mktemp('drone-maps'))
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        # read on import by env processes, maps is already imported here
+        monkeypatch.setenv('DRONE_MAPS_DIR', directory)
+        monkeypatch.setattr(maps, 'MAPS_DIR', directory)
+        yield directory
@@ -0,0 +1,31 @@
+from stable_baselines3 import SAC
+from stable_baselines3.common.callbacks import BaseCallback
+from stable_baselines3.common.env_util import make_vec_env
+
+from environmetns.registry import make_env
+from training.callbacks import AsyncCheckpointCallback
+
+
+class StopAt(BaseCallback):
+    def __init__(self, n_calls):
+        super().__init__()
+        self.stop_calls = n_calls
+
+    def _on_step(self) -> bool:
+        return self.n_calls < self.stop_calls
+
+
+def test_checkpoints_are_written_when_training_stops_early(tmp_path):
+    model = SAC('MlpPolicy', make_vec_env(lambda: make_env('simple'), n_envs=2), buffer_size=1000,
+                learning_starts=50, batch_size=32, policy_kwargs={'net_arch': [16]}, seed=0)
+    callback = AsyncCheckpointCallback(25, str(tmp_path), name_prefix='sac', keep_last=1)
+    model.learn(1000, callback=[callback, StopAt(50)])
+    assert model.num_timesteps == 100
+    # the writer is done and shut down once learn() returns
+    assert callback.writer._shutdown and not callback.pending
+    assert sorted(path.name for path in tmp_path.iterdir()) == ['sac_100_steps.zip']
+    SAC.load(str(tmp_path / 'sac_100_steps.zip'))
+
+    # a new writer for the next learn() call
+    model.learn(50, callback=callback, reset_num_timesteps=False)
+    assert sorted(path.name for path in tmp_path.iterdir()) == ['sac_150_steps.zip']
@@ -0,0 +1,55 @@
+import os
+
+import numpy as np
+import pytest
+
+from environmetns.env_dynamic import BIG_RADIUS, CORRIDOR_POINTS, SMALL_RADIUS, restricted_zones_maps
+from environmetns.env_simple import STATE_BORDER, STATE_H, STATE_W, border_restricted_map, disc_offsets
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+pygame = pytest.importorskip('pygame')
+
+
+def pygame_zones(player, target, intermediate):
+    # DynamicEnv.generate_restricted_zones before the zones were computed with numpy
+    canvas = pygame.Surface((STATE_W, STATE_H))
+    canvas.fill((255, 255, 255))
+    free = (0, 0, 0)
+    for center in (player, target, intermediate):
+        pygame.draw.circle(canvas, free, center, BIG_RADIUS)
+    for start in (player, target):
+        for i in range(CORRIDOR_POINTS):
+            coef = i / CORRIDOR_POINTS
+            x = start[0] * (1 - coef) + intermediate[0] * coef
+            y = start[1] * (1 - coef) + intermediate[1] * coef
+            pygame.draw.circle(canvas, free, (x, y), SMALL_RADIUS)
+    restricted = (255, 255, 255)
+    pygame.draw.rect(canvas, restricted, (0, 0, STATE_BORDER, STATE_H))
+    pygame.draw.rect(canvas, restricted, (0, 0, STATE_W, STATE_BORDER))
+    pygame.draw.rect(canvas, restricted, (STATE_W - STATE_BORDER, 0, STATE_BORDER, STATE_H))
+    pygame.draw.rect(canvas, restricted, (STATE_BORDER, STATE_H - STATE_BORDER, STATE_W, STATE_BORDER))
+    return pygame.surfarray.array_red(canvas) > 0
+
+
+@pytest.mark.parametrize('radius', range(1, 30))
+def test_disc_offsets_match_pygame(radius):
+    center = radius + 1
+    surface = pygame.Surface((2 * center, 2 * center))
+    pygame.draw.circle(surface, (255, 255, 255), (center, center), radius)
+    expected = set(zip(*(np.nonzero(pygame.surfarray.array_red(surface)) - np.array([[center], [center]]))))
+    dx, dy = disc_offsets(radius)
+    assert len(dx) == len(expected)
+    assert set(zip(dx, dy)) == expected
+
+
+def test_restricted_zones_match_pygame():
+    rng = np.random.default_rng(0)
+    n = 200
+    players = rng.uniform(STATE_BORDER, STATE_W - STATE_BORDER, (n, 2))
+    targets = rng.uniform(STATE_BORDER, STATE_W - STATE_BORDER, (n, 2))
+    # intermediate points may lie outside of the map
+    intermediate = (players + targets) / 2 + rng.uniform(-30, 30, (n, 2))
+    maps = restricted_zones_maps(players, targets, intermediate, border_restricted_map())
+    for i in range(n):
+        expected = pygame_zones(tuple(players[i]), tuple(targets[i]), tuple(intermediate[i]))
+        assert np.array_equal(maps[i], expected), f'state {i}: {np.sum(maps[i] != expected)} pixels differ'
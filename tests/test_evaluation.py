@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+from environmetns.registry import make_env
+from training.evaluation import METRICS, evaluate_batched, run_episode
+
+
+class TargetPolicy:
+    """Steers towards the target: deterministic, and leaves the drone in restricted zones now and then."""
+
+    def predict(self, obs, deterministic=True):
+        obs = np.asarray(obs, dtype=np.float32)
+        dx, dy = obs[..., 2], obs[..., 3]
+        vx, vy = obs[..., 0], obs[..., 1]
+        action = np.stack([-(dy - vy) * 0.05, (dx - vx) * 0.05], axis=-1)
+        return np.clip(action, -1, 1).astype(np.float32), None
+
+
+@pytest.mark.parametrize('env_type', ['simple', 'maze', 'dynamic'])
+def test_batched_episodes_match_single_env_episodes(env_type):
+    policy = TargetPolicy()
+    batched = evaluate_batched(policy, env_type, 4, seed=10, env_kwargs={'time_limit': 5})
+    env = make_env(env_type, time_limit=5)
+    single = [run_episode(policy, env, 10 + i) for i in range(4)]
+    for batched_episode, single_episode in zip(batched, single):
+        for metric in METRICS:
+            assert batched_episode[metric] == pytest.approx(single_episode[metric], rel=1e-4, abs=1e-6), metric
+
+
+class ConstantPolicy:
+    def predict(self, obs, deterministic=True):
+        return np.array([0.3, 0.5], dtype=np.float32), None
+
+
+def test_restricted_time_counts_skipped_frames():
+    # a constant action flies the same frames with and without frame skip, through a maze wall
+    single = run_episode(ConstantPolicy(), make_env('maze', time_limit=10), 0)
+    skipped = run_episode(ConstantPolicy(), make_env('maze', time_limit=10, frame_skip=3), 0)
+    assert single['restricted_time'] > 0
+    assert skipped['restricted_time'] == pytest.approx(single['restricted_time'])
@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+from environmetns.registry import make_env
+
+FRAME_SKIP = 4
+
+
+def steer(obs, rng):
+    # towards the target with some noise: catches targets and crosses restricted zones
+    dx, dy, vx, vy = obs[2], obs[3], obs[0], obs[1]
+    action = np.array([-(dy - vy) * 0.05, (dx - vx) * 0.05]) + rng.normal(0, 0.3, 2)
+    return np.clip(action, -1, 1).astype(np.float32)
+
+
+def player_state(env):
+    player = env.player
+    return [player.x, player.y, player.xd, player.yd, player.a, player.ad]
+
+
+@pytest.mark.parametrize('env_type', ['simple', 'maze', 'dynamic'])
+def test_frame_skip_matches_single_frames(env_type):
+    skipped = make_env(env_type, frame_skip=FRAME_SKIP, time_limit=20)
+    single = make_env(env_type, time_limit=20)
+    rng = np.random.default_rng(0)
+    frames = set()
+    targets = 0
+    for seed in range(3):
+        obs, _ = skipped.reset(seed=seed)
+        single.reset(seed=seed)
+        done = False
+        while not done:
+            action = steer(obs, rng)
+            obs, reward, done, _, info = skipped.step(action)
+            # the closed form stops at the frame that catches the target or ends the round
+            frames.add(info['frames'])
+            rewards = []
+            for _ in range(info['frames']):
+                single_obs, single_reward, single_done, _, _ = single.step(action)
+                rewards.append(single_reward)
+            assert single_done == done
+            # single frames add the float32 action to the velocity, the closed form converts it to float first:
+            # rounding differences accumulate over the episode
+            assert player_state(skipped) == pytest.approx(player_state(single), abs=1e-4)
+            assert skipped.time == single.time
+            assert reward == pytest.approx(sum(rewards), abs=1e-4)
+            np.testing.assert_allclose(obs[:6], single_obs[:6], atol=1e-4)
+            np.testing.assert_array_equal(obs[6:], single_obs[6:])
+            assert skipped.player.target_counter == single.player.target_counter
+        targets += skipped.player.target_counter
+    assert FRAME_SKIP in frames and len(frames) > 1 and targets
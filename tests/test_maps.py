@@ -0,0 +1,97 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from environmetns import maps
+from environmetns.env_simple import border_restricted_map
+from environmetns.maze_generator import PROCEDURAL_POOL_SIZE, MazePoolRefresher, random_mazes
+from environmetns.registry import make_env
+
+BUILDS = []
+
+
+def build_test_layout():
+    BUILDS.append(1)
+    # concurrent compilations would overlap
+    time.sleep(0.2)
+    return border_restricted_map()
+
+
+@pytest.fixture
+def layout(tmp_path, monkeypatch):
+    monkeypatch.setattr(maps, '_LIBRARIES', {})
+    maps.register_layout('test_layout', build_test_layout)
+    BUILDS.clear()
+    yield str(tmp_path)
+    del maps.LAYOUT_BUILDERS['test_layout'], maps.LAYOUT_SOURCES['test_layout']
+
+
+def test_compiled_once_by_concurrent_processes(layout):
+    threads = [threading.Thread(target=maps.compile_layout, args=('test_layout', layout)) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(BUILDS) == 1
+    library = maps.get_library('test_layout', layout)
+    np.testing.assert_array_equal(library[0][0], border_restricted_map())
+    assert maps.get_library('test_layout', layout) is library and len(BUILDS) == 1
+
+
+def test_changed_sources_recompile(layout, monkeypatch):
+    maps.get_library('test_layout', layout)
+    old_files = set(os.listdir(layout))
+    monkeypatch.setattr(maps, 'fingerprint', lambda name: 'changed')
+    monkeypatch.setattr(maps, '_LIBRARIES', {})
+    maps.get_library('test_layout', layout)
+    assert len(BUILDS) == 2
+    assert sorted(set(os.listdir(layout)) - old_files) == ['test_layout.changed.occupancy.npy',
+                                                           'test_layout.changed.sdf.npy']
+    # outdated files are deleted
+    assert sorted(os.listdir(layout)) == ['test_layout.changed.occupancy.npy', 'test_layout.changed.sdf.npy',
+                                          'test_layout.lock']
+
+
+def test_fingerprint_covers_the_builder_module(layout):
+    assert 'tests.test_maps' in maps.LAYOUT_SOURCES['test_layout']
+    assert 'environmetns.sdf' in maps.LAYOUT_SOURCES['test_layout']
+
+
+def test_builtin_libraries_register_themselves(tmp_path):
+    code = ('import sys; from environmetns.maps import get_library; '
+            f'library = get_library("procedural", {str(tmp_path)!r}); '
+            'assert "environmetns.maze_generator" in sys.modules; print(len(library))')
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    assert result.returncode == 0, result.stderr
+    assert int(result.stdout) == PROCEDURAL_POOL_SIZE
+
+
+def test_refresher_deletes_and_evicts_replaced_pools(tmp_path, monkeypatch):
+    monkeypatch.setattr(maps, '_LIBRARIES', {})
+    refresher = MazePoolRefresher(n_layouts=4, directory=str(tmp_path))
+    env = make_env('maze', layout='procedural')
+    names = []
+    try:
+        for _ in range(3):
+            refresher.refresh()
+            while (name := refresher.poll()) is None:
+                time.sleep(0.05)
+            env.use_map_library(name, refresher.directory)
+            env.reset()
+            assert len(env.map_library) == 4
+            names.append(name)
+    finally:
+        refresher.close()
+    assert not os.path.exists(maps.MapLibrary.paths(names[0], str(tmp_path))[0])
+    assert {name for name, _ in maps._LIBRARIES} == {'procedural', *names[1:]}
+
+
+def test_impossible_mazes_raise():
+    with pytest.raises(ValueError, match='clearance=50'):
+        random_mazes(np.random.default_rng(0), 4, clearance=50, batch=16)
@@ -0,0 +1,28 @@
+import numpy as np
+import pytest
+from stable_baselines3 import SAC
+
+from environmetns.registry import make_env
+from training.numpy_policy import NumpyPolicy, check_export, export_actor
+
+
+@pytest.mark.parametrize('activation', ['ReLU', 'Tanh'])
+def test_exported_actor_matches_sb3(tmp_path, activation):
+    import torch
+
+    model = SAC('MlpPolicy', make_env('simple'), seed=0,
+                policy_kwargs={'net_arch': [32, 16], 'activation_fn': getattr(torch.nn, activation)})
+    model_path = str(tmp_path / 'model.zip')
+    model.save(model_path)
+
+    model, policy, output_path = export_actor(model_path)
+    loaded = NumpyPolicy.load(output_path)
+    assert loaded.activation == activation and len(loaded.weights) == 2
+    assert check_export(model, loaded) <= 1e-5
+
+    rng = np.random.default_rng(0)
+    obs = rng.uniform(-10, 10, size=(64,) + model.observation_space.shape).astype(np.float32)
+    expected, _ = model.predict(obs, deterministic=True)
+    np.testing.assert_allclose(loaded.predict(obs)[0], expected, atol=1e-5)
+    # single observations, like model.predict
+    np.testing.assert_allclose(loaded.predict(obs[0])[0], expected[0], atol=1e-5)
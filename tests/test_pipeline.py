@@ -0,0 +1,18 @@
+import json
+
+from training.pipeline import load_config, run_stage
+
+SAC_KWARGS = {'buffer_size': 1000, 'learning_starts': 50, 'batch_size': 32, 'policy_kwargs': {'net_arch': [16]}}
+
+
+def write_config(tmp_path, stages):
+    path = tmp_path / 'config.json'
+    path.write_text(json.dumps({'log_dir': str(tmp_path / 'logs'), 'stages': stages}))
+    return load_config(path)
+
+
+def test_subproc_envs_run_on_the_stage_cores(tmp_path):
+    config = write_config(tmp_path, {'stage': {'env': 'simple', 'timesteps': 100, 'n_envs': 4, 'cores': 2,
+                                               'vec_env': 'subproc', 'sac': SAC_KWARGS}})
+    model = run_stage('stage', config['stages']['stage'], config['log_dir'])
+    assert len(model.get_env().processes) == 2
@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+
+from environmetns.recorder import TrajectoryDataset, TrajectoryRecorder
+from environmetns.registry import make_env
+
+
+@pytest.mark.parametrize('compress', [False, True])
+def test_recorded_episodes_round_trip(tmp_path, compress):
+    env = TrajectoryRecorder(make_env('simple'), str(tmp_path / 'worker_0'), chunk_size=64, compress=compress)
+    rng = np.random.default_rng(0)
+    expected = {'obs': [], 'next_obs': [], 'action': [], 'reward': [], 'terminated': [], 'truncated': []}
+    for episode in range(2):
+        obs, _ = env.reset(seed=episode)
+        done = False
+        while not done:
+            action = rng.uniform(-1, 1, env.action_space.shape).astype(np.float32)
+            next_obs, reward, terminated, truncated, _ = env.step(action)
+            for name, value in zip(expected, (obs, next_obs, action, reward, terminated, truncated)):
+                expected[name].append(value)
+            obs = next_obs
+            done = terminated or truncated
+    env.close()
+
+    dataset = TrajectoryDataset(str(tmp_path))
+    assert len(dataset) == len(expected['obs']) > 64
+    batches = list(dataset.batches(50, columns=list(expected) + ['episode']))
+    assert [len(batch['obs']) for batch in batches[:-1]] == [50] * (len(batches) - 1)
+    recorded = {name: np.concatenate([batch[name] for batch in batches]) for name in list(expected) + ['episode']}
+    for name, values in expected.items():
+        np.testing.assert_array_equal(recorded[name], np.array(values, dtype=recorded[name].dtype))
+    # transitions are rebuilt from single rows, the final observation of each episode included
+    last = np.flatnonzero(recorded['terminated'] | recorded['truncated'])
+    assert len(last) == 2 and last[-1] == len(dataset) - 1
+    same_episode = recorded['episode'][1:] == recorded['episode'][:-1]
+    np.testing.assert_array_equal(recorded['next_obs'][:-1][same_episode], recorded['obs'][1:][same_episode])
@@ -0,0 +1,174 @@
+import json
+import os
+
+import numpy as np
+import pytest
+from gymnasium import spaces
+from stable_baselines3 import SAC
+from stable_baselines3.common.buffers import ReplayBuffer
+
+from training.callbacks import AsyncCheckpointCallback
+from training.pipeline import final_model_path, load_config, replay_buffer_path, run_stage
+from training.replay_buffer import CompactReplayBuffer, use_compact_replay_buffer
+
+N_ENVS = 4
+N_DENSE = 6
+N_RAYS = 8
+OBSERVATION_SPACE = spaces.Box(np.array([-100] * N_DENSE + [0] * N_RAYS, dtype=np.float32),
+                               np.array([100] * N_DENSE + [1] * N_RAYS, dtype=np.float32))
+ACTION_SPACE = spaces.Box(-1, 1, (2,), dtype=np.float32)
+
+
+def random_obs(rng):
+    return np.concatenate([rng.normal(size=(N_ENVS, N_DENSE)), rng.integers(0, 2, (N_ENVS, N_RAYS))],
+                          axis=1).astype(np.float32)
+
+
+def fill(buffers, n_steps, seed=0):
+    """Add the transitions of `N_ENVS` envs stepped like an SB3 VecEnv, with terminations and time limits."""
+    rng = np.random.default_rng(seed)
+    obs = random_obs(rng)
+    for _ in range(n_steps):
+        new_obs = random_obs(rng)
+        dones = rng.random(N_ENVS) < 0.1
+        timeouts = dones & (rng.random(N_ENVS) < 0.5)
+        # the terminal observation of done envs, new_obs holds their reset observation
+        next_obs = np.where(dones[:, None], random_obs(rng), new_obs)
+        infos = [{'TimeLimit.truncated': bool(timeout)} for timeout in timeouts]
+        action = rng.uniform(-1, 1, (N_ENVS, 2)).astype(np.float32)
+        reward = rng.normal(size=N_ENVS).astype(np.float32)
+        for buffer in buffers:
+            buffer.add(obs, next_obs, action, reward, dones, infos)
+        obs = new_obs
+
+
+def compact_buffer(size, path=None, mode='create', n_envs=N_ENVS):
+    return CompactReplayBuffer(size, OBSERVATION_SPACE, ACTION_SPACE, 'cpu', n_envs=n_envs, path=path, mode=mode)
+
+
+@pytest.mark.parametrize('n_steps', [30, 130])
+@pytest.mark.parametrize('memory_mapped', [False, True])
+def test_samples_match_sb3_replay_buffer(tmp_path, n_steps, memory_mapped):
+    size = 100 * N_ENVS
+    sb3 = ReplayBuffer(size, OBSERVATION_SPACE, ACTION_SPACE, 'cpu', n_envs=N_ENVS)
+    compact = compact_buffer(size, str(tmp_path / 'buffer') if memory_mapped else None)
+    fill([sb3, compact], n_steps)
+    assert (compact.pos, compact.full) == (sb3.pos, sb3.full)
+
+    for seed in range(5):
+        np.random.seed(seed)
+        samples = compact.sample(256)
+        # same draws as CompactReplayBuffer.sample, which skips the row at pos
+        np.random.seed(seed)
+        if compact.full:
+            batch_inds = (np.random.randint(1, compact.buffer_size, size=256) + compact.pos) % compact.buffer_size
+        else:
+            batch_inds = np.random.randint(0, compact.pos, size=256)
+        expected = sb3._get_samples(batch_inds)
+        for name in ('observations', 'actions', 'rewards', 'dones'):
+            np.testing.assert_array_equal(getattr(samples, name).numpy(), getattr(expected, name).numpy())
+        # terminated transitions store the reset observation as their next one, masked by done
+        kept = expected.dones.numpy()[:, 0] == 0
+        assert kept.any() and not kept.all()
+        np.testing.assert_array_equal(samples.next_observations.numpy()[kept],
+                                      expected.next_observations.numpy()[kept])
+
+
+def test_bits_are_packed():
+    buffer = compact_buffer(100 * N_ENVS)
+    assert buffer.n_binary == N_RAYS and buffer.bits.shape == (100, N_ENVS, 1)
+    assert buffer.nbytes / (100 * N_ENVS) < 40
+
+
+def test_save_and_reuse(tmp_path):
+    path = str(tmp_path / 'buffer')
+    buffer = compact_buffer(50 * N_ENVS, path)
+    # written on creation: an empty buffer is reused as such
+    with open(os.path.join(path, 'meta.json')) as f:
+        assert json.load(f)['pos'] == 0
+    fill([buffer], 70)
+    buffer.save()
+
+    reopened = compact_buffer(50 * N_ENVS, path, mode='reuse')
+    assert (reopened.pos, reopened.full) == (buffer.pos, buffer.full)
+    for name in ('dense', 'bits', 'actions', 'rewards', 'dones', 'timeouts'):
+        np.testing.assert_array_equal(getattr(reopened, name), getattr(buffer, name))
+    assert reopened.truncated_next_obs.keys() == buffer.truncated_next_obs.keys()
+
+    with pytest.raises(FileExistsError):
+        compact_buffer(50 * N_ENVS, path)
+    with pytest.raises(ValueError):
+        compact_buffer(50 * 2, path, mode='reuse', n_envs=2)
+    with pytest.raises(FileNotFoundError):
+        compact_buffer(50 * N_ENVS, str(tmp_path / 'missing'), mode='reuse')
+
+
+def test_reuse_drops_timeouts_added_after_the_last_save(tmp_path):
+    path = str(tmp_path / 'buffer')
+    buffer = compact_buffer(50 * N_ENVS, path)
+    fill([buffer], 20)
+    buffer.save()
+    fill([buffer], 20, seed=1)
+    del buffer
+
+    reopened = compact_buffer(50 * N_ENVS, path, mode='reuse')
+    rows, envs = np.nonzero(reopened.timeouts)
+    assert all(row * N_ENVS + env in reopened.truncated_next_obs for row, env in zip(rows, envs))
+    reopened.sample(256)
+
+
+def make_model():
+    from environmetns.registry import make_env
+    from stable_baselines3.common.env_util import make_vec_env
+
+    env = make_vec_env(lambda: make_env('simple'), n_envs=2)
+    return SAC('MlpPolicy', env, buffer_size=1000, learning_starts=50, batch_size=32,
+               policy_kwargs={'net_arch': [16]}, replay_buffer_class=CompactReplayBuffer, seed=0)
+
+
+def test_loading_a_checkpoint_during_training_leaves_the_buffer(tmp_path):
+    model = make_model()
+    path = str(tmp_path / 'buffer')
+    use_compact_replay_buffer(model, path)
+    callback = AsyncCheckpointCallback(100, str(tmp_path), name_prefix='sac', save_replay_buffer=True)
+    model.learn(200, callback=callback)
+    dense = np.array(model.replay_buffer.dense)
+    assert np.any(dense)
+
+    # e.g. evaluate_models or a finetuning stage starting from a checkpoint of the running stage
+    loaded = SAC.load(str(tmp_path / 'sac_200_steps.zip'))
+    assert 'path' not in loaded.replay_buffer_kwargs and loaded.replay_buffer.path is None
+    reopened = compact_buffer(1000, path, mode='reuse', n_envs=2)
+    np.testing.assert_array_equal(reopened.dense, dense)
+    # checkpoints are taken before the transition of their step is added
+    assert reopened.pos == model.replay_buffer.pos - 1
+
+    model.learn(100, reset_num_timesteps=False)
+    assert model.replay_buffer.pos == 150
+
+
+def test_pipeline_hands_the_replay_buffer_over(tmp_path):
+    config_path = tmp_path / 'config.json'
+    stage = {'env': 'simple', 'timesteps': 200, 'n_envs': 2, 'replay_buffer': 'compact', 'save_freq': 50,
+             'sac': {'buffer_size': 1000, 'learning_starts': 50, 'batch_size': 32, 'policy_kwargs': {'net_arch': [16]}}}
+    # the finetuning stage keeps the SAC arguments of its init model
+    finetune = {**stage, 'env': 'maze', 'init': 'pretrain', 'init_replay_buffer': True, 'sac': {}}
+    config_path.write_text(json.dumps({'stages': {'pretrain': stage, 'finetune': {**finetune, 'n_envs': 4}}}))
+    with pytest.raises(ValueError):
+        load_config(config_path)
+    config_path.write_text(json.dumps({'log_dir': str(tmp_path), 'stages': {'pretrain': stage, 'finetune': finetune}}))
+    config = load_config(config_path)
+    log_dir, stages = config['log_dir'], config['stages']
+
+    pretrained = run_stage('pretrain', stages['pretrain'], log_dir)
+    pretrained_dense = np.array(pretrained.replay_buffer.dense)
+    stage = {**stages['finetune'], 'init': final_model_path(log_dir, 'pretrain'),
+             'init_replay_buffer': replay_buffer_path(log_dir, 'pretrain')}
+    model = run_stage('finetune', stage, log_dir)
+    assert model.replay_buffer.path == replay_buffer_path(log_dir, 'finetune')
+    # the finetuning transitions follow the pretraining ones
+    assert model.replay_buffer.pos == 200
+    np.testing.assert_array_equal(model.replay_buffer.dense[:100], pretrained_dense[:100])
+    # the pretraining buffer is left as saved
+    reopened = compact_buffer(1000, replay_buffer_path(log_dir, 'pretrain'), mode='reuse', n_envs=2)
+    assert reopened.pos == 100
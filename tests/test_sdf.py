@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+
+from environmetns.maze_generator import random_mazes
+from environmetns.registry import make_env
+from environmetns.sdf import distance_transform, ray_directions, signed_distance_field, trace_rays
+
+# reference rays advance by this many pixels
+MARCH_STEP = 1e-3
+
+
+def brute_force_distance(features):
+    cells = np.argwhere(features)
+    grid = np.stack(np.meshgrid(*map(np.arange, features.shape), indexing='ij'), axis=-1)
+    return np.sqrt(((grid[:, :, None, :] - cells) ** 2).sum(-1).min(-1))
+
+
+def march(restricted_map, origin, direction, max_dist):
+    # first point of the ray in a restricted cell or out of the map
+    t = np.arange(0, max_dist + MARCH_STEP, MARCH_STEP)
+    points = origin + t[:, None] * direction
+    w, h = restricted_map.shape
+    hit = (points[:, 0] < 0) | (points[:, 0] >= w) | (points[:, 1] < 0) | (points[:, 1] >= h)
+    inside = ~hit
+    hit[inside] = restricted_map[points[inside, 0].astype(int), points[inside, 1].astype(int)]
+    return t[np.argmax(hit)] if hit.any() else max_dist
+
+
+def test_distance_transform_is_exact():
+    rng = np.random.default_rng(0)
+    for density in (0.02, 0.2, 0.6):
+        features = rng.random((3, 23, 17)) < density
+        features[:, 0, 0] = True
+        distances = distance_transform(features)
+        for grid, expected in zip(features, distances):
+            np.testing.assert_allclose(expected, brute_force_distance(grid), rtol=1e-6)
+
+
+@pytest.mark.parametrize('n_rays', [8, 16, 32])
+def test_traced_rays_match_marched_rays(n_rays):
+    rng = np.random.default_rng(n_rays)
+    directions = ray_directions(n_rays)
+    for restricted_map in random_mazes(rng, 5):
+        free = np.argwhere(~restricted_map)
+        origins = free[rng.integers(len(free), size=20)] + rng.random((20, 2))
+        traced = trace_rays(signed_distance_field(restricted_map), origins, directions, 20)
+        expected = [[march(restricted_map, origin, direction, 20) for direction in directions] for origin in origins]
+        # walls are never stepped over, hits are at most one reference step apart
+        np.testing.assert_allclose(traced, expected, atol=MARCH_STEP + 1e-6)
+
+
+def test_stacked_fields_match_single_fields():
+    rng = np.random.default_rng(1)
+    maps = random_mazes(rng, 4)
+    origins = np.array([np.argwhere(~m)[0] + 0.5 for m in maps])
+    directions = ray_directions(16)
+    stacked = trace_rays(signed_distance_field(maps), origins, directions, 7)
+    for i, restricted_map in enumerate(maps):
+        np.testing.assert_array_equal(stacked[i], trace_rays(signed_distance_field(restricted_map), origins[i:i + 1],
+                                                             directions, 7)[0])
+
+
+def test_sdf_rays_see_the_walls_of_point_rays():
+    # a restricted ray end is ray_range away, so the traced ray hits before it
+    env = make_env('maze', ray_mode='point')
+    sdf_env = make_env('maze', ray_mode='sdf')
+    rng = np.random.default_rng(0)
+    seen = 0
+    for seed in range(5):
+        point_obs, _ = env.reset(seed=seed)
+        sdf_obs, _ = sdf_env.reset(seed=seed)
+        done = False
+        while not done:
+            np.testing.assert_array_equal(point_obs[:6], sdf_obs[:6])
+            assert np.all(sdf_obs[6:][point_obs[6:] == 1] > 0)
+            seen += int(point_obs[6:].sum())
+            action = rng.uniform(-0.3, 0.3, 2).astype(np.float32)
+            point_obs, _, done, truncated, _ = env.step(action)
+            sdf_obs, _, _, _, _ = sdf_env.step(action)
+            done = done or truncated
+    assert seen
@@ -0,0 +1,56 @@
+import gymnasium as gym
+import numpy as np
+from stable_baselines3.common.vec_env import DummyVecEnv
+
+from environmetns.registry import make_env
+from environmetns.shm_vec_env import SharedMemoryVecEnv
+
+N_ENVS = 4
+
+
+class ResetOptions(gym.Wrapper):
+    """Reports the options of the last reset in its info."""
+
+    def reset(self, *, seed=None, options=None):
+        obs, info = self.env.reset(seed=seed, options=options)
+        return obs, {**info, 'options': options}
+
+
+def env_fns():
+    return [lambda: ResetOptions(make_env('simple')) for _ in range(N_ENVS)]
+
+
+def test_steps_match_dummy_vec_env():
+    dummy = DummyVecEnv(env_fns())
+    shared = SharedMemoryVecEnv(env_fns(), n_workers=2)
+    try:
+        dummy.seed(0)
+        shared.seed(0)
+        # the envs ignore reset options, DummyVecEnv takes them from stable-baselines3 2.2 on
+        shared.set_options({'layout': 1})
+        np.testing.assert_array_equal(shared.reset(), dummy.reset())
+        assert [info['options'] for info in shared.reset_infos] == [{'layout': 1}] * N_ENVS
+
+        rng = np.random.default_rng(0)
+        n_dones = 0
+        for _ in range(500):
+            actions = rng.uniform(-1, 1, (N_ENVS,) + shared.action_space.shape).astype(np.float32)
+            obs, rewards, dones, infos = shared.step(actions)
+            expected_obs, expected_rewards, expected_dones, expected_infos = dummy.step(actions)
+            np.testing.assert_allclose(obs, expected_obs, rtol=1e-6)
+            np.testing.assert_allclose(rewards, expected_rewards, rtol=1e-6)
+            np.testing.assert_array_equal(dones, expected_dones)
+            assert infos[0].keys() == expected_infos[0].keys()
+            for info, expected in zip(infos, expected_infos):
+                assert info['TimeLimit.truncated'] == expected['TimeLimit.truncated']
+                if 'terminal_observation' in expected:
+                    np.testing.assert_allclose(info['terminal_observation'], expected['terminal_observation'],
+                                               rtol=1e-6)
+            n_dones += dones.sum()
+        assert n_dones > 0
+
+        # options are used once, like seeds
+        shared.reset()
+        assert [info['options'] for info in shared.reset_infos] == [None] * N_ENVS
+    finally:
+        shared.close()
@@ -0,0 +1,101 @@
+import json
+import pytest
+
+from training.checkpoints import list_chunks
+from training.pipeline import check_stage, latest_checkpoint, replay_buffer_path, run_stage
+from training.sweep import ASHAScheduler, load_sweep, rungs, run_sweep
+
+SAC_KWARGS = {'buffer_size': 1000, 'learning_starts': 50, 'batch_size': 32, 'policy_kwargs': {'net_arch': [16]}}
+
+
+def test_rungs():
+    sweep = {'min_timesteps': 100, 'max_timesteps': 1000, 'eta': 3}
+    assert rungs(sweep) == [100, 300, 900, 1000]
+    assert rungs({**sweep, 'max_timesteps': 900}) == [100, 300, 900]
+
+
+def result(trial, timesteps, score):
+    return {'trial': trial, 'timesteps': timesteps, 'status': 'completed', 'score': score}
+
+
+def failed(trial, timesteps):
+    return {'trial': trial, 'timesteps': timesteps, 'status': 'failed', 'score': None}
+
+
+def test_asha_promotes_the_top_of_a_rung():
+    scheduler = ASHAScheduler([1, 3, 9], eta=3, n_trials=9)
+    assert [scheduler.next_job() for _ in range(2)] == [(0, 0), (1, 0)]
+    scheduler.record(result(0, 1, 5.0))
+    scheduler.record(result(1, 1, 1.0))
+    # fewer than eta results: no promotion yet
+    assert scheduler.next_job() == (2, 0)
+    scheduler.record(result(2, 1, 3.0))
+    # trial 0 is the top third of the 3 trials evaluated at rung 0
+    assert scheduler.next_job() == (0, 1)
+    assert scheduler.next_job() == (3, 0)
+    for trial, score in ((3, 4.0), (4, 6.0), (5, 0.0)):
+        scheduler.record(result(trial, 1, score))
+    # top 2 of 6: trial 0 already promoted, then trial 4
+    assert scheduler.next_job() == (4, 1)
+    scheduler.record(result(0, 3, 2.0))
+    scheduler.record(result(4, 3, 7.0))
+    assert scheduler.next_job() == (6, 0)
+    assert scheduler.best(2) == [(4, 1, 7.0), (0, 1, 2.0)]
+
+
+def test_asha_never_promotes_failed_trials():
+    scheduler = ASHAScheduler([1, 3], eta=2, n_trials=2)
+    scheduler.record(failed(0, 1))
+    scheduler.record(failed(1, 1))
+    assert scheduler.next_job() is None
+
+
+def test_failed_trials_are_written_as_strict_json(tmp_path):
+    path = tmp_path / 'sweep.json'
+    # torch rejects the learning rate when the trial builds its model
+    path.write_text(json.dumps({'log_dir': str(tmp_path / 'sweep'), 'stage': {'env': 'simple', 'sac': SAC_KWARGS},
+                                'space': {'sac.learning_rate': [-1.0]}, 'n_trials': 1, 'min_timesteps': 100,
+                                'max_timesteps': 100, 'workers': 1}))
+    run_sweep(load_sweep(path))
+
+    def reject(constant):
+        raise ValueError(f'non-standard JSON constant {constant}')
+
+    with open(tmp_path / 'sweep' / 'results.jsonl') as f:
+        records = [json.loads(line, parse_constant=reject) for line in f]
+    assert [(record['status'], record['score']) for record in records] == [('failed', None)]
+    # a continued sweep does not retry it
+    assert run_sweep(load_sweep(path)).next_job() is None
+
+
+def test_asha_continues_from_recorded_results():
+    scheduler = ASHAScheduler([1, 3], eta=2, n_trials=3)
+    for record in (result(0, 1, 1.0), result(1, 1, 2.0), result(1, 3, 3.0)):
+        scheduler.record(record)
+    # trial 1 was promoted by the previous run
+    assert scheduler.next_job() == (2, 0)
+    assert scheduler.next_job() is None
+
+
+def test_sac_space_of_init_stages_is_rejected(tmp_path):
+    path = tmp_path / 'sweep.json'
+    path.write_text(json.dumps({'stage': {'env': 'simple', 'init': 'model.zip'},
+                                'space': {'sac.learning_rate': [1e-4, 1e-3]}}))
+    with pytest.raises(ValueError, match='sac.learning_rate'):
+        load_sweep(path)
+    with pytest.raises(ValueError, match='would be ignored'):
+        check_stage('stage', {'env': 'simple', 'init': 'model.zip', 'timesteps': 100, 'sac': {'batch_size': 64}})
+
+
+def test_checkpoint_resume_continues_training(tmp_path):
+    # the rungs of a sweep trial: each run trains further from the checkpoint of the previous one
+    stage = check_stage('trial', {'env': 'simple', 'timesteps': 200, 'n_envs': 2, 'save_freq': 1000,
+                                  'sac': SAC_KWARGS})
+    run_stage('trial', stage, str(tmp_path), checkpoint_on_end=True)
+    assert latest_checkpoint(str(tmp_path), 'trial')[1] == 200
+    model = run_stage('trial', {**stage, 'timesteps': 500}, str(tmp_path), checkpoint_on_end=True)
+    assert model.num_timesteps == 500
+    assert latest_checkpoint(str(tmp_path), 'trial')[1] == 500
+    # the replay buffer was rebuilt from the chunks of the first run and continued
+    assert model.replay_buffer.pos == 250
+    assert list_chunks(replay_buffer_path(str(tmp_path), 'trial'))[-1][1] == 250
@@ -0,0 +1,27 @@
+import numpy as np
+from PIL import Image
+
+from environmetns.registry import make_env
+from environmetns.video import VIDEO_SCALE, VideoRecorder, load_frames
+
+
+def record(tmp_path, backend, n_steps=30):
+    env = VideoRecorder(make_env('maze', render_mode='rgb_array'), str(tmp_path), backend=backend)
+    env.reset(seed=0)
+    for _ in range(n_steps):
+        env.step(np.zeros(2, dtype=np.float32))
+    env.close()
+    return env.paths[0]
+
+
+def test_pillow_gif_matches_raw_frames(tmp_path):
+    raw = load_frames(record(tmp_path / 'raw', 'raw'))
+    gif = Image.open(record(tmp_path / 'gif', 'pillow'))
+    assert gif.n_frames == len(raw) == 31
+    for i in (0, 30):
+        gif.seek(i)
+        frame = np.asarray(gif.convert('RGB'))[::VIDEO_SCALE, ::VIDEO_SCALE]
+        # 16-color palettes of the rendered frames
+        expected = np.asarray(Image.fromarray(np.asarray(raw[i])).quantize(
+            colors=16, method=Image.Quantize.FASTOCTREE).convert('RGB'))
+        np.testing.assert_array_equal(frame, expected)
@@ -0,0 +1,266 @@
+import os
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from stable_baselines3.common.callbacks import BaseCallback
+
+from environmetns.episode_stats import EPISODE_COLUMNS
+from training.checkpoints import ModelSnapshot, ReplayBufferChunk, chunk_path, list_chunks
+from training.episode_log import EpisodeLogWriter
+from training.replay_buffer import CompactReplayBuffer
+
+
+class ProfilingCallback(BaseCallback):
+    """
+    Aggregates `info['profile']` of envs created with `profile=True` into logger scalars:
+    mean time per call of every step phase (in microseconds) and counters per env step.
+
+    :param log_freq: number of callback calls (vectorized steps) between two records
+    """
+
+    def __init__(self, log_freq=1000, verbose=0):
+        super().__init__(verbose)
+        self.log_freq = log_freq
+        self.totals = defaultdict(float)
+        self.env_steps = 0
+
+    def _on_step(self) -> bool:
+        for info in self.locals['infos']:
+            profile = info.get('profile')
+            if profile is None:
+                continue
+            self.env_steps += 1
+            for key, value in profile.items():
+                self.totals[key] += value
+        if self.n_calls % self.log_freq == 0:
+            self._record()
+        return True
+
+    def _record(self):
+        if not self.env_steps:
+            return
+        step_time = 0.0
+        for key, value in self.totals.items():
+            kind, name = key.split('/', 1)
+            if kind == 'time':
+                calls = self.totals.get(f'calls/{name}', 0)
+                self.logger.record(f'profile/{name}_us', value / calls * 1e6 if calls else 0.0)
+                step_time += value
+            elif kind == 'count':
+                self.logger.record(f'profile/{name}_per_step', value / self.env_steps)
+        self.logger.record('profile/step_us', step_time / self.env_steps * 1e6)
+        self.totals.clear()
+        self.env_steps = 0
+
+    def _on_training_end(self) -> None:
+        self._record()
+
+
+class EpisodeStatsCallback(BaseCallback):
+    """
+    Writes the `info['episode_stats']` batches of envs wrapped in `EpisodeStats` to a columnar episode log
+    (see `training.episode_log`) and records the mean reward terms of the new episodes into logger scalars.
+
+    :param log_dir: directory of the episode log
+    :param log_freq: number of callback calls (vectorized steps) between two writes
+    """
+
+    def __init__(self, log_dir, log_freq=1000, verbose=0):
+        super().__init__(verbose)
+        self.log_dir = log_dir
+        self.log_freq = log_freq
+        self.writer = None
+        self.batches = []
+
+    def _init_callback(self) -> None:
+        self.writer = EpisodeLogWriter(self.log_dir)
+
+    def _on_step(self) -> bool:
+        for env, info in enumerate(self.locals['infos']):
+            rows = info.get('episode_stats')
+            if rows is not None and len(rows):
+                self.batches.append((self.num_timesteps, env, rows))
+        if self.n_calls % self.log_freq == 0:
+            self._write()
+        return True
+
+    def _write(self):
+        if not self.batches:
+            return
+        rows = np.concatenate([rows for _, _, rows in self.batches])
+        timesteps = np.concatenate([np.full(len(rows), timesteps) for timesteps, _, rows in self.batches])
+        envs = np.concatenate([np.full(len(rows), env) for _, env, rows in self.batches])
+        self.writer.append(timesteps, envs, rows)
+        for name, values in zip(EPISODE_COLUMNS, rows.T):
+            if name != 'time':
+                self.logger.record(f'episode/{name}_mean', float(values.mean()))
+        self.batches = []
+
+    def _on_training_end(self) -> None:
+        # episodes still held by the envs
+        for env, rows in enumerate(self.training_env.env_method('pop_episode_stats')):
+            if len(rows):
+                self.batches.append((self.num_timesteps, env, rows))
+        self._write()
+
+
+class MazePoolCallback(BaseCallback):
+    """
+    Keeps envs created with `layout='procedural'` training on fresh maze layouts: a new pool is generated
+    on a background process every `refresh_freq` callback calls and the envs switch to it on their next reset.
+
+    :param refresh_freq: number of callback calls (vectorized steps) between two pool refreshes
+    :param refresher_kwargs: arguments of `MazePoolRefresher`, e.g. n_layouts, n_walls or clearance
+    """
+
+    def __init__(self, refresh_freq=100_000, verbose=0, **refresher_kwargs):
+        super().__init__(verbose)
+        self.refresh_freq = refresh_freq
+        self.refresher_kwargs = refresher_kwargs
+        self.refresher = None
+
+    def _on_training_start(self) -> None:
+        from environmetns.maze_generator import MazePoolRefresher
+        self.refresher = MazePoolRefresher(**self.refresher_kwargs)
+
+    def _on_step(self) -> bool:
+        if self.n_calls % self.refresh_freq == 0:
+            self.refresher.refresh()
+        name = self.refresher.poll()
+        if name is not None:
+            self.training_env.env_method('use_map_library', name, self.refresher.directory)
+            self.logger.record('maze_pool/generation', self.refresher.generation)
+            if self.verbose:
+                print(f'Switched envs to map library {name}')
+        return True
+
+    def _on_training_end(self) -> None:
+        self.refresher.close()
+
+
+def _memory_mapped(replay_buffer):
+    return isinstance(replay_buffer, CompactReplayBuffer) and replay_buffer.path is not None
+
+
+class AsyncCheckpointCallback(BaseCallback):
+    """
+    CheckpointCallback whose checkpoints are written by a background thread: the training thread only
+    snapshots the model in memory. Files are named like CheckpointCallback ones and load with `SAC.load`.
+
+    :param save_freq: save checkpoints every `save_freq` callback calls (vectorized steps)
+    :param save_path: folder of the checkpoints
+    :param name_prefix: common prefix of the checkpoints
+    :param keep_last: number of latest checkpoints kept on disk, all of them with None
+    :param eval_callback: EvalCallback whose new best mean reward is saved to `<name_prefix>_best.zip`
+    :param save_replay_buffer: save the replay buffer rows added since the previous checkpoint as chunks
+        in `<name_prefix>_replay_buffer/`, see `training.checkpoints.load_replay_buffer_chunks`. Chunks already
+        in that folder are continued, the replay buffer is expected to have been rebuilt from them.
+        A memory-mapped CompactReplayBuffer is saved in place instead
+    :param save_on_training_end: also save a checkpoint when learn() returns
+    """
+
+    def __init__(self, save_freq, save_path, name_prefix='rl_model', keep_last=None, eval_callback=None,
+                 save_replay_buffer=False, save_on_training_end=False, verbose=0):
+        super().__init__(verbose)
+        self.save_freq = save_freq
+        self.save_on_training_end = save_on_training_end
+        self.save_path = save_path
+        self.name_prefix = name_prefix
+        self.keep_last = keep_last
+        self.eval_callback = eval_callback
+        self.save_replay_buffer = save_replay_buffer
+        self.replay_buffer_path = os.path.join(save_path, f'{name_prefix}_replay_buffer')
+        self.writer = None
+        self.pending = []
+        self.checkpoints = []
+        self.best_mean_reward = -np.inf
+        # replay buffer position and running count of rows at the last saved chunk
+        self._chunks = []
+        self._replay_pos = 0
+        self._replay_rows = 0
+        self._replay_calls = 0
+
+    def _init_callback(self) -> None:
+        os.makedirs(self.save_path, exist_ok=True)
+        # one writer per learn() call: files are written and deleted in submission order
+        self.writer = ThreadPoolExecutor(max_workers=1)
+        if self.save_replay_buffer and not _memory_mapped(self.model.replay_buffer):
+            os.makedirs(self.replay_buffer_path, exist_ok=True)
+            chunks = list_chunks(self.replay_buffer_path)
+            if chunks:
+                # resumed run: the buffer was rebuilt from these chunks by load_replay_buffer_chunks
+                self._chunks = chunks
+                self._replay_rows = chunks[-1][1]
+                self._replay_pos = self.model.replay_buffer.pos
+            # the content of a loaded, already full buffer goes entirely into the first chunk
+            elif self.model.replay_buffer.full:
+                self._replay_calls = -self.model.replay_buffer.buffer_size
+
+    def _submit(self, fn, *args):
+        # exceptions of finished writes surface on the training thread
+        for future in self.pending:
+            if future.done():
+                future.result()
+        self.pending = [future for future in self.pending if not future.done()]
+        self.pending.append(self.writer.submit(fn, *args))
+
+    def _on_step(self) -> bool:
+        if self.eval_callback is not None and self.eval_callback.best_mean_reward > self.best_mean_reward:
+            self.best_mean_reward = self.eval_callback.best_mean_reward
+            best_path = os.path.join(self.save_path, f'{self.name_prefix}_best.zip')
+            self._submit(ModelSnapshot(self.model).write, best_path)
+        if self.n_calls % self.save_freq == 0:
+            self._save_checkpoint()
+        return True
+
+    def _checkpoint_path(self):
+        return os.path.join(self.save_path, f'{self.name_prefix}_{self.num_timesteps}_steps.zip')
+
+    def _save_checkpoint(self):
+        model_path = self._checkpoint_path()
+        self._submit(ModelSnapshot(self.model).write, model_path)
+        self.checkpoints.append(model_path)
+        if self.keep_last is not None:
+            for old_path in self.checkpoints[:-self.keep_last]:
+                self._submit(os.remove, old_path)
+            self.checkpoints = self.checkpoints[-self.keep_last:]
+        if self.verbose >= 2:
+            print(f'Saving model checkpoint to {model_path}')
+        if self.save_replay_buffer and _memory_mapped(self.model.replay_buffer):
+            # consistent with the snapshot: both are taken on the training thread
+            self.model.replay_buffer.save()
+        elif self.save_replay_buffer:
+            self._save_replay_chunk()
+
+    def _save_replay_chunk(self):
+        replay_buffer = self.model.replay_buffer
+        size, pos = replay_buffer.buffer_size, replay_buffer.pos
+        if self.n_calls - self._replay_calls >= size:
+            start_pos, n_rows = pos, size
+        else:
+            start_pos, n_rows = self._replay_pos, (pos - self._replay_pos) % size
+        self._replay_calls = self.n_calls
+        if not n_rows:
+            return
+        path = chunk_path(self.replay_buffer_path, self._replay_rows, n_rows)
+        self._submit(ReplayBufferChunk(replay_buffer, start_pos, n_rows, self._replay_rows).write, path)
+        self._chunks.append((path, self._replay_rows + n_rows))
+        self._replay_pos = pos
+        self._replay_rows += n_rows
+        # chunks whose rows have all been overwritten since
+        for path, end_row in self._chunks:
+            if end_row <= self._replay_rows - size:
+                self._submit(os.remove, path)
+        self._chunks = [(path, end_row) for path, end_row in self._chunks if end_row > self._replay_rows - size]
+
+    def _on_training_end(self) -> None:
+        if self.save_on_training_end and self.checkpoints[-1:] != [self._checkpoint_path()]:
+            self._save_checkpoint()
+        # checkpoints are complete on disk once learn() returns
+        try:
+            for future in self.pending:
+                future.result()
+        finally:
+            self.pending = []
+            self.writer.shutdown(wait=True)
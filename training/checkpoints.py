@@ -0,0 +1,104 @@
+"""
+Checkpoints written off the training loop: the model is snapshotted in memory on the training thread
+(serialized attributes and cloned state dicts) and the zip file is written by a background thread.
+
+Snapshots produce the same archive layout as `BaseAlgorithm.save`, so `SAC.load` reads them as usual.
+Replay buffers are saved incrementally as chunks of the transitions added since the previous save.
+"""
+import copy
+import glob
+import os
+import zipfile
+
+import numpy as np
+import stable_baselines3 as sb3
+import torch as th
+from stable_baselines3.common.save_util import data_to_json, recursive_getattr
+from stable_baselines3.common.utils import get_system_info
+
+REPLAY_BUFFER_FIELDS = ('observations', 'next_observations', 'actions', 'rewards', 'dones', 'timeouts')
+
+
+class ModelSnapshot:
+    """In-memory copy of everything `BaseAlgorithm.save` writes."""
+
+    def __init__(self, model):
+        # same selection of attributes as BaseAlgorithm.save
+        data = model.__dict__.copy()
+        exclude = set(model._excluded_save_params())
+        state_dicts_names, torch_variable_names = model._get_torch_save_params()
+        for torch_var in state_dicts_names + torch_variable_names:
+            exclude.add(torch_var.split('.')[0])
+        for param_name in exclude:
+            data.pop(param_name, None)
+        # serialized now: attributes such as the episode info buffer keep changing while training
+        self.serialized_data = data_to_json(data)
+        # optimizers update parameters in place, clones are detached from training
+        self.params = copy.deepcopy(model.get_parameters())
+        self.pytorch_variables = {name: _clone(recursive_getattr(model, name)) for name in torch_variable_names}
+
+    def write(self, path, compression=zipfile.ZIP_DEFLATED):
+        # to a temporary file first: a checkpoint on disk is always complete
+        tmp_path = path + '.tmp'
+        with zipfile.ZipFile(tmp_path, mode='w', compression=compression) as archive:
+            archive.writestr('data', self.serialized_data)
+            with archive.open('pytorch_variables.pth', mode='w', force_zip64=True) as pytorch_variables_file:
+                th.save(self.pytorch_variables, pytorch_variables_file)
+            for file_name, dict_ in self.params.items():
+                with archive.open(file_name + '.pth', mode='w', force_zip64=True) as param_file:
+                    th.save(dict_, param_file)
+            archive.writestr('_stable_baselines3_version', sb3.__version__)
+            archive.writestr('system_info.txt', get_system_info(print_info=False)[1])
+        os.replace(tmp_path, path)
+
+
+def _clone(value):
+    return value.detach().clone() if isinstance(value, th.Tensor) else copy.deepcopy(value)
+
+
+class ReplayBufferChunk:
+    """
+    Copy of the replay buffer rows added since the previous chunk. Rows are identified by a running
+    count of all rows ever added, so chunks can be replayed in order to rebuild the buffer.
+    """
+
+    def __init__(self, replay_buffer, start_pos, n_rows, first_row):
+        if not hasattr(replay_buffer, 'observations') or isinstance(replay_buffer.observations, dict):
+            raise ValueError('Only flat-observation ReplayBuffer supports incremental saving')
+        rows = (start_pos + np.arange(n_rows)) % replay_buffer.buffer_size
+        self.arrays = {name: getattr(replay_buffer, name)[rows] for name in REPLAY_BUFFER_FIELDS
+                       if getattr(replay_buffer, name, None) is not None}
+        self.start_pos = start_pos
+        self.first_row = first_row
+        self.n_rows = n_rows
+
+    def write(self, path):
+        tmp_path = path + '.tmp.npz'
+        np.savez(tmp_path, start_pos=self.start_pos, first_row=self.first_row, **self.arrays)
+        os.replace(tmp_path, path)
+
+
+def chunk_path(directory, first_row, n_rows):
+    return os.path.join(directory, f'chunk_{first_row:012d}_{first_row + n_rows:012d}.npz')
+
+
+def list_chunks(directory):
+    """Paths of the chunks in `directory` in saving order, with the running count of rows at their end."""
+    paths = sorted(glob.glob(os.path.join(directory, 'chunk_*.npz')))
+    return [(path, int(os.path.basename(path)[:-len('.npz')].split('_')[2])) for path in paths]
+
+
+def load_replay_buffer_chunks(replay_buffer, directory):
+    """Rebuild `replay_buffer` (same buffer_size and n_envs as when saving) from the chunks in `directory`."""
+    end_row = 0
+    for path, _ in list_chunks(directory):
+        with np.load(path) as chunk:
+            n_rows = len(chunk['actions'])
+            rows = (int(chunk['start_pos']) + np.arange(n_rows)) % replay_buffer.buffer_size
+            for name in REPLAY_BUFFER_FIELDS:
+                if name in chunk.files:
+                    getattr(replay_buffer, name)[rows] = chunk[name]
+            end_row = int(chunk['first_row']) + n_rows
+            replay_buffer.pos = (int(chunk['start_pos']) + n_rows) % replay_buffer.buffer_size
+    replay_buffer.full = end_row >= replay_buffer.buffer_size
+    return replay_buffer
@@ -0,0 +1,96 @@
+"""
+Columnar log of the episodes of a training run: one raw little-endian file per column in a directory,
+appended to while training and read back with `np.fromfile`.
+
+    python -m training.episode_log tmp/episodes_simple --window 500 --output imgs/training_simple.png
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+
+from environmetns.episode_stats import EPISODE_COLUMNS, REWARD_TERMS
+
+# training timestep of the record and index of the env in the VecEnv, then the EpisodeStats columns
+LOG_COLUMNS = {'timesteps': '<i8', 'env': '<i4', **{name: '<f8' if name == 'time' else '<f4'
+                                                    for name in EPISODE_COLUMNS}}
+
+
+class EpisodeLogWriter:
+    """Appends episode rows to the column files of `directory`, an existing log is continued."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, 'columns.json'), 'w') as f:
+            json.dump(LOG_COLUMNS, f)
+
+    def append(self, timesteps, envs, rows):
+        """`rows` (n, len(EPISODE_COLUMNS)) finished at `timesteps` (n,) in `envs` (n,)."""
+        columns = {'timesteps': timesteps, 'env': envs, **dict(zip(EPISODE_COLUMNS, np.asarray(rows).T))}
+        for name, dtype in LOG_COLUMNS.items():
+            with open(os.path.join(self.directory, f'{name}.bin'), 'ab') as f:
+                f.write(np.ascontiguousarray(columns[name], dtype=dtype).tobytes())
+
+
+def read_episode_log(directory, columns=None):
+    """Columns of the log as arrays, cut to the rows complete in every column (the log may be in use)."""
+    with open(os.path.join(directory, 'columns.json')) as f:
+        dtypes = json.load(f)
+    data = {name: np.fromfile(os.path.join(directory, f'{name}.bin'), dtype=dtypes[name])
+            for name in (columns or dtypes)}
+    n_rows = min(len(column) for column in data.values())
+    return {name: column[:n_rows] for name, column in data.items()}
+
+
+def rolling_mean(values, window):
+    """Mean of the last `window` values at every index, over fewer values at the start."""
+    cumsum = np.concatenate([[0.0], np.cumsum(values, dtype=np.float64)])
+    ends = np.arange(1, len(values) + 1)
+    starts = np.maximum(ends - window, 0)
+    return (cumsum[ends] - cumsum[starts]) / (ends - starts)
+
+
+def plot_episode_log(log, window=100, title=None):
+    """Report figure: reward, targets, episode length and reward terms against training timesteps."""
+    import matplotlib.pyplot as plt
+    # rows of different envs arrive interleaved
+    order = np.argsort(log['timesteps'], kind='stable')
+    steps = log['timesteps'][order]
+    fig, axes = plt.subplots(2, 2, figsize=(12, 8), sharex=True)
+    for ax, name in zip(axes.flat, ('reward', 'targets', 'length')):
+        ax.plot(steps, rolling_mean(log[name][order], window))
+        ax.set_ylabel(f'episode {name}')
+    ax = axes.flat[3]
+    for name in REWARD_TERMS:
+        ax.plot(steps, rolling_mean(log[name][order], window), label=name[:-len('_reward')])
+    ax.set_ylabel('episode reward terms')
+    ax.legend(fontsize='small')
+    for ax in axes[1]:
+        ax.set_xlabel('timesteps')
+    fig.suptitle(title or f'rolling mean over {window} episodes')
+    fig.tight_layout()
+    return fig
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('log', nargs='+', help='episode log directories of EpisodeStatsCallback')
+    parser.add_argument('--window', type=int, default=100, help='episodes of the rolling mean')
+    parser.add_argument('--output', help='save the figures to this file (suffixed with the log name for several)')
+    args = parser.parse_args()
+
+    import matplotlib.pyplot as plt
+    for directory in args.log:
+        log = read_episode_log(directory)
+        name = os.path.basename(os.path.normpath(directory))
+        print(f"{name}: {len(log['reward'])} episodes, {int(log['timesteps'].max(initial=0))} timesteps, "
+              f"last {args.window}: reward {log['reward'][-args.window:].mean():.1f}, "
+              f"targets {log['targets'][-args.window:].mean():.2f}")
+        fig = plot_episode_log(log, args.window, title=name)
+        if args.output:
+            root, ext = os.path.splitext(args.output)
+            fig.savefig(args.output if len(args.log) == 1 else f'{root}_{name}{ext}')
+    if not args.output:
+        plt.show()
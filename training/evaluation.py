@@ -0,0 +1,106 @@
+"""
+Headless batch evaluation of trained policies: fixed per-episode seeds, deterministic actions,
+no rendering. Episodes run across a process pool or all at once in a BatchedDroneVecEnv.
+"""
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from environmetns.registry import make_env
+
+METRICS = ('reward', 'length', 'targets', 'out_of_bounds', 'restricted_time')
+
+_worker_policy = None
+
+
+def load_policy(path):
+    """NumpyPolicy for exported .npz actors, SB3 SAC for .zip checkpoints."""
+    if path.endswith('.npz'):
+        from training.numpy_policy import NumpyPolicy
+        return NumpyPolicy.load(path)
+    from stable_baselines3 import SAC
+    return SAC.load(path, device='cpu', custom_objects={'learning_rate': 0.0, 'lr_schedule': lambda _: 0.0})
+
+
+def run_episode(policy, env, seed):
+    obs, _ = env.reset(seed=seed)
+    episode = dict.fromkeys(METRICS, 0.0)
+    done = False
+    while not done:
+        action, _ = policy.predict(obs, deterministic=True)
+        obs, reward, done, truncated, info = env.step(action)
+        done = done or truncated
+        state = env.step_state()
+        episode['reward'] += reward
+        episode['length'] += 1
+        # frame_skip envs step several frames at once
+        episode['restricted_time'] += env.dt * info.get('frames', 1) if state.restricted else 0.0
+    episode['targets'] = env.player.target_counter
+    episode['out_of_bounds'] = float(env.step_state().out_of_bounds)
+    return episode
+
+
+def _init_worker(policy_path):
+    global _worker_policy
+    _worker_policy = load_policy(policy_path)
+
+
+def _run_episodes(env_type, env_kwargs, seeds):
+    env = make_env(env_type, **env_kwargs)
+    return [run_episode(_worker_policy, env, seed) for seed in seeds]
+
+
+def evaluate_pool(policy_path, env_type, n_episodes, seed=0, n_workers=None, env_kwargs=None):
+    """Episodes `seed .. seed + n_episodes - 1` split over a process pool, one policy load per worker."""
+    env_kwargs = env_kwargs or {}
+    n_workers = n_workers or os.cpu_count()
+    seeds = np.arange(seed, seed + n_episodes)
+    with ProcessPoolExecutor(n_workers, initializer=_init_worker, initargs=(policy_path,)) as pool:
+        n_chunks = min(n_episodes, 4 * n_workers)
+        futures = [pool.submit(_run_episodes, env_type, env_kwargs, chunk.tolist())
+                   for chunk in np.array_split(seeds, n_chunks)]
+        return [episode for future in futures for episode in future.result()]
+
+
+def evaluate_batched(policy, env_type, n_episodes, seed=0, env_kwargs=None):
+    """
+    All episodes stepped together in one BatchedDroneVecEnv, the policy sees (n_episodes, obs) batches.
+    Episode i is seeded with `seed + i`, like in `evaluate_pool`.
+    """
+    from environmetns.vec_env import BatchedDroneVecEnv
+
+    if isinstance(policy, str):
+        policy = load_policy(policy)
+    env = BatchedDroneVecEnv(env_type, n_episodes, **(env_kwargs or {}))
+    env.seed(seed)
+    obs = env.reset()
+    totals = {metric: np.zeros(n_episodes) for metric in METRICS}
+    running = np.ones(n_episodes, dtype=bool)
+    while running.any():
+        actions, _ = policy.predict(obs, deterministic=True)
+        obs, rewards, dones, infos = env.step(actions)
+        totals['reward'] += np.where(running, rewards, 0)
+        totals['length'] += running
+        totals['restricted_time'] += np.where(running & env.in_restricted_zone, env.dt, 0)
+        for i in np.flatnonzero(dones & running):
+            totals['targets'][i] = infos[i]['targets_catched']
+            totals['out_of_bounds'][i] = infos[i]['out_of_bounds']
+        # only the first episode of every env is counted
+        running &= ~dones
+    return [{metric: float(totals[metric][i]) for metric in METRICS} for i in range(n_episodes)]
+
+
+def summarize(episodes, confidence_z=1.96):
+    """Mean, std and normal confidence interval half-width of every metric."""
+    summary = {'episodes': len(episodes)}
+    for metric in METRICS:
+        values = np.array([episode[metric] for episode in episodes], dtype=np.float64)
+        std = float(values.std(ddof=1)) if len(values) > 1 else 0.0
+        summary[metric] = {
+            'mean': float(values.mean()),
+            'std': std,
+            'ci': confidence_z * std / math.sqrt(len(values)),
+        }
+    return summary
@@ -0,0 +1,133 @@
+"""
+Pure NumPy inference of the deterministic SAC actor.
+
+Export the actor of trained checkpoints once (needs stable-baselines3 and torch):
+    python -m training.numpy_policy models/sac_maze_pretrained_model_9760000_steps.zip --check
+
+then load the .npz anywhere with only numpy installed:
+    policy = NumpyPolicy.load("models/sac_maze_pretrained_model_9760000_steps.npz")
+    action, _ = policy.predict(obs)
+"""
+import argparse
+import os
+
+import numpy as np
+
+ACTIVATIONS = {
+    'ReLU': lambda x: np.maximum(x, 0, out=x),
+    'Tanh': np.tanh,
+    'ELU': lambda x: np.where(x > 0, x, np.expm1(x)),
+    'LeakyReLU': lambda x: np.where(x > 0, x, 0.01 * x),
+}
+
+
+class NumpyPolicy:
+    """
+    Deterministic SAC actor: MLP latent -> mean actions -> tanh -> rescale to the action space,
+    the same computation as `SAC.predict(obs, deterministic=True)`.
+    """
+
+    def __init__(self, weights, biases, mu_weight, mu_bias, action_low, action_high, activation='ReLU'):
+        self.weights = [np.ascontiguousarray(w, dtype=np.float32) for w in weights]
+        self.biases = [np.asarray(b, dtype=np.float32) for b in biases]
+        self.mu_weight = np.ascontiguousarray(mu_weight, dtype=np.float32)
+        self.mu_bias = np.asarray(mu_bias, dtype=np.float32)
+        self.action_low = np.asarray(action_low, dtype=np.float32)
+        self.action_high = np.asarray(action_high, dtype=np.float32)
+        self.activation = activation
+        self._activation = ACTIVATIONS[activation]
+        self.obs_dim = self.weights[0].shape[0] if self.weights else self.mu_weight.shape[0]
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            n_layers = int(data['n_layers'])
+            return cls(
+                weights=[data[f'w{i}'] for i in range(n_layers)],
+                biases=[data[f'b{i}'] for i in range(n_layers)],
+                mu_weight=data['mu_w'],
+                mu_bias=data['mu_b'],
+                action_low=data['action_low'],
+                action_high=data['action_high'],
+                activation=str(data['activation']),
+            )
+
+    def save(self, path):
+        arrays = {f'w{i}': w for i, w in enumerate(self.weights)}
+        arrays.update({f'b{i}': b for i, b in enumerate(self.biases)})
+        np.savez(path, n_layers=len(self.weights), mu_w=self.mu_weight, mu_b=self.mu_bias,
+                 action_low=self.action_low, action_high=self.action_high, activation=self.activation, **arrays)
+
+    def forward(self, obs):
+        """Actions for a (batch, obs_dim) float array."""
+        x = obs
+        for w, b in zip(self.weights, self.biases):
+            x = self._activation(x @ w + b)
+        actions = np.tanh(x @ self.mu_weight + self.mu_bias)
+        return self.action_low + 0.5 * (actions + 1.0) * (self.action_high - self.action_low)
+
+    def predict(self, observation, state=None, episode_start=None, deterministic=True):
+        """Drop-in for `model.predict(obs, deterministic=True)`: single or batched observations."""
+        obs = np.asarray(observation, dtype=np.float32)
+        single = obs.ndim == 1
+        actions = self.forward(obs.reshape(-1, self.obs_dim))
+        return (actions[0] if single else actions), None
+
+
+def export_actor(model_path, output_path=None):
+    """Extract the deterministic actor of a SAC checkpoint into an .npz file readable by `NumpyPolicy.load`."""
+    from stable_baselines3 import SAC
+    from torch import nn
+
+    # schedules are not needed for inference and may fail to unpickle across python versions
+    model = SAC.load(model_path, device='cpu', custom_objects={'learning_rate': 0.0, 'lr_schedule': lambda _: 0.0})
+    actor = model.actor
+    if actor.use_sde:
+        raise ValueError('gSDE actors are not supported')
+    linears = [m for m in actor.latent_pi if isinstance(m, nn.Linear)]
+    activations = {type(m).__name__ for m in actor.latent_pi if not isinstance(m, nn.Linear)}
+    if len(activations) > 1 or not activations <= set(ACTIVATIONS):
+        raise ValueError(f'Unsupported activations {activations}')
+
+    policy = NumpyPolicy(
+        # stored as (in, out) so that forward is x @ w
+        weights=[m.weight.detach().numpy().T for m in linears],
+        biases=[m.bias.detach().numpy() for m in linears],
+        mu_weight=actor.mu.weight.detach().numpy().T,
+        mu_bias=actor.mu.bias.detach().numpy(),
+        action_low=model.action_space.low,
+        action_high=model.action_space.high,
+        activation=activations.pop() if activations else 'ReLU',
+    )
+    if output_path is None:
+        output_path = os.path.splitext(model_path)[0] + '.npz'
+    policy.save(output_path)
+    return model, policy, output_path
+
+
+def check_export(model, policy, n_samples=4096, atol=1e-5):
+    """Max absolute difference between SB3 and NumPy deterministic actions on random observations."""
+    space = model.observation_space
+    low = np.maximum(space.low, -100)
+    high = np.minimum(space.high, 100)
+    obs = np.random.uniform(low, high, size=(n_samples,) + space.shape).astype(np.float32)
+    expected, _ = model.predict(obs, deterministic=True)
+    actual, _ = policy.predict(obs)
+    diff = float(np.abs(expected - actual).max())
+    if diff > atol:
+        raise AssertionError(f'NumPy policy differs from SB3 by {diff}')
+    return diff
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('models', nargs='+', help='SAC checkpoints (.zip)')
+    parser.add_argument('--check', action='store_true', help='compare with SB3 predictions after export')
+    args = parser.parse_args()
+
+    for model_path in args.models:
+        model, policy, output_path = export_actor(model_path)
+        message = f'{model_path} -> {output_path}'
+        if args.check:
+            message += f' (max abs diff {check_export(model, policy):.2e})'
+        print(message)
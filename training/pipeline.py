@@ -0,0 +1,340 @@
+"""
+Training pipelines declared in a JSON config: every stage trains one SAC model in its own process.
+
+    python -m training.pipeline configs/finetune.json --cores 8
+
+    {
+        "log_dir": "tmp/",
+        "stages": {
+            "sac_simple": {"env": "simple", "timesteps": 20000000, "n_envs": 8, "cores": 4},
+            "sac_maze": {"env": "maze", "init": "sac_simple", "timesteps": 10000000,
+                         "env_kwargs": {"ray_range": 4}, "overrides": {"RESTRICTED_ZONE_REWARD": -100}}
+        }
+    }
+
+Stages run concurrently as long as their `cores` fit in the core budget, each pinned to cores of its own (on
+Linux). With `"vec_env": "subproc"`, the envs of a stage are stepped by `cores` worker processes on the same
+cores, so that a stage never uses more than its share. A stage whose `init` names another stage starts from
+that stage's final model once it is saved. Each stage writes to `<log_dir>/<stage>/`: checkpoints, replay
+buffer chunks, episode log, `stage.log` and `<stage>_final.zip` once complete.
+
+With `"replay_buffer": "compact"` the replay buffer is a CompactReplayBuffer memory-mapped in
+`<stage>/<stage>_replay_buffer/` instead, and `"init_replay_buffer": true` starts the stage from a copy of the
+final replay buffer of its `init` stage (both compact, with the same n_envs), see configs/pretrain_finetune.json.
+Running a pipeline again skips complete stages and resumes the other ones from their latest checkpoint.
+"""
+import argparse
+import functools
+import json
+import multiprocessing
+import os
+import re
+import shutil
+import sys
+import time
+from multiprocessing.connection import wait
+
+from environmetns.registry import ENV_TYPES
+
+STAGE_DEFAULTS = {
+    'env': None,
+    # make_env arguments, e.g. ray_range, time_limit, frame_skip
+    'env_kwargs': {},
+    # env class attributes, e.g. RESTRICTED_ZONE_REWARD
+    'overrides': {},
+    # checkpoint path or name of the stage whose final model is loaded
+    'init': None,
+    'timesteps': None,
+    'n_envs': 16,
+    # 'dummy' (envs stepped by the training process) or 'subproc' (envs split between `cores` processes)
+    'vec_env': 'dummy',
+    # torch threads and env processes of the stage
+    'cores': 1,
+    # SAC arguments of a model trained from scratch, e.g. buffer_size, batch_size
+    'sac': {},
+    'seed': None,
+    'save_freq': 10_000,
+    'keep_last': None,
+    'save_replay_buffer': True,
+    # 'default' (SB3 ReplayBuffer) or 'compact' (memory-mapped CompactReplayBuffer)
+    'replay_buffer': 'default',
+    # start from a copy of the replay buffer of the init stage
+    'init_replay_buffer': False,
+}
+VEC_ENVS = ('dummy', 'subproc')
+REPLAY_BUFFERS = ('default', 'compact')
+
+
+def check_stage(name, stage):
+    """Stage with the defaults filled in, checked for unknown keys, env types and env attributes."""
+    unknown = set(stage) - set(STAGE_DEFAULTS)
+    if unknown:
+        raise ValueError(f'Unexpected keys {sorted(unknown)} in stage {name}')
+    stage = {**STAGE_DEFAULTS, **stage}
+    if stage['env'] not in ENV_TYPES:
+        raise ValueError(f'Unexpected environment type {stage["env"]} in stage {name}. '
+                         f'Please, choose one of {list(ENV_TYPES)}')
+    if not stage['timesteps']:
+        raise ValueError(f'Stage {name} has no timesteps')
+    if stage['vec_env'] not in VEC_ENVS:
+        raise ValueError(f'Unexpected vec_env {stage["vec_env"]} in stage {name}. Please, choose one of {VEC_ENVS}')
+    if stage['init'] is not None and stage['sac']:
+        # SAC.load restores the arguments of the init model
+        raise ValueError(f'Stage {name} starts from {stage["init"]}, its sac arguments {sorted(stage["sac"])} would '
+                         f'be ignored')
+    if stage['replay_buffer'] not in REPLAY_BUFFERS:
+        raise ValueError(f'Unexpected replay_buffer {stage["replay_buffer"]} in stage {name}. '
+                         f'Please, choose one of {REPLAY_BUFFERS}')
+    for attribute in stage['overrides']:
+        if not hasattr(ENV_TYPES[stage['env']], attribute):
+            raise ValueError(f'{ENV_TYPES[stage["env"]].__name__} has no attribute {attribute} (stage {name})')
+    return stage
+
+
+def load_config(path):
+    """Pipeline config with the stage defaults filled in, checked for unknown keys and dependency cycles."""
+    with open(path) as f:
+        config = json.load(f)
+    stages = {name: check_stage(name, stage) for name, stage in config['stages'].items()}
+    for name in stages:
+        seen = [name]
+        while stages[seen[-1]]['init'] in stages:
+            seen.append(stages[seen[-1]]['init'])
+            if seen[-1] in seen[:-1]:
+                raise ValueError(f'Stages depend on each other: {" -> ".join(seen)}')
+    for name, stage in stages.items():
+        if not stage['init_replay_buffer']:
+            continue
+        init = stages.get(stage['init'])
+        if init is None or stage['replay_buffer'] != 'compact' or init['replay_buffer'] != 'compact':
+            raise ValueError(f'Stage {name} continues the replay buffer of its init stage, both need an init stage '
+                             f'of the config with "replay_buffer": "compact"')
+        if stage['n_envs'] != init['n_envs']:
+            raise ValueError(f'Stage {name} has {stage["n_envs"]} envs, the replay buffer of {stage["init"]} is '
+                             f'filled by {init["n_envs"]}')
+    return {'log_dir': config.get('log_dir', 'tmp/'), 'cores': config.get('cores'), 'stages': stages}
+
+
+def stage_dir(log_dir, name):
+    return os.path.join(log_dir, name)
+
+
+def final_model_path(log_dir, name):
+    return os.path.join(stage_dir(log_dir, name), f'{name}_final.zip')
+
+
+def replay_buffer_path(log_dir, name):
+    # the folder of the AsyncCheckpointCallback of the stage
+    return os.path.join(stage_dir(log_dir, name), f'{name}_replay_buffer')
+
+
+def latest_checkpoint(log_dir, name):
+    """Path and timesteps of the latest `<name>_<timesteps>_steps.zip` of a stage, (None, 0) without any."""
+    pattern = re.compile(rf'{re.escape(name)}_(\d+)_steps\.zip')
+    directory = stage_dir(log_dir, name)
+    steps = [int(match.group(1)) for match in map(pattern.fullmatch, os.listdir(directory)) if match] \
+        if os.path.isdir(directory) else []
+    if not steps:
+        return None, 0
+    return os.path.join(directory, f'{name}_{max(steps)}_steps.zip'), max(steps)
+
+
+def make_stage_env(stage):
+    from environmetns.episode_stats import EpisodeStats
+    from environmetns.registry import make_env
+
+    env = make_env(stage['env'], **stage['env_kwargs'])
+    for attribute, value in stage['overrides'].items():
+        setattr(env, attribute, value)
+    return EpisodeStats(env)
+
+
+def run_stage(name, stage, log_dir, checkpoint_on_end=False):
+    """
+    Train a stage to its `timesteps`, from its latest checkpoint when there is one, and save its final model.
+    The `init` and `init_replay_buffer` of the stage are paths here. Returns the trained model.
+
+    :param checkpoint_on_end: also save a checkpoint of the final model, the next run with more timesteps
+        continues from it with the same replay buffer
+    """
+    import torch as th
+    from stable_baselines3 import SAC
+    from stable_baselines3.common.env_util import make_vec_env
+    from stable_baselines3.common.vec_env import DummyVecEnv
+
+    from environmetns.shm_vec_env import SharedMemoryVecEnv
+    from training.callbacks import AsyncCheckpointCallback, EpisodeStatsCallback
+    from training.checkpoints import load_replay_buffer_chunks
+    from training.replay_buffer import use_compact_replay_buffer
+
+    th.set_num_threads(stage['cores'])
+    directory = stage_dir(log_dir, name)
+    if stage['vec_env'] == 'subproc':
+        # worker processes inherit the cores the stage is pinned to
+        vec_env_cls, vec_env_kwargs = SharedMemoryVecEnv, {'n_workers': stage['cores']}
+    else:
+        vec_env_cls, vec_env_kwargs = DummyVecEnv, None
+    env = make_vec_env(functools.partial(make_stage_env, stage), n_envs=stage['n_envs'], seed=stage['seed'],
+                       vec_env_cls=vec_env_cls, vec_env_kwargs=vec_env_kwargs)
+    checkpoint, steps = latest_checkpoint(log_dir, name)
+    checkpoint_callback = AsyncCheckpointCallback(stage['save_freq'], directory, name_prefix=name,
+                                                  keep_last=stage['keep_last'],
+                                                  save_replay_buffer=stage['save_replay_buffer'],
+                                                  save_on_training_end=checkpoint_on_end)
+    if checkpoint is not None:
+        print(f'Resuming {name} from {checkpoint}')
+        model = SAC.load(checkpoint, env, tensorboard_log=directory)
+    elif stage['init'] is not None:
+        print(f'Starting {name} from {stage["init"]}')
+        model = SAC.load(stage['init'], env, tensorboard_log=directory)
+    else:
+        model = SAC('MlpPolicy', env, verbose=1, tensorboard_log=directory, seed=stage['seed'], **stage['sac'])
+    if stage['replay_buffer'] == 'compact':
+        path = replay_buffer_path(log_dir, name)
+        reuse = checkpoint is not None and stage['save_replay_buffer']
+        if not reuse:
+            # left by a run interrupted before its first checkpoint
+            shutil.rmtree(path, ignore_errors=True)
+            if stage['init_replay_buffer']:
+                shutil.rmtree(path + '.tmp', ignore_errors=True)
+                shutil.copytree(stage['init_replay_buffer'], path + '.tmp')
+                os.replace(path + '.tmp', path)
+                reuse = True
+        # sdf rays are continuous, they cannot be bit-packed
+        n_binary = 0 if stage['env_kwargs'].get('ray_mode') == 'sdf' else None
+        use_compact_replay_buffer(model, path, 'reuse' if reuse else 'create', n_binary)
+    elif checkpoint is not None and os.path.isdir(checkpoint_callback.replay_buffer_path):
+        load_replay_buffer_chunks(model.replay_buffer, checkpoint_callback.replay_buffer_path)
+
+    model.learn(
+        total_timesteps=max(stage['timesteps'] - steps, 0),
+        callback=[checkpoint_callback, EpisodeStatsCallback(os.path.join(directory, 'episodes'))],
+        tb_log_name=name,
+        reset_num_timesteps=checkpoint is None,
+    )
+    if stage['replay_buffer'] == 'compact':
+        model.replay_buffer.save()
+    model.save(final_model_path(log_dir, name))
+    env.close()
+    return model
+
+
+def redirect_output(path):
+    """Send the output of this process and of the processes it starts to the end of `path`."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    log_fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+    os.dup2(log_fd, 1)
+    os.dup2(log_fd, 2)
+    os.close(log_fd)
+    sys.stdout.reconfigure(line_buffering=True)
+
+
+def _stage_process(name, stage, log_dir, cpus):
+    redirect_output(os.path.join(stage_dir(log_dir, name), 'stage.log'))
+    if cpus:
+        os.sched_setaffinity(0, cpus)
+    run_stage(name, stage, log_dir)
+
+
+def _required(stages, names):
+    # the selected stages and the stages they start from, in config order
+    required = set()
+    for name in names:
+        if name not in stages:
+            raise ValueError(f'Unexpected stage {name}. Please, choose one of {list(stages)}')
+        while name in stages and name not in required:
+            required.add(name)
+            name = stages[name]['init']
+    return [name for name in stages if name in required]
+
+
+def run_pipeline(config, cores=None, names=None, retries=0):
+    """
+    Run the stages of a config loaded with `load_config`, returns {stage: 'done' | 'failed' | 'skipped'}.
+
+    :param cores: core budget shared by running stages, the config's or the number of cores by default
+    :param names: run only these stages and the stages they start from
+    :param retries: number of times a crashed stage is resumed before it counts as failed
+    """
+    log_dir, stages = config['log_dir'], config['stages']
+    budget = cores or config['cores'] or os.cpu_count()
+    free_cpus = sorted(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else []
+    # stages are pinned to cpus of their own, unless the budget exceeds the cpus of this process
+    pinned = len(free_cpus) >= budget
+    free_cpus = free_cpus[:budget]
+    pending = _required(stages, names or list(stages))
+    status = {}
+    attempts = dict.fromkeys(pending, 0)
+    running = {}
+    context = multiprocessing.get_context('spawn')
+    for name in pending:
+        if os.path.exists(final_model_path(log_dir, name)):
+            status[name] = 'done'
+            print(f'{name}: complete')
+    pending = [name for name in pending if name not in status]
+
+    try:
+        while pending or running:
+            free = budget - sum(stage_cores for _, _, stage_cores, _, _ in running.values())
+            for name in list(pending):
+                init = stages[name]['init']
+                if status.get(init) in ('failed', 'skipped'):
+                    status[name] = 'skipped'
+                    pending.remove(name)
+                    print(f'{name}: skipped, {init} did not complete')
+                    continue
+                # a stage larger than the budget runs alone
+                stage_cores = min(stages[name]['cores'], budget)
+                if (init in stages and status.get(init) != 'done') or stage_cores > free:
+                    continue
+                stage = stages[name]
+                if init in stages:
+                    stage = {**stage, 'init': final_model_path(log_dir, init)}
+                    if stage['init_replay_buffer']:
+                        stage['init_replay_buffer'] = replay_buffer_path(log_dir, init)
+                cpus = None
+                if pinned:
+                    cpus, free_cpus = free_cpus[:stage_cores], free_cpus[stage_cores:]
+                process = context.Process(target=_stage_process, args=(name, stage, log_dir, cpus), name=name)
+                process.start()
+                running[process.sentinel] = name, process, stage_cores, cpus, time.time()
+                free -= stage_cores
+                pending.remove(name)
+                _, steps = latest_checkpoint(log_dir, name)
+                print(f'{name}: started on {stage_cores} cores' + (f', resuming at {steps} steps' if steps else ''))
+            if not running:
+                break
+            for sentinel in wait(list(running)):
+                name, process, _, cpus, start = running.pop(sentinel)
+                process.join()
+                if pinned:
+                    free_cpus = sorted(free_cpus + cpus)
+                elapsed = (time.time() - start) / 3600
+                if process.exitcode == 0 and os.path.exists(final_model_path(log_dir, name)):
+                    status[name] = 'done'
+                    print(f'{name}: done in {elapsed:.2f}h')
+                elif attempts[name] < retries:
+                    attempts[name] += 1
+                    pending.insert(0, name)
+                    print(f'{name}: exited with code {process.exitcode} after {elapsed:.2f}h, retrying')
+                else:
+                    status[name] = 'failed'
+                    print(f'{name}: failed with code {process.exitcode}, see {stage_dir(log_dir, name)}/stage.log')
+    finally:
+        # interrupted: the stages resume from their latest checkpoint on the next run
+        for _, process, _, _, _ in running.values():
+            process.terminate()
+    return status
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('config')
+    parser.add_argument('--cores', type=int, help='core budget (default: config cores or number of cores)')
+    parser.add_argument('--stages', nargs='+', help='run only these stages and the stages they start from')
+    parser.add_argument('--retries', type=int, default=0, help='times a crashed stage is resumed')
+    args = parser.parse_args()
+
+    status = run_pipeline(load_config(args.config), args.cores, args.stages, args.retries)
+    if any(value != 'done' for value in status.values()):
+        raise SystemExit(1)
@@ -0,0 +1,264 @@
+"""
+Offline hyperparameter sweeps: short SAC trials on a local process pool, stopped early with asynchronous
+successive halving (ASHA), results appended to `<log_dir>/results.jsonl`.
+
+    python -m training.sweep configs/sweep_simple.json --workers 8
+
+    {
+        "log_dir": "tmp/sweep_simple",
+        "stage": {"env": "simple", "n_envs": 4},
+        "space": {
+            "sac.batch_size": [64, 128, 256],
+            "sac.learning_rate": {"loguniform": [1e-4, 1e-3]},
+            "overrides.DIST_REWARD_COEF": {"uniform": [-0.05, -0.005]}
+        },
+        "n_trials": 27, "min_timesteps": 20000, "max_timesteps": 540000, "eta": 3
+    }
+
+`stage` is a `training.pipeline` stage, every trial samples the `space` keys (`<stage key>.<name>`) into it.
+Trials train to the rung budgets min_timesteps * eta^k and are evaluated headless after every rung; only the
+best 1 / eta of the trials evaluated at a rung continue to the next one. Evaluation uses the env without the
+trial's `overrides`, so that trials sweeping reward coefficients compare on the same reward.
+
+Running a sweep again continues it: evaluated rungs are read back from the results and trials resume from
+their latest checkpoint.
+"""
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+
+from training.evaluation import METRICS
+
+SWEEP_DEFAULTS = {
+    'log_dir': 'tmp/sweep',
+    'stage': {},
+    'space': {},
+    'n_trials': 27,
+    'min_timesteps': 20_000,
+    'max_timesteps': 540_000,
+    'eta': 3,
+    # evaluation metric maximized, one of training.evaluation.METRICS
+    'metric': 'reward',
+    'eval_episodes': 10,
+    'eval_seed': 1_000_000,
+    'eval_env_kwargs': {'time_limit': 30},
+    'seed': 0,
+    'workers': None,
+}
+SPACE_SECTIONS = ('sac', 'overrides', 'env_kwargs')
+DISTRIBUTIONS = ('uniform', 'loguniform', 'randint')
+
+
+def load_sweep(path):
+    """Sweep config with the defaults filled in, its stage and search space checked."""
+    from training.pipeline import check_stage
+
+    with open(path) as f:
+        sweep = json.load(f)
+    unknown = set(sweep) - set(SWEEP_DEFAULTS)
+    if unknown:
+        raise ValueError(f'Unexpected keys {sorted(unknown)} in sweep {path}')
+    sweep = {**SWEEP_DEFAULTS, **sweep}
+    if sweep['metric'] not in METRICS:
+        raise ValueError(f'Unexpected metric {sweep["metric"]}. Please, choose one of {METRICS}')
+    for key, values in sweep['space'].items():
+        section, _, name = key.partition('.')
+        if section not in SPACE_SECTIONS or not name:
+            raise ValueError(f'Unexpected search space key {key}, expected <section>.<name> with a section of '
+                             f'{SPACE_SECTIONS}')
+        if section == 'sac' and sweep['stage'].get('init') is not None:
+            raise ValueError(f'Unexpected search space key {key}: trials of a stage with an init model keep the SAC '
+                             f'arguments of that model')
+        if isinstance(values, dict) and (len(values) != 1 or next(iter(values)) not in DISTRIBUTIONS):
+            raise ValueError(f'Unexpected distribution {values} of {key}. Please, use a list of values or one of '
+                             f'{DISTRIBUTIONS}')
+    # a sample of the space, so that overrides are checked against the env
+    check_stage('stage', trial_stage(sweep, 0))
+    return sweep
+
+
+def rungs(sweep):
+    """Timesteps of every rung: min_timesteps * eta^k, the last one max_timesteps."""
+    budgets = [sweep['min_timesteps']]
+    while budgets[-1] * sweep['eta'] < sweep['max_timesteps']:
+        budgets.append(budgets[-1] * sweep['eta'])
+    if budgets[-1] < sweep['max_timesteps']:
+        budgets.append(sweep['max_timesteps'])
+    return budgets
+
+
+def sample_params(space, rng):
+    params = {}
+    for key, values in space.items():
+        if isinstance(values, list):
+            value = values[rng.integers(len(values))]
+        else:
+            (distribution, (low, high)), = values.items()
+            if distribution == 'uniform':
+                value = rng.uniform(low, high)
+            elif distribution == 'loguniform':
+                value = math.exp(rng.uniform(math.log(low), math.log(high)))
+            else:
+                value = int(rng.integers(low, high, endpoint=True))
+        params[key] = value.item() if isinstance(value, np.generic) else value
+    return params
+
+
+def trial_params(sweep, trial):
+    # the same trial gets the same parameters when the sweep is continued
+    return sample_params(sweep['space'], np.random.default_rng((sweep['seed'], trial)))
+
+
+def trial_stage(sweep, trial):
+    stage = {**sweep['stage']}
+    for key, value in trial_params(sweep, trial).items():
+        section, _, name = key.partition('.')
+        stage[section] = {**stage.get(section, {}), name: value}
+    stage.setdefault('timesteps', sweep['max_timesteps'])
+    return stage
+
+
+def trial_name(trial):
+    return f'trial_{trial:04d}'
+
+
+def run_trial(sweep, trial, timesteps):
+    """Train a trial to `timesteps` (in a pool worker) and evaluate it, returns the result record."""
+    from training.evaluation import run_episode, summarize
+    from training.pipeline import check_stage, make_stage_env, redirect_output, run_stage
+
+    start = time.time()
+    name = trial_name(trial)
+    redirect_output(os.path.join(sweep['log_dir'], name, 'stage.log'))
+    stage = check_stage(name, {**trial_stage(sweep, trial), 'timesteps': timesteps, 'cores': 1})
+    model = run_stage(name, stage, sweep['log_dir'], checkpoint_on_end=True)
+    eval_stage = {**stage, 'overrides': {}, 'env_kwargs': {**stage['env_kwargs'], **sweep['eval_env_kwargs']}}
+    env = make_stage_env(eval_stage).unwrapped
+    episodes = [run_episode(model, env, sweep['eval_seed'] + i) for i in range(sweep['eval_episodes'])]
+    summary = summarize(episodes)
+    return {
+        'trial': trial,
+        'timesteps': timesteps,
+        'status': 'completed',
+        'score': summary[sweep['metric']]['mean'],
+        'params': trial_params(sweep, trial),
+        'metrics': {metric: summary[metric]['mean'] for metric in METRICS},
+        'seconds': time.time() - start,
+    }
+
+
+def read_results(log_dir):
+    path = os.path.join(log_dir, 'results.jsonl')
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+class ASHAScheduler:
+    """
+    Asynchronous successive halving: a free worker takes the best not yet promoted trial among the top
+    1 / eta of a rung, starting from the highest rung, and a new trial when there is none to promote.
+    """
+
+    def __init__(self, budgets, eta, n_trials):
+        self.budgets = budgets
+        self.eta = eta
+        self.n_trials = n_trials
+        # trial -> score of the trials evaluated at every rung
+        self.scores = [{} for _ in budgets]
+        self.promoted = [set() for _ in budgets]
+        self.started = set()
+
+    def record(self, result):
+        rung = self.budgets.index(result['timesteps'])
+        # failed trials are recorded without a score
+        score = result['score']
+        self.scores[rung][result['trial']] = -math.inf if score is None else score
+        self.started.add(result['trial'])
+        if rung:
+            self.promoted[rung - 1].add(result['trial'])
+
+    def next_job(self):
+        """(trial, rung) to run next, None when every trial has stopped or is running."""
+        for rung in reversed(range(len(self.budgets) - 1)):
+            scores = self.scores[rung]
+            top = sorted(scores, key=scores.get, reverse=True)[:len(scores) // self.eta]
+            for trial in top:
+                # failed trials are never promoted
+                if trial not in self.promoted[rung] and scores[trial] > -math.inf:
+                    self.promoted[rung].add(trial)
+                    return trial, rung + 1
+        for trial in range(self.n_trials):
+            if trial not in self.started:
+                self.started.add(trial)
+                return trial, 0
+        return None
+
+    def best(self, n=5):
+        """Best trials of the highest rungs: (trial, rung, score), highest rung first."""
+        ranked = [(trial, rung, score) for rung, scores in enumerate(self.scores) for trial, score in scores.items()
+                  if all(trial not in higher for higher in self.scores[rung + 1:])]
+        return sorted(ranked, key=lambda entry: (entry[1], entry[2]), reverse=True)[:n]
+
+
+def run_sweep(sweep, workers=None):
+    """Run or continue a sweep loaded with `load_sweep`, returns its ASHAScheduler."""
+    budgets = rungs(sweep)
+    scheduler = ASHAScheduler(budgets, sweep['eta'], sweep['n_trials'])
+    for result in read_results(sweep['log_dir']):
+        scheduler.record(result)
+    os.makedirs(sweep['log_dir'], exist_ok=True)
+    workers = workers or sweep['workers'] or os.cpu_count()
+    print(f'Rungs {budgets}, {sweep["n_trials"]} trials on {workers} workers')
+
+    running = {}
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(workers, mp_context=context) as pool, \
+            open(os.path.join(sweep['log_dir'], 'results.jsonl'), 'a') as results:
+        while True:
+            while len(running) < workers:
+                job = scheduler.next_job()
+                if job is None:
+                    break
+                trial, rung = job
+                running[pool.submit(run_trial, sweep, trial, budgets[rung])] = job
+            if not running:
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                trial, rung = running.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    # never promoted, see the trial's stage.log
+                    result = {'trial': trial, 'timesteps': budgets[rung], 'status': 'failed', 'score': None,
+                              'params': trial_params(sweep, trial), 'error': repr(e)}
+                scheduler.record(result)
+                results.write(json.dumps(result) + '\n')
+                results.flush()
+                print(f'{trial_name(trial)} rung {rung} ({budgets[rung]} steps): '
+                      + (f'{sweep["metric"]} {result["score"]:.2f}' if result['status'] == 'completed'
+                         else f'failed with {result["error"]}'))
+    return scheduler
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('config')
+    parser.add_argument('--workers', type=int, help='trials trained at once (default: config workers or number '
+                                                    'of cores)')
+    parser.add_argument('--top', type=int, default=5, help='number of best trials printed')
+    args = parser.parse_args()
+
+    sweep = load_sweep(args.config)
+    scheduler = run_sweep(sweep, args.workers)
+    for trial, rung, score in scheduler.best(args.top):
+        print(f'{trial_name(trial)} {sweep["metric"]} {score:.2f} at {scheduler.budgets[rung]} steps: '
+              f'{trial_params(sweep, trial)}')